@@ -0,0 +1,247 @@
+"""
+告警规则向量化评估
+
+全体机器的告警和评分原来对每个IP分别查询最新记录、全局规则和个例规则（3N+1次查询），
+再逐条规则在Python中比较。现在每个请求：
+
+1. 读取所有启用的规则，编译为 AlertPlan：按生效时间过滤，全局规则和个例规则分组，
+   预先建立"全局规则 -> 被哪些IP的个例规则覆盖"的查找表和每个IP的有效规则列表
+   （编译结果按规则版本号缓存，见 app/rule_cache.py）
+2. 一次查询读取时间段内每个IP的最新记录（快照或窗口函数），按字段转换为NumPy数组
+3. 每条规则对整列计算一次布尔掩码，只为命中的位置构造告警
+
+覆盖口径与原来一致：个例规则与全局规则的 (告警级别, 条件字段, 比较操作符) 相同时，
+该IP不再评估这条全局规则。每个IP的告警按先全局规则、后个例规则，各自按规则id排序。
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.models import AlertRule, NodeMonitorMetrics
+from app.schemas import AlertInfo
+from app.derived_metrics import DERIVED_METRIC_FIELDS, DERIVED_SOURCE_FIELDS, compute_derived_metrics, to_column
+
+COMPARATORS = {
+    ">": np.greater,
+    "<": np.less,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+# 可作为条件字段的原始数值字段
+NUMERIC_FIELDS = [
+    column.name for column in NodeMonitorMetrics.__table__.columns
+    if column.type.python_type in (int, float)
+]
+
+def rule_in_effect(rule: AlertRule, current_time: int) -> bool:
+    """规则在当前时间是否生效"""
+    if rule.time_range_start and current_time < rule.time_range_start:
+        return False
+    if rule.time_range_end and current_time > rule.time_range_end:
+        return False
+    return True
+
+def override_key(rule: AlertRule) -> Tuple[str, str, str]:
+    """个例规则覆盖全局规则的判定键"""
+    return (rule.alert_level, rule.condition_field, rule.condition_operator)
+
+def format_alert_message(template: str, ip: str, current_value: float, threshold: float, field_name: str) -> str:
+    """格式化告警消息"""
+    if not template:
+        template = f"IP {ip} {field_name} 值 {current_value} {field_name} 阈值 {threshold}"
+
+    return template.format(
+        ip=ip,
+        current_value=current_value,
+        threshold=threshold,
+        threshold_value=threshold,  # 添加 threshold_value 以兼容数据库中的模板
+        field_name=field_name
+    )
+
+def condition_mask(rule: AlertRule, column: np.ndarray) -> np.ndarray:
+    """规则条件对整列的命中掩码，取值缺失的位置不命中"""
+    comparator = COMPARATORS.get(rule.condition_operator)
+    if comparator is None:
+        return np.zeros(len(column), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        return comparator(column, rule.condition_value) & ~np.isnan(column)
+
+def referenced_fields(rules: Sequence[AlertRule]) -> Tuple[List[str], List[str], List[str]]:
+    """规则引用的 (衍生指标字段, 原始字段, 计算这些字段需要读取的原始列)"""
+    referenced = {rule.condition_field for rule in rules}
+    derived_fields = sorted(referenced & set(DERIVED_METRIC_FIELDS))
+    raw_fields = sorted(referenced & set(NUMERIC_FIELDS))
+    source = set(raw_fields) | (set(DERIVED_SOURCE_FIELDS) if derived_fields else set())
+    return derived_fields, raw_fields, sorted(source)
+
+def load_active_rules(db: Session) -> List[AlertRule]:
+    """读取所有启用的规则（按id排序）"""
+    return db.query(AlertRule).filter(AlertRule.is_active == True).order_by(AlertRule.id).all()
+
+def next_rule_boundary(rules: Sequence[AlertRule], current_time: int) -> Optional[int]:
+    """current_time之后最早有规则开始或结束生效的时间，没有则返回None"""
+    boundaries = []
+    for rule in rules:
+        if rule.time_range_start and rule.time_range_start > current_time:
+            boundaries.append(rule.time_range_start)
+        if rule.time_range_end and rule.time_range_end >= current_time:
+            boundaries.append(rule.time_range_end + 1)
+    return min(boundaries) if boundaries else None
+
+class AlertPlan:
+    """编译后的告警规则，每个请求编译一次，可一次评估任意多个IP的最新记录"""
+
+    def __init__(self, rules: Sequence[AlertRule], current_time: Optional[int] = None):
+        if current_time is None:
+            current_time = int(datetime.now().timestamp())
+        # 编译所用的全部规则（含尚未生效的），生效时间变化时用于重新编译
+        self.rules = list(rules)
+        self.valid_until = next_rule_boundary(self.rules, current_time)
+        rules = [
+            rule for rule in self.rules
+            if rule.is_active and rule.condition_value is not None and rule_in_effect(rule, current_time)
+        ]
+
+        self.global_rules = [rule for rule in rules if rule.rule_type == "global"]
+        self.specific_rules: Dict[str, List[AlertRule]] = {}
+        for rule in rules:
+            if rule.rule_type == "specific" and rule.target_ip:
+                self.specific_rules.setdefault(rule.target_ip, []).append(rule)
+
+        # 覆盖查找表：判定键 -> 存在相同键个例规则的IP
+        self.overridden_ips: Dict[Tuple[str, str, str], List[str]] = {}
+        for ip, ip_rules in self.specific_rules.items():
+            for key in {override_key(rule) for rule in ip_rules}:
+                self.overridden_ips.setdefault(key, []).append(ip)
+
+        # 每个IP的有效规则：未被覆盖的全局规则在前，个例规则在后；没有个例规则的IP使用全局规则列表
+        self.effective_rules: Dict[str, List[AlertRule]] = {}
+        for ip, ip_rules in self.specific_rules.items():
+            overridden = {override_key(rule) for rule in ip_rules}
+            self.effective_rules[ip] = [
+                rule for rule in self.global_rules if override_key(rule) not in overridden
+            ] + ip_rules
+
+        # 规则引用的字段，以及计算这些字段需要读取的原始列
+        self.derived_fields, self.raw_fields, self.source_fields = referenced_fields(rules)
+        # 全体评估时查询的列：ip、ts 在前
+        self.query_fields = ["ip", "ts"] + [field for field in self.source_fields if field not in ("ip", "ts")]
+
+    @classmethod
+    def load(cls, db: Session) -> "AlertPlan":
+        """一次查询读取所有启用的规则并编译"""
+        return cls(load_active_rules(db))
+
+    def rules_for_ip(self, ip: str) -> List[AlertRule]:
+        """指定IP的有效规则"""
+        return self.effective_rules.get(ip, self.global_rules)
+
+    def is_current(self, current_time: int) -> bool:
+        """编译结果在current_time是否仍然有效（没有规则跨过生效时间边界）"""
+        return self.valid_until is None or current_time < self.valid_until
+
+    def field_values(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """由原始列得到规则条件字段的取值（衍生指标与节点监控共用计算内核）"""
+        values = {field: columns[field] for field in self.raw_fields}
+        if self.derived_fields:
+            derived = compute_derived_metrics(columns)
+            values.update({field: derived[field] for field in self.derived_fields})
+        return values
+
+    def rule_mask(self, rule: AlertRule, column: np.ndarray) -> np.ndarray:
+        """规则对整列的命中掩码，取值缺失的位置不命中"""
+        return condition_mask(rule, column)
+
+    def evaluate(self, ips: List[str], timestamps: List[int], columns: Dict[str, np.ndarray]) -> Dict[str, List[AlertInfo]]:
+        """
+        评估每个IP的一条记录
+
+        Args:
+            ips: IP列表（不重复）
+            timestamps: 与ips对应的记录时间戳
+            columns: 包含 source_fields 各字段的列式数据
+
+        Returns:
+            {ip: 告警列表}，包含没有告警的IP，顺序与ips一致
+        """
+        alerts = {ip: [] for ip in ips}
+        if not ips:
+            return alerts
+        values = self.field_values(columns)
+        ip_array = np.array(ips, dtype=object)
+
+        for rule in self.global_rules:
+            column = values.get(rule.condition_field)
+            if column is None:
+                continue
+            mask = self.rule_mask(rule, column)
+            overridden = self.overridden_ips.get(override_key(rule))
+            if overridden:
+                mask &= ~np.isin(ip_array, overridden)
+            for position in np.flatnonzero(mask).tolist():
+                alerts[ips[position]].append(self.build_alert(rule, ips[position], column[position], timestamps[position]))
+
+        positions = {ip: position for position, ip in enumerate(ips)}
+        for ip, ip_rules in self.specific_rules.items():
+            position = positions.get(ip)
+            if position is None:
+                continue
+            for rule in ip_rules:
+                column = values.get(rule.condition_field)
+                if column is None:
+                    continue
+                if self.rule_mask(rule, column[position:position + 1])[0]:
+                    alerts[ip].append(self.build_alert(rule, ip, column[position], timestamps[position]))
+
+        return alerts
+
+    def evaluate_one(self, ip: str, timestamp: int, columns: Dict[str, np.ndarray]) -> List[AlertInfo]:
+        """评估单个IP的一条记录，直接遍历该IP的有效规则"""
+        values = self.field_values(columns)
+        alerts = []
+        for rule in self.rules_for_ip(ip):
+            column = values.get(rule.condition_field)
+            if column is not None and self.rule_mask(rule, column)[0]:
+                alerts.append(self.build_alert(rule, ip, column[0], timestamp))
+        return alerts
+
+    def evaluate_rows(self, rows: Sequence) -> Dict[str, List[AlertInfo]]:
+        """评估按 query_fields 顺序查询出的每IP最新记录（每个IP一行），按列转置后整体评估"""
+        if not rows:
+            return {}
+        transposed = list(zip(*rows))
+        ips, timestamps = list(transposed[0]), list(transposed[1])
+        columns = {
+            field: to_column(values)
+            for field, values in zip(self.query_fields[2:], transposed[2:])
+        }
+        if "ts" in self.source_fields:
+            columns["ts"] = to_column(timestamps)
+        return self.evaluate(ips, timestamps, columns)
+
+    def build_alert(self, rule: AlertRule, ip: str, value: np.float64, timestamp: int) -> AlertInfo:
+        """为命中的规则构造告警"""
+        current_value = float(value)
+        return AlertInfo(
+            ip=ip,
+            rule_id=rule.id,
+            rule_name=rule.rule_name,
+            alert_level=rule.alert_level,
+            alert_message=format_alert_message(
+                rule.alert_message or "",
+                ip,
+                current_value,
+                rule.condition_value,
+                rule.condition_field
+            ),
+            current_value=current_value,
+            threshold_value=rule.condition_value,
+            condition_field=rule.condition_field,
+            condition_operator=rule.condition_operator,
+            timestamp=timestamp,
+            rule_type=rule.rule_type
+        )
@@ -0,0 +1,105 @@
+"""
+告警规则SQL下推
+
+向量化评估仍需把每个IP的最新记录传回应用。开启 ALERT_SQL_PUSHDOWN 后，全体机器的告警评估
+把已编译的规则集（AlertPlan）翻译成一条SQL：
+
+1. latest CTE：时间段内每个IP的最新记录（快照或窗口函数，与向量化评估相同）
+2. evaluated CTE：只计算规则引用的字段，衍生指标使用 DERIVED_METRIC_SQL 表达式并保留两位小数
+3. 每条规则一个 SELECT 分支（UNION ALL）：全局规则排除被个例规则覆盖的IP，个例规则限定目标IP
+
+数据库只返回命中的 (ip, ts, 规则序号, 值)，告警消息仍由应用按规则模板生成。
+字段名来自白名单（原始数值字段和衍生指标），阈值和IP全部使用绑定参数。
+"""
+
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, text
+from sqlalchemy.sql.elements import TextClause
+from app.models import AlertRule
+from app.alert_evaluation import AlertPlan, override_key
+from app.derived_metrics import DERIVED_METRIC_SQL, rounded_metric_sql
+
+# 规则比较操作符对应的SQL操作符
+SQL_OPERATORS = {
+    ">": ">",
+    "<": "<",
+    ">=": ">=",
+    "<=": "<=",
+    "==": "=",
+    "!=": "<>",
+}
+
+def field_sql(field: str) -> str:
+    """规则条件字段的SQL表达式，衍生指标与向量化计算一样保留两位小数"""
+    if field in DERIVED_METRIC_SQL:
+        return rounded_metric_sql(field)
+    return field
+
+def compile_plan_sql(plan: AlertPlan, latest_sql: str, ips: Optional[List[str]] = None,
+                     include_quiet_ips: bool = False) -> Tuple[TextClause, Dict, List[AlertRule]]:
+    """
+    把已编译的规则集翻译为一条SQL
+
+    Args:
+        plan: 已编译的规则集
+        latest_sql: 读取每个IP最新记录（plan.query_fields各列）的SELECT语句，使用 :start_time / :end_time 参数
+        ips: 只评估这些IP
+        include_quiet_ips: 为每个IP额外返回一行（规则序号为-1），用于得到没有告警的IP
+
+    Returns:
+        (语句, 除 start_time / end_time 以外的绑定参数, 规则序号对应的规则列表)；
+        结果行为 (ip, ts, rule_order, value)，按IP、规则序号排序
+    """
+    params: Dict = {}
+    expanding = []
+    fields = plan.derived_fields + plan.raw_fields
+    select_fields = "".join(f", {field_sql(field)} AS {field}" for field in fields if field != "ts")
+    ip_filter = ""
+    if ips:
+        ip_filter = " WHERE ip IN :ips"
+        params["ips"] = list(ips)
+        expanding.append("ips")
+
+    # 规则序号：全局规则在前、个例规则在后，与向量化评估的告警顺序一致
+    rules = list(plan.global_rules) + [rule for ip_rules in plan.specific_rules.values() for rule in ip_rules]
+    branches = []
+    if include_quiet_ips:
+        branches.append("SELECT ip, ts, -1 AS rule_order, CAST(NULL AS DOUBLE PRECISION) AS value FROM evaluated")
+
+    for order, rule in enumerate(rules):
+        operator = SQL_OPERATORS.get(rule.condition_operator)
+        if operator is None or rule.condition_field not in fields:
+            continue
+        conditions = [f"{rule.condition_field} {operator} :threshold_{order}"]
+        params[f"threshold_{order}"] = rule.condition_value
+        if rule.rule_type == "global":
+            overridden = plan.overridden_ips.get(override_key(rule))
+            if overridden:
+                conditions.append(f"ip NOT IN :overridden_{order}")
+                params[f"overridden_{order}"] = overridden
+                expanding.append(f"overridden_{order}")
+        else:
+            conditions.append(f"ip = :target_{order}")
+            params[f"target_{order}"] = rule.target_ip
+        branches.append(
+            f"SELECT ip, ts, {order} AS rule_order, {rule.condition_field} AS value "
+            f"FROM evaluated WHERE {' AND '.join(conditions)}"
+        )
+
+    if not branches:
+        branches.append("SELECT ip, ts, -1 AS rule_order, CAST(NULL AS DOUBLE PRECISION) AS value FROM evaluated WHERE 1 = 0")
+
+    union = "\n            UNION ALL\n            ".join(branches)
+    statement = text(f"""
+        WITH latest AS ({latest_sql}),
+        evaluated AS (
+            SELECT ip, ts{select_fields} FROM latest{ip_filter}
+        )
+        SELECT ip, ts, rule_order, value FROM (
+            {union}
+        ) firing
+        ORDER BY ip, rule_order
+    """)
+    if expanding:
+        statement = statement.bindparams(*(bindparam(name, expanding=True) for name in expanding))
+    return statement, params, rules
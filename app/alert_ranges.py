@@ -0,0 +1,214 @@
+"""
+告警规则时间段评估
+
+点评估（/alert-management/alerts）只看每个IP在时间段内的最新一条记录，规则的生效时间也按
+当前时间判断。时间段评估对时间段内的每条样本（或每个预聚合桶）评估所有规则：
+
+1. 一次查询读取时间段内的样本（只读取规则用到的列），按 (ip, ts) 排序，转换为NumPy列
+2. 每个IP、每条规则对整列计算一次命中掩码；规则生效时间按样本的数据时间判断，
+   个例规则只在自身生效的样本上覆盖判定键相同的全局规则
+3. 对掩码做游程检测得到连续命中的区段，相邻样本间隔超过 max_gap_seconds 时断开；
+   区段持续时间达到规则的 duration_seconds 后告警，输出告警区间
+
+所有计算都是整列运算，不在Python中逐行循环。
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+from app.models import AlertRule
+from app.schemas import FiringInterval
+from app.alert_evaluation import condition_mask, override_key, referenced_fields
+from app.derived_metrics import compute_derived_metrics, to_column
+from app.rollups import ROLLUP_RESOLUTIONS, ROLLUP_METRIC_FIELDS, rollups_available
+
+# 读取预聚合桶时每个字段使用的聚合值
+RANGE_MODES = ("avg", "min", "max", "last")
+
+def window_mask(rule: AlertRule, ts: np.ndarray) -> np.ndarray:
+    """规则在每条样本的数据时间上是否生效"""
+    mask = np.ones(len(ts), dtype=bool)
+    if rule.time_range_start:
+        mask &= ts >= rule.time_range_start
+    if rule.time_range_end:
+        mask &= ts <= rule.time_range_end
+    return mask
+
+def find_runs(mask: np.ndarray, ts: np.ndarray,
+              max_gap_seconds: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    游程检测：掩码中连续为True的区段
+
+    Returns:
+        (起始下标, 结束下标, 区段之后是否因数据间隔断开)，结束下标包含在区段内
+    """
+    count = len(mask)
+    # gap_after[i]: 样本i与下一条样本的间隔超过max_gap_seconds（最后一条视为断开）
+    gap_after = np.ones(count, dtype=bool)
+    if count > 1:
+        gap_after[:-1] = np.diff(ts) > max_gap_seconds if max_gap_seconds else False
+    gap_before = np.concatenate(([True], gap_after[:-1]))
+
+    previous = np.concatenate(([False], mask[:-1]))
+    following = np.concatenate((mask[1:], [False]))
+    starts = np.flatnonzero(mask & (~previous | gap_before))
+    ends = np.flatnonzero(mask & (~following | gap_after))
+    return starts, ends, gap_after[ends]
+
+def load_samples(db: Session, start_time: int, end_time: int, fields: Sequence[str],
+                 ips: Optional[List[str]] = None, resolution: int = 0,
+                 mode: str = "avg") -> Tuple[int, list]:
+    """
+    读取时间段内的样本，按 (ip, ts) 排序，每行为 (ip, ts, *fields)
+
+    resolution 为预聚合粒度时读取 node_metrics_rollups 中各字段的 mode 聚合值，ts 为桶起始时间；
+    预聚合不可用或规则字段不在预聚合中时回退到原始记录。
+
+    Returns:
+        (实际使用的粒度，0表示原始记录, 样本行)
+    """
+    use_rollups = (
+        resolution in ROLLUP_RESOLUTIONS
+        and all(field in ROLLUP_METRIC_FIELDS for field in fields)
+        and rollups_available(db)
+    )
+    ip_filter = " AND ip IN :ips" if ips else ""
+    params = {"start_time": start_time, "end_time": end_time}
+    if use_rollups:
+        columns = "".join(f", {field}_{mode} AS {field}" for field in fields)
+        query = text(f"""
+            SELECT ip, bucket_ts AS ts{columns}
+            FROM node_metrics_rollups
+            WHERE resolution = :resolution
+              AND bucket_ts > :start_time - :resolution AND bucket_ts <= :end_time{ip_filter}
+            ORDER BY ip, bucket_ts
+        """)
+        params["resolution"] = resolution
+    else:
+        resolution = 0
+        columns = "".join(f", {field}" for field in fields)
+        query = text(f"""
+            SELECT ip, ts{columns}
+            FROM node_monitor_metrics
+            WHERE ts BETWEEN :start_time AND :end_time{ip_filter}
+            ORDER BY ip, ts, id
+        """)
+    if ips:
+        query = query.bindparams(bindparam("ips", expanding=True))
+        params["ips"] = ips
+    return resolution, db.execute(query, params).fetchall()
+
+class RangeAlertPlan:
+    """按数据时间评估的告警规则，规则生效时间逐样本判断，支持持续时间条件"""
+
+    def __init__(self, rules: Sequence[AlertRule]):
+        rules = [rule for rule in rules if rule.is_active and rule.condition_value is not None]
+        self.global_rules = [rule for rule in rules if rule.rule_type == "global"]
+        self.specific_rules: Dict[str, List[AlertRule]] = {}
+        for rule in rules:
+            if rule.rule_type == "specific" and rule.target_ip:
+                self.specific_rules.setdefault(rule.target_ip, []).append(rule)
+        self.derived_fields, self.raw_fields, self.source_fields = referenced_fields(rules)
+        self.query_fields = [field for field in self.source_fields if field not in ("ip", "ts")]
+
+    def field_values(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """由原始列得到规则条件字段的取值"""
+        values = {field: columns[field] for field in self.raw_fields}
+        if self.derived_fields:
+            derived = compute_derived_metrics(columns)
+            values.update({field: derived[field] for field in self.derived_fields})
+        return values
+
+    def evaluate_rows(self, rows: Sequence, max_gap_seconds: Optional[int] = None) -> List[FiringInterval]:
+        """评估 load_samples 读取的样本行，返回所有IP的告警区间（按IP排序）"""
+        if not rows:
+            return []
+        transposed = list(zip(*rows))
+        ips = np.array(transposed[0], dtype=object)
+        ts = np.array(transposed[1], dtype=np.int64)
+        columns = {field: to_column(values) for field, values in zip(self.query_fields, transposed[2:])}
+        if "ts" in self.source_fields:
+            columns["ts"] = ts.astype(np.float64)
+        values = self.field_values(columns)
+
+        # 样本按IP排序，按IP切分为连续的片段
+        bounds = np.concatenate(([0], np.flatnonzero(ips[1:] != ips[:-1]) + 1, [len(ips)]))
+        intervals = []
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            ip_values = {field: column[start:end] for field, column in values.items()}
+            intervals.extend(self.evaluate_ip(ips[start], ts[start:end], ip_values, max_gap_seconds))
+        return intervals
+
+    def evaluate_ip(self, ip: str, ts: np.ndarray, values: Dict[str, np.ndarray],
+                    max_gap_seconds: Optional[int] = None) -> List[FiringInterval]:
+        """评估一个IP按时间排序的样本，全局规则在前、个例规则在后"""
+        specific_rules = self.specific_rules.get(ip, [])
+        # 判定键 -> 有相同键的个例规则生效的样本
+        overridden: Dict[Tuple[str, str, str], np.ndarray] = {}
+        for rule in specific_rules:
+            key = override_key(rule)
+            overridden[key] = overridden.get(key, np.zeros(len(ts), dtype=bool)) | window_mask(rule, ts)
+
+        intervals = []
+        for rule in self.global_rules + specific_rules:
+            column = values.get(rule.condition_field)
+            if column is None:
+                continue
+            mask = condition_mask(rule, column) & window_mask(rule, ts)
+            if rule.rule_type == "global" and override_key(rule) in overridden:
+                mask &= ~overridden[override_key(rule)]
+            intervals.extend(self.rule_intervals(rule, ip, ts, column, mask, max_gap_seconds))
+        return intervals
+
+    def rule_intervals(self, rule: AlertRule, ip: str, ts: np.ndarray, column: np.ndarray,
+                       mask: np.ndarray, max_gap_seconds: Optional[int] = None) -> List[FiringInterval]:
+        """由一条规则的命中掩码得到满足持续时间条件的告警区间"""
+        starts, ends, broken = find_runs(mask, ts, max_gap_seconds)
+        if not len(starts):
+            return []
+
+        # 每个区段内第一条持续时间达到duration_seconds的样本（ts有序，二分查找）
+        duration = rule.duration_seconds or 0
+        firing = np.searchsorted(ts, ts[starts] + duration, side="left")
+        qualified = firing <= ends
+        if not qualified.any():
+            return []
+        starts, ends, broken, firing = starts[qualified], ends[qualified], broken[qualified], firing[qualified]
+
+        # 区段内的最小值、最大值：对 [start, end+1) 分段归约
+        padded = np.append(column, np.nan)
+        segments = np.column_stack((starts, ends + 1)).ravel()
+        minimums = np.minimum.reduceat(padded, segments)[::2]
+        maximums = np.maximum.reduceat(padded, segments)[::2]
+
+        last_index = len(ts) - 1
+        intervals = []
+        for start, end, gap, fire, low, high in zip(
+            starts.tolist(), ends.tolist(), broken.tolist(), firing.tolist(), minimums.tolist(), maximums.tolist()
+        ):
+            if end == last_index:
+                ended_at = None  # 持续到时间段内最后一条样本
+            elif gap:
+                ended_at = int(ts[end])  # 数据中断，以最后一条命中样本为结束
+            else:
+                ended_at = int(ts[end + 1])  # 第一条不再命中的样本
+            intervals.append(FiringInterval(
+                ip=ip,
+                rule_id=rule.id,
+                rule_name=rule.rule_name,
+                rule_type=rule.rule_type,
+                alert_level=rule.alert_level,
+                condition_field=rule.condition_field,
+                condition_operator=rule.condition_operator,
+                threshold_value=rule.condition_value,
+                duration_seconds=duration,
+                started_at=int(ts[start]),
+                firing_at=int(ts[fire]),
+                ended_at=ended_at,
+                last_ts=int(ts[end]),
+                sample_count=end - start + 1,
+                min_value=low,
+                max_value=high
+            ))
+        return intervals
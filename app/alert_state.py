@@ -0,0 +1,241 @@
+"""
+后台告警评估与告警状态
+
+告警原来只在查询 /alert-management/alerts 时实时计算，每个看板都重复计算一遍。
+后台任务按 node_monitor_metrics.id 水位增量评估：
+
+1. 每批只处理有新记录的IP，取每个IP在本批中的最新一条记录，用已编译的规则集
+   （app/rule_cache.py）整体评估
+2. 与这些IP当前 firing 的事件比较：新命中的规则插入 firing 事件，仍命中的更新当前值和
+   last_ts，不再命中的置为 resolved 并记录结束时间，与水位在同一事务中提交
+3. 告警和评分接口的 source=state 直接读取 firing 事件（部分索引），
+   /alert-management/alerts/history 按时间段查询历史事件
+
+首次运行不回放历史数据，从最近一批记录开始评估。
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models import AlertEvent
+from app.schemas import AlertInfo
+from app.watermarks import get_watermark, set_watermark, advance_watermark, get_max_metrics_id, next_id_batch
+from app.rule_cache import rule_plan_cache
+
+logger = logging.getLogger(__name__)
+
+ALERT_STATE_WATERMARK = "alert_state"
+
+# 告警和评分接口的数据来源：live 实时计算，state 读取后台评估的告警状态
+ALERT_SOURCES = ("live", "state")
+
+def batch_latest_sql(columns: List[str]) -> str:
+    """一个id区间内每个IP最新一条记录的SELECT语句，使用 :from_id / :to_id 参数"""
+    column_list = ", ".join(columns)
+    return f"""
+        SELECT {column_list} FROM (
+            SELECT {column_list},
+                   ROW_NUMBER() OVER (PARTITION BY ip ORDER BY ts DESC, id DESC) AS rn
+            FROM node_monitor_metrics
+            WHERE id > :from_id AND id <= :to_id
+        ) batch
+        WHERE rn = 1
+        ORDER BY ip
+    """
+
+def event_to_alert(event: AlertEvent) -> AlertInfo:
+    """将firing事件转换为与实时计算相同格式的告警"""
+    return AlertInfo(
+        ip=event.ip,
+        rule_id=event.rule_id,
+        rule_name=event.rule_name,
+        alert_level=event.alert_level,
+        alert_message=event.alert_message or "",
+        current_value=event.current_value,
+        threshold_value=event.threshold_value,
+        condition_field=event.condition_field,
+        condition_operator=event.condition_operator,
+        timestamp=event.last_ts,
+        rule_type=event.rule_type
+    )
+
+def get_firing_alerts(db: Session, start_time: int, end_time: int,
+                      ips: Optional[List[str]] = None) -> List[AlertInfo]:
+    """
+    读取当前firing的告警
+
+    只返回最近一次命中记录落在时间段内的事件（IP在时间段内仍有数据且仍在告警），
+    按IP、先全局规则后个例规则、规则id排序，与实时计算的顺序一致。
+    """
+    query = db.query(AlertEvent).filter(
+        AlertEvent.status == "firing",
+        AlertEvent.last_ts >= start_time,
+        AlertEvent.last_ts <= end_time
+    )
+    if ips:
+        query = query.filter(AlertEvent.ip.in_(ips))
+    events = query.order_by(AlertEvent.ip, AlertEvent.rule_type, AlertEvent.rule_id).all()
+    return [event_to_alert(event) for event in events]
+
+def get_alert_history(db: Session, start_time: int, end_time: int, ip: Optional[str] = None,
+                      rule_id: Optional[int] = None, alert_levels: Optional[List[str]] = None,
+                      status: Optional[str] = None, limit: int = 100, offset: int = 0) -> Tuple[int, List[AlertEvent]]:
+    """
+    查询与时间段有交集的告警事件（开始于end_time之前，且未结束或结束于start_time之后）
+
+    Returns:
+        (符合条件的事件总数, 按开始时间倒序的当前页事件)
+    """
+    query = db.query(AlertEvent).filter(
+        AlertEvent.started_at <= end_time,
+        (AlertEvent.ended_at.is_(None)) | (AlertEvent.ended_at >= start_time)
+    )
+    if ip:
+        query = query.filter(AlertEvent.ip == ip)
+    if rule_id is not None:
+        query = query.filter(AlertEvent.rule_id == rule_id)
+    if alert_levels:
+        query = query.filter(AlertEvent.alert_level.in_(alert_levels))
+    if status:
+        query = query.filter(AlertEvent.status == status)
+
+    total_count = query.count()
+    events = query.order_by(AlertEvent.started_at.desc(), AlertEvent.id.desc()).offset(offset).limit(limit).all()
+    return total_count, events
+
+class AlertStateEvaluator:
+    """按id水位增量评估告警规则，维护alert_events中的告警状态"""
+
+    def __init__(self):
+        self.running = False
+
+    def apply_transitions(self, db: Session, timestamps: Dict[str, int],
+                          alerts_by_ip: Dict[str, List[AlertInfo]]) -> Tuple[int, int]:
+        """
+        把本批每个IP的评估结果与firing事件比较并写入（不提交事务）
+
+        Returns:
+            (新触发的事件数, 恢复的事件数)
+        """
+        firing: Dict[str, Dict[int, AlertEvent]] = {}
+        events = db.query(AlertEvent).filter(
+            AlertEvent.status == "firing",
+            AlertEvent.ip.in_(list(timestamps))
+        ).all()
+        for event in events:
+            firing.setdefault(event.ip, {})[event.rule_id] = event
+
+        fired = resolved = 0
+        now = datetime.now()
+        for ip, alerts in alerts_by_ip.items():
+            ts = timestamps[ip]
+            open_events = firing.get(ip, {})
+            # 乱序到达的旧记录不改变状态
+            if any(event.last_ts > ts for event in open_events.values()):
+                continue
+
+            for alert in alerts:
+                event = open_events.pop(alert.rule_id, None)
+                if event is None:
+                    db.add(AlertEvent(
+                        ip=ip,
+                        rule_id=alert.rule_id,
+                        rule_name=alert.rule_name,
+                        rule_type=alert.rule_type,
+                        alert_level=alert.alert_level,
+                        condition_field=alert.condition_field,
+                        condition_operator=alert.condition_operator,
+                        threshold_value=alert.threshold_value,
+                        current_value=alert.current_value,
+                        alert_message=alert.alert_message,
+                        status="firing",
+                        started_at=ts,
+                        last_ts=ts
+                    ))
+                    fired += 1
+                    continue
+                # 仍在告警：规则可能已被修改，一并更新
+                event.rule_name = alert.rule_name
+                event.alert_level = alert.alert_level
+                event.threshold_value = alert.threshold_value
+                event.current_value = alert.current_value
+                event.alert_message = alert.alert_message
+                event.last_ts = ts
+                event.updated_at = now
+
+            # 剩下的是不再命中（或规则已停用、删除）的事件
+            for event in open_events.values():
+                event.status = "resolved"
+                event.ended_at = ts
+                event.updated_at = now
+                resolved += 1
+
+        return fired, resolved
+
+    def refresh_once(self, db: Session) -> int:
+        """处理一批新记录，返回本批的id跨度（0表示没有新数据或本批已由其他worker处理）"""
+        watermark = get_watermark(db, ALERT_STATE_WATERMARK)
+        last_id = watermark
+        if last_id is None:
+            # 首次运行不回放历史，从最近一批记录开始
+            last_id = max(get_max_metrics_id(db) - settings.alert_state_batch_size, 0)
+        batch = next_id_batch(db, last_id, settings.alert_state_batch_size)
+        if not batch:
+            if watermark is None:
+                set_watermark(db, ALERT_STATE_WATERMARK, last_id)
+                db.commit()
+            return 0
+
+        from_id, to_id = batch
+        # 每个worker都运行评估任务：先推进水位，同一批只由一个worker评估和写入告警事件
+        if not advance_watermark(db, ALERT_STATE_WATERMARK, watermark, to_id):
+            db.rollback()
+            return 0
+        plan = rule_plan_cache.get_plan()
+        rows = db.execute(
+            text(batch_latest_sql(plan.query_fields)),
+            {"from_id": from_id, "to_id": to_id}
+        ).fetchall()
+        timestamps = {row[0]: row[1] for row in rows}
+        fired, resolved = self.apply_transitions(db, timestamps, plan.evaluate_rows(rows))
+        db.commit()
+        if fired or resolved:
+            logger.info(f"告警状态更新：{len(rows)} 个IP，新触发 {fired} 条，恢复 {resolved} 条")
+        return to_id - from_id
+
+    def refresh_until_caught_up(self):
+        """持续处理直到追上最新记录"""
+        db = SessionLocal()
+        try:
+            while self.refresh_once(db) >= settings.alert_state_batch_size:
+                pass
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def start_refresh(self):
+        """启动告警评估定时任务"""
+        self.running = True
+        logger.info("启动后台告警评估任务...")
+
+        while self.running:
+            try:
+                await asyncio.to_thread(self.refresh_until_caught_up)
+            except Exception as e:
+                logger.error(f"后台告警评估失败: {e}")
+            await asyncio.sleep(settings.alert_state_refresh_seconds)
+
+    def stop(self):
+        """停止告警评估"""
+        self.running = False
+        logger.info("停止后台告警评估任务")
+
+# 全局告警评估器实例
+alert_state_evaluator = AlertStateEvaluator()
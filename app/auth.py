@@ -9,8 +9,9 @@ import bcrypt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Security
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User
 from app.schemas import TokenData
 from app.config import settings
@@ -327,7 +328,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     token_handler = get_token_handler()
     return token_handler.create_token(data, expires_delta)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_async_db)):
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -350,7 +351,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(
         token_data = TokenData(username=username)
     except Exception as e:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
+    user = await db.run_sync(get_user, token_data.username)
     if user is None:
         raise credentials_exception
     return user
@@ -1,14 +1,19 @@
 import json
 import redis
-from typing import Any, Optional, Union
-from datetime import timedelta
+from typing import Any, Dict, List, Optional, Union
+from datetime import datetime, timedelta
 from app.config import settings
 from app.access_logger import log_redis_access, get_client_ip, get_real_ip, get_local_ip
+from app.utils.fast_json import format_datetime
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+# 缓存命中统计（哈希，字段为接口名）
+CACHE_STATS_HITS = "cache_stats:hits"
+CACHE_STATS_MISSES = "cache_stats:misses"
+
 class RedisCache:
     def __init__(self):
         try:
@@ -97,6 +102,142 @@ class RedisCache:
             except Exception as log_error:
                 logger.error(f"记录Redis访问日志失败: {log_error}")
     
+    def get_raw(self, key: str) -> Optional[str]:
+        """获取缓存的原始JSON文本（不反序列化），用于直接返回响应"""
+        if not self.is_available():
+            return None
+        
+        try:
+            return self.redis_client.get(key)
+        except Exception as e:
+            logger.error(f"Redis获取缓存失败 {key}: {e}")
+            return None
+        finally:
+            # 记录简化的访问日志
+            try:
+                from app.database import get_db
+                db = next(get_db())
+                backend_ip = get_real_ip(get_local_ip())
+                log_redis_access(db=db, backend_ip=backend_ip)
+            except Exception as log_error:
+                logger.error(f"记录Redis访问日志失败: {log_error}")
+    
+    def set_raw(self, key: str, value: Union[bytes, str], expire_seconds: Optional[int] = None) -> bool:
+        """缓存已经序列化好的JSON文本"""
+        if not self.is_available():
+            return False
+        
+        try:
+            if expire_seconds:
+                return self.redis_client.setex(key, expire_seconds, value)
+            return self.redis_client.set(key, value)
+        except Exception as e:
+            logger.error(f"Redis设置缓存失败 {key}: {e}")
+            return False
+        finally:
+            # 记录简化的访问日志
+            try:
+                from app.database import get_db
+                db = next(get_db())
+                backend_ip = get_real_ip(get_local_ip())
+                log_redis_access(db=db, backend_ip=backend_ip)
+            except Exception as log_error:
+                logger.error(f"记录Redis访问日志失败: {log_error}")
+    
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """批量获取缓存值（一次MGET），返回与keys顺序一致的列表，未命中为None"""
+        if not keys or not self.is_available():
+            return [None] * len(keys)
+        
+        try:
+            values = self.redis_client.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis批量获取缓存失败: {e}")
+            return [None] * len(keys)
+        finally:
+            # 记录简化的访问日志
+            try:
+                from app.database import get_db
+                db = next(get_db())
+                backend_ip = get_real_ip(get_local_ip())
+                log_redis_access(db=db, backend_ip=backend_ip)
+            except Exception as log_error:
+                logger.error(f"记录Redis访问日志失败: {log_error}")
+        
+        results = []
+        for key, value in zip(keys, values):
+            if not value:
+                results.append(None)
+                continue
+            try:
+                results.append(json.loads(value))
+            except json.JSONDecodeError as e:
+                logger.error(f"Redis获取缓存失败 {key}: {e}")
+                results.append(None)
+        return results
+    
+    def set_many(self, items: Dict[str, Any], expire_seconds: Optional[int] = None) -> bool:
+        """批量设置缓存值（一次pipeline往返）"""
+        if not items or not self.is_available():
+            return False
+        
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key, value in items.items():
+                processed_value = self._preprocess_for_serialization(value)
+                serialized_value = json.dumps(processed_value, default=self._json_serializer)
+                if expire_seconds:
+                    pipeline.setex(key, expire_seconds, serialized_value)
+                else:
+                    pipeline.set(key, serialized_value)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis批量设置缓存失败: {e}")
+            return False
+        finally:
+            # 记录简化的访问日志
+            try:
+                from app.database import get_db
+                db = next(get_db())
+                backend_ip = get_real_ip(get_local_ip())
+                log_redis_access(db=db, backend_ip=backend_ip)
+            except Exception as log_error:
+                logger.error(f"记录Redis访问日志失败: {log_error}")
+    
+    def record_access(self, name: str, hit: bool):
+        """累计接口缓存命中/未命中次数（Redis哈希，多进程共享）"""
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.hincrby(CACHE_STATS_HITS if hit else CACHE_STATS_MISSES, name, 1)
+        except Exception as e:
+            logger.error(f"Redis记录缓存命中统计失败 {name}: {e}")
+    
+    def get_hit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各接口的缓存命中次数、未命中次数和命中率"""
+        if not self.is_available():
+            return {}
+        hits = self.redis_client.hgetall(CACHE_STATS_HITS) or {}
+        misses = self.redis_client.hgetall(CACHE_STATS_MISSES) or {}
+        stats = {}
+        for name in sorted(set(hits) | set(misses)):
+            hit_count = int(hits.get(name, 0))
+            miss_count = int(misses.get(name, 0))
+            stats[name] = {
+                "hits": hit_count,
+                "misses": miss_count,
+                "hit_rate": round(hit_count / (hit_count + miss_count), 4)
+            }
+        return stats
+    
+    def reset_hit_stats(self) -> bool:
+        """清空缓存命中统计"""
+        if not self.is_available():
+            return False
+        self.redis_client.delete(CACHE_STATS_HITS, CACHE_STATS_MISSES)
+        return True
+    
     def _preprocess_for_serialization(self, obj, visited=None):
         """预处理对象以处理循环引用"""
         if visited is None:
@@ -112,6 +253,10 @@ class RedisCache:
         if isinstance(obj, (str, int, float, bool, type(None))):
             return obj
         
+        # 时间按ISO格式保存，与Pydantic JSON模式输出一致
+        if isinstance(obj, datetime):
+            return format_datetime(obj)
+        
         # 添加到已访问集合
         visited.add(obj_id)
         
@@ -125,7 +270,7 @@ class RedisCache:
                 result = [self._preprocess_for_serialization(item, visited.copy()) for item in obj]
                 return result
             elif hasattr(obj, 'model_dump') and callable(getattr(obj, 'model_dump')):
-                return self._preprocess_for_serialization(obj.model_dump(), visited.copy())
+                return self._preprocess_for_serialization(obj.model_dump(mode="json"), visited.copy())
             elif hasattr(obj, 'dict') and callable(getattr(obj, 'dict')):
                 return self._preprocess_for_serialization(obj.dict(), visited.copy())
             elif hasattr(obj, '__dict__'):
@@ -0,0 +1,131 @@
+"""
+条件GET（ETag / If-None-Match）
+
+轮询的看板大多数时候拿到的是同一份数据。在接口上挂 conditional_get 依赖后：
+
+1. 由数据新鲜度廉价地计算版本：请求时间段已经结束并稳定时取已稳定数据版本号（回填、删除分区时递增）；
+   否则取最大id（单IP接口取该IP最新一条记录的id，只走索引）。需要告警规则的接口再加上规则版本号
+   （Redis不可用时为规则集指纹）和下一个规则生效时间边界；读取后台告警状态（source=state）时
+   再加上告警评估水位
+2. 版本与请求路径、查询参数一起生成弱ETag，If-None-Match匹配时直接返回304，
+   不查询数据、不构造也不序列化响应体
+3. 未命中时由 etag_middleware 把ETag写入200响应头
+
+请求体参与查询的接口（如GET /node-monitor/ip-metrics 带请求体）不能使用。
+"""
+
+import hashlib
+import time
+from typing import Callable, Optional
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.auth import get_current_user, User
+from app.config import settings
+from app.replicas import get_read_db
+from app.rule_cache import current_rules_version, rule_plan_cache
+from app.series_cache import current_closed_data_version
+from app.watermarks import get_watermark
+from app.alert_state import ALERT_STATE_WATERMARK
+from app.decorators import time_bucket_seconds
+
+def data_version(db: Session, end_time: Optional[int], ip: Optional[str] = None) -> str:
+    """
+    时间段数据的版本
+
+    时间段结束超过 SERIES_CACHE_SETTLE_SECONDS 后只在回填和删除分区时变化，取已稳定数据版本号；
+    否则（或Redis不可用时）单IP取该IP最新记录的id，全体取全表最大id（主键索引）。
+    """
+    if end_time is not None and end_time + settings.series_cache_settle_seconds <= int(time.time()):
+        closed_version = current_closed_data_version()
+        if closed_version is not None:
+            return f"closed:{closed_version}"
+    if ip:
+        result = db.execute(text("""
+            SELECT id FROM node_monitor_metrics
+            WHERE ip = :ip
+            ORDER BY ts DESC, id DESC
+            LIMIT 1
+        """), {"ip": ip})
+    else:
+        result = db.execute(text("SELECT MAX(id) FROM node_monitor_metrics"))
+    return str(result.scalar() or 0)
+
+def rules_version(db: Session) -> str:
+    """告警规则集指纹（规则表很小，直接对所有规则内容取摘要）"""
+    result = db.execute(text("""
+        SELECT id, rule_name, rule_type, target_ip, condition_field, condition_operator, condition_value,
+               time_range_start, time_range_end, duration_seconds, alert_level, alert_message, is_active
+        FROM alert_rules
+        ORDER BY id
+    """))
+    digest = hashlib.md5()
+    for row in result:
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    return digest.hexdigest()
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag.removeprefix("W/") for candidate in candidates
+    )
+
+def conditional_get(per_ip: bool = False, rules: bool = False, time_bucket: Optional[str] = None) -> Callable:
+    """
+    生成条件GET依赖
+
+    Args:
+        per_ip: 数据版本取路径参数ip对应IP的最新记录
+        rules: 响应依赖告警规则（告警、评分），版本包含规则集指纹
+        time_bucket: 与 @cached 的time_bucket一致，按对齐后的end_time判断时间段是否已结束
+    """
+    async def check(
+        request: Request,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+    ):
+        end_time = _parse_int(request.query_params.get("end_time"))
+        bucket_seconds = time_bucket_seconds(time_bucket) if time_bucket else 0
+        if end_time is not None and bucket_seconds > 0:
+            end_time = -(-end_time // bucket_seconds) * bucket_seconds
+
+        parts = [
+            request.url.path,
+            "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items())),
+            await db.run_sync(data_version, end_time, request.path_params.get("ip") if per_ip else None),
+        ]
+        if rules:
+            # 规则版本号（Redis，规则变更时递增）；Redis不可用时对规则内容取摘要
+            parts.append(current_rules_version() or await db.run_sync(rules_version))
+            # 规则按当前时间判断是否生效，跨过生效时间边界后结果变化（已结束的时间段也是如此）
+            plan = await rule_plan_cache.get_plan_async()
+            parts.append(str(plan.valid_until))
+            if request.query_params.get("source") == "state":
+                # 告警状态由后台任务在新数据之后更新，不随数据版本同时变化
+                parts.append(str(await db.run_sync(get_watermark, ALERT_STATE_WATERMARK)))
+        etag = 'W/"' + hashlib.md5("|".join(parts).encode("utf-8")).hexdigest() + '"'
+
+        request.state.etag = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    return check
+
+async def etag_middleware(request: Request, call_next):
+    """为使用条件GET的接口的200响应加上ETag"""
+    response = await call_next(request)
+    etag = getattr(request.state, "etag", None)
+    if etag and response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
@@ -1,21 +1,46 @@
 from sqlalchemy import create_engine, MetaData, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 from app.access_logger import log_database_access, generate_query_hash, get_client_ip, get_real_ip, get_local_ip
+import asyncio
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-# 根据数据库类型决定是否需要connect_args
-if settings.database_url.startswith("sqlite"):
-    engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(settings.database_url)
+def create_sync_engine(database_url: str):
+    """创建同步引擎，根据数据库类型决定是否需要connect_args"""
+    if database_url.startswith("sqlite"):
+        return create_engine(database_url, connect_args={"check_same_thread": False})
+    return create_engine(database_url)
+
+engine = create_sync_engine(settings.database_url)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步驱动：PostgreSQL 使用 asyncpg，SQLite 使用 aiosqlite
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+def async_database_url(database_url: str):
+    """把同步数据库URL转换为对应异步驱动的URL"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"不支持异步访问的数据库类型: {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+# 路由使用的异步引擎，查询等待数据库期间不阻塞事件循环；后台任务和脚本继续使用同步引擎
+async_engine = create_async_engine(async_database_url(settings.database_url))
+
+# 提交后不过期对象属性：路由返回的ORM对象在会话外序列化，不能再触发延迟加载
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -25,6 +50,21 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """异步数据库会话依赖（路由使用），同步的 get_db 保留给脚本和后台任务"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def record_database_access():
+    """使用独立的同步会话记录一次简化的数据库访问日志"""
+    try:
+        db = SessionLocal()
+        backend_ip = get_real_ip(get_local_ip())
+        log_database_access(db=db, backend_ip=backend_ip)
+        db.close()
+    except Exception as log_error:
+        logger.error(f"记录数据库访问日志失败: {log_error}")
+
 # 数据库访问日志监听器
 @event.listens_for(engine, "before_execute")
 def before_execute(conn, clauseelement, multiparams, params, execution_options):
@@ -39,14 +79,8 @@ def after_execute(conn, clauseelement, multiparams, params, execution_options, r
         if "SERVICE_ACCESS_LOGS" in sql:
             return
         
-        # 异步记录简化的数据库访问日志
-        try:
-            db = SessionLocal()
-            backend_ip = get_real_ip(get_local_ip())
-            log_database_access(db=db, backend_ip=backend_ip)
-            db.close()
-        except Exception as log_error:
-            logger.error(f"记录数据库访问日志失败: {log_error}")
+        # 记录简化的数据库访问日志
+        record_database_access()
             
     except Exception as e:
         logger.error(f"数据库访问日志处理失败: {e}")
@@ -69,4 +103,23 @@ def handle_error(exception_context):
             logger.error(f"记录数据库错误日志失败: {log_error}")
             
     except Exception as e:
-        logger.error(f"数据库错误日志处理失败: {e}")
\ No newline at end of file
+        logger.error(f"数据库错误日志处理失败: {e}")
+
+# 异步引擎的访问日志：语句在事件循环线程上执行，日志写入使用同步会话，放到线程池中执行
+@event.listens_for(async_engine.sync_engine, "after_execute")
+def async_after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+    try:
+        if "SERVICE_ACCESS_LOGS" in str(clauseelement).upper():
+            return
+        asyncio.get_running_loop().run_in_executor(None, record_database_access)
+    except Exception as e:
+        logger.error(f"数据库访问日志处理失败: {e}")
+
+@event.listens_for(async_engine.sync_engine, "handle_error")
+def async_handle_error(exception_context):
+    try:
+        if "SERVICE_ACCESS_LOGS" in str(exception_context.statement).upper():
+            return
+        asyncio.get_running_loop().run_in_executor(None, record_database_access)
+    except Exception as e:
+        logger.error(f"数据库错误日志处理失败: {e}")
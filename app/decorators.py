@@ -1,20 +1,53 @@
 import functools
 import hashlib
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, Optional
 from app.cache import cache, CacheTTL, cache_key
+from app.config import settings
+from app.utils.fast_json import FastJSONResponse, dumps
 
-def cached(ttl_seconds: int, key_prefix: str = "", key_func: Optional[Callable] = None):
+def time_bucket_seconds(name: str) -> int:
+    """接口的缓存时间桶宽度（秒），未开启对齐时返回0"""
+    if not settings.cache_time_bucket_enabled:
+        return 0
+    return settings.cache_time_bucket_overrides.get(name, settings.cache_time_bucket_seconds)
+
+def align_time_range(kwargs: Dict[str, Any], bucket_seconds: int) -> Dict[str, Any]:
+    """
+    把start_time向下、end_time向上对齐到时间桶边界
+    
+    对齐后的时间段总是覆盖请求的时间段，同一时间桶内发出的请求得到相同的缓存键和结果。
+    """
+    if bucket_seconds <= 0:
+        return kwargs
+    aligned = dict(kwargs)
+    if isinstance(aligned.get("start_time"), int):
+        aligned["start_time"] = aligned["start_time"] // bucket_seconds * bucket_seconds
+    if isinstance(aligned.get("end_time"), int):
+        aligned["end_time"] = -(-aligned["end_time"] // bucket_seconds) * bucket_seconds
+    return aligned
+
+def cached(ttl_seconds: int, key_prefix: str = "", key_func: Optional[Callable] = None,
+           time_bucket: Optional[str] = None, raw_response: bool = False):
     """
     缓存装饰器
     
     Args:
         ttl_seconds: 缓存过期时间（秒）
         key_prefix: 缓存键前缀
-        key_func: 自定义缓存键生成函数，接收函数参数，返回字符串
+        key_func: 自定义缓存键生成函数，接收函数参数，返回字符串；返回None时不缓存
+        time_bucket: 接口名，开启CACHE_TIME_BUCKET_ENABLED时按该接口的桶宽度对齐
+                     start_time/end_time后再生成缓存键和执行查询；同时用作命中统计的名称
+        raw_response: 用orjson把结果序列化为JSON字节并返回原始Response，跳过response_model校验；
+                      缓存中保存序列化后的JSON，命中时不经反序列化直接返回
     """
     def decorator(func: Callable) -> Callable:
+        stats_name = time_bucket or func.__name__
+        
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
+            if time_bucket:
+                kwargs = align_time_range(kwargs, time_bucket_seconds(time_bucket))
+            
             # 生成缓存键
             if key_func:
                 # 提取key_func需要的参数，排除依赖注入的参数
@@ -28,6 +61,10 @@ def cached(ttl_seconds: int, key_prefix: str = "", key_func: Optional[Callable]
                         key_func_params[param_name] = kwargs[param_name]
                 
                 cache_key_str = key_func(**key_func_params)
+                # key_func返回None表示该请求不使用整体缓存（如由分段缓存处理）
+                if cache_key_str is None:
+                    result = await func(*args, **kwargs)
+                    return FastJSONResponse(result) if raw_response else result
             else:
                 # 默认使用函数名和参数哈希作为键
                 # 排除依赖注入的参数
@@ -37,8 +74,20 @@ def cached(ttl_seconds: int, key_prefix: str = "", key_func: Optional[Callable]
                 params_hash = hashlib.md5(params_str.encode()).hexdigest()[:8]
                 cache_key_str = cache_key(key_prefix, func.__name__, params_hash)
             
+            if raw_response:
+                cached_body = cache.get_raw(cache_key_str)
+                cache.record_access(stats_name, cached_body is not None)
+                if cached_body is not None:
+                    if isinstance(cached_body, str):
+                        cached_body = cached_body.encode("utf-8")
+                    return FastJSONResponse(cached_body)
+                body = dumps(await func(*args, **kwargs))
+                cache.set_raw(cache_key_str, body, ttl_seconds)
+                return FastJSONResponse(body)
+            
             # 尝试从缓存获取
             cached_result = cache.get(cache_key_str)
+            cache.record_access(stats_name, cached_result is not None)
             if cached_result is not None:
                 return cached_result
             
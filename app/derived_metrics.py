@@ -0,0 +1,118 @@
+"""
+衍生指标计算内核
+
+节点监控、告警引擎和评分系统共用的五维使用率计算。输入为按字段组织的列式数据
+（每个字段一个NumPy数组，缺失值为NaN），一次性向量化计算整批记录的衍生指标，
+避免逐行调用Python函数。
+
+计算口径：
+- CPU使用率 = cpu_usr + cpu_sys + cpu_iow
+- 内存使用率 = (1 - mem_free / mem_total) * 100
+- Swap使用率 = swap_used / swap_total * 100
+- 网络速率 = max(0, net_rx_kbps) + max(0, net_tx_kbps)
+- 磁盘使用率 = disk_used_percent
+所有结果保留两位小数，无法计算时为NaN（输出时转换为None）。
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+# 计算衍生指标需要的原始字段
+DERIVED_SOURCE_FIELDS = [
+    "cpu_usr", "cpu_sys", "cpu_iow",
+    "mem_total", "mem_free",
+    "swap_total", "swap_used",
+    "disk_used_percent",
+    "net_rx_kbps", "net_tx_kbps",
+]
+
+# 衍生指标名称
+DERIVED_METRIC_FIELDS = [
+    "cpu_usage_rate",
+    "memory_usage_rate",
+    "swap_usage_rate",
+    "network_rate",
+    "disk_usage_rate",
+]
+
+# 衍生指标的SQL表达式，与向量化计算口径一致（除两位小数取整外）
+DERIVED_METRIC_SQL = {
+    "cpu_usage_rate": "cpu_usr + cpu_sys + cpu_iow",
+    "memory_usage_rate": "CASE WHEN mem_total > 0 THEN (1 - CAST(mem_free AS DOUBLE PRECISION) / mem_total) * 100 END",
+    "swap_usage_rate": "CASE WHEN swap_total > 0 THEN CAST(swap_used AS DOUBLE PRECISION) / swap_total * 100 END",
+    "network_rate": "(CASE WHEN net_rx_kbps < 0 THEN 0 ELSE net_rx_kbps END) + (CASE WHEN net_tx_kbps < 0 THEN 0 ELSE net_tx_kbps END)",
+    "disk_usage_rate": "disk_used_percent",
+}
+
+def rounded_metric_sql(field: str) -> str:
+    """衍生指标保留两位小数的SQL表达式，SQL中的比较和排序与向量化计算的输出值一致"""
+    return f"CAST(ROUND(CAST(({DERIVED_METRIC_SQL[field]}) AS NUMERIC), 2) AS DOUBLE PRECISION)"
+
+# 五维名称与衍生指标的对应关系
+DIMENSION_METRICS = {
+    "CPU": "cpu_usage_rate",
+    "内存": "memory_usage_rate",
+    "磁盘": "disk_usage_rate",
+    "网络": "network_rate",
+    "Swap": "swap_usage_rate",
+}
+
+def to_column(values: Iterable) -> np.ndarray:
+    """将一列可能包含None的值转换为float64数组，None转换为NaN"""
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+def columns_from_rows(rows: Sequence, fields: Sequence[str]) -> Dict[str, np.ndarray]:
+    """将行记录（查询结果行或ORM对象）转换为按字段组织的列式数据"""
+    return {
+        field: to_column(getattr(row, field) for row in rows)
+        for field in fields
+    }
+
+def to_optional_list(column: np.ndarray) -> List[Optional[float]]:
+    """将数组转换为Python列表，NaN转换为None"""
+    return [None if value != value else value for value in column.tolist()]
+
+def clean_network(net_rx_kbps: np.ndarray, net_tx_kbps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """清理网络数据：负数和缺失值都视为0"""
+    clean_rx = np.where(net_rx_kbps >= 0, net_rx_kbps, 0.0)
+    clean_tx = np.where(net_tx_kbps >= 0, net_tx_kbps, 0.0)
+    return clean_rx, clean_tx
+
+def compute_derived_metrics(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    向量化计算一批记录的衍生指标
+
+    Args:
+        columns: 包含DERIVED_SOURCE_FIELDS各字段的列式数据，长度一致
+
+    Returns:
+        衍生指标名称到结果数组的映射，无法计算的位置为NaN
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cpu_usage = columns["cpu_usr"] + columns["cpu_sys"] + columns["cpu_iow"]
+
+        mem_total = columns["mem_total"]
+        memory_usage = np.where(mem_total > 0, (1 - columns["mem_free"] / mem_total) * 100, np.nan)
+
+        swap_total = columns["swap_total"]
+        swap_usage = np.where(swap_total > 0, columns["swap_used"] / swap_total * 100, np.nan)
+
+        net_rx = columns["net_rx_kbps"]
+        net_tx = columns["net_tx_kbps"]
+        network_rate = np.where(
+            np.isnan(net_rx) | np.isnan(net_tx),
+            np.nan,
+            np.maximum(net_rx, 0) + np.maximum(net_tx, 0)
+        )
+
+    return {
+        "cpu_usage_rate": np.round(cpu_usage, 2),
+        "memory_usage_rate": np.round(memory_usage, 2),
+        "swap_usage_rate": np.round(swap_usage, 2),
+        "network_rate": np.round(network_rate, 2),
+        "disk_usage_rate": np.round(columns["disk_used_percent"], 2),
+    }
+
+def derived_metrics_for_rows(rows: Sequence) -> Dict[str, np.ndarray]:
+    """对一批行记录计算衍生指标"""
+    return compute_derived_metrics(columns_from_rows(rows, DERIVED_SOURCE_FIELDS))
@@ -0,0 +1,270 @@
+"""
+node_monitor_metrics 批量写入
+
+/node-monitor/ingest 接收NDJSON（或JSON数组）和msgpack格式的样本批次：
+
+1. 解析：orjson / msgpack 解析为样本dict列表
+2. 校验：按字段把整批样本转换为numpy数组，向量化检查必填、数值类型、整数和取值范围，
+   只有类型转换失败的字段才逐个元素定位错误
+3. 写入：PostgreSQL 使用 COPY FROM STDIN（CSV格式）一次写入整批，其他数据库使用 executemany
+
+每个阶段的耗时随响应返回。
+"""
+
+import csv
+import io
+import time
+from itertools import repeat
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import orjson
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import NodeMonitorMetrics
+from app.series_cache import bump_closed_data_version
+
+try:
+    import msgpack
+except ImportError:  # msgpack 为可选依赖，未安装时只接受NDJSON
+    msgpack = None
+
+# 可写入的字段：id 由序列生成，inserted_at 由数据库默认值填充
+INGEST_COLUMNS = [
+    column.name for column in NodeMonitorMetrics.__table__.columns
+    if column.name not in ("id", "inserted_at")
+]
+TEXT_COLUMNS = ["disk_name", "version"]
+FLOAT_COLUMNS = [
+    "cpu_usr", "cpu_sys", "cpu_iow", "disk_used_percent",
+    "net_rx_kbytes", "net_tx_kbytes", "net_rx_kbps", "net_tx_kbps",
+]
+INTEGER_COLUMNS = [
+    column for column in INGEST_COLUMNS
+    if column not in ["ip", "ts"] + TEXT_COLUMNS + FLOAT_COLUMNS
+]
+# 整数字段经float64校验，超过2^53的值无法精确表示
+MAX_EXACT_INTEGER = 2 ** 53
+PERCENT_COLUMNS = ["disk_used_percent"]
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/json")
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+class IngestError(ValueError):
+    """请求体无法解析"""
+
+class IngestBatchTooLarge(IngestError):
+    """批次样本数超过上限"""
+
+def parse_samples(body: bytes, content_type: str) -> List[dict]:
+    """按Content-Type解析样本批次"""
+    media_type = content_type.split(";")[0].strip().lower()
+    try:
+        if media_type in MSGPACK_MEDIA_TYPES:
+            if msgpack is None:
+                raise IngestError("服务端未安装msgpack，请使用NDJSON格式")
+            samples = msgpack.unpackb(body, raw=False)
+        elif media_type in NDJSON_MEDIA_TYPES or not media_type:
+            stripped = body.lstrip()
+            if stripped.startswith(b"["):
+                samples = orjson.loads(stripped)
+            else:
+                samples = [orjson.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            raise IngestError(f"不支持的Content-Type: {content_type}")
+    except IngestError:
+        raise
+    except Exception as e:
+        raise IngestError(f"请求体解析失败: {str(e)}")
+
+    if not isinstance(samples, list):
+        raise IngestError("请求体应为样本列表")
+    for index, sample in enumerate(samples):
+        if not isinstance(sample, dict):
+            raise IngestError(f"第{index}个样本不是对象")
+    return samples
+
+def to_float_column(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把一列值转换为float64数组（None为NaN），返回 (数组, 无法转换的位置)
+
+    整列能直接转换时走numpy快速路径，否则逐个元素转换以定位错误。
+    """
+    try:
+        column = np.array(values, dtype=np.float64)
+        return column, ~np.isfinite(column) & ~np.isnan(column)
+    except (ValueError, TypeError):
+        column = np.full(len(values), np.nan)
+        invalid = np.zeros(len(values), dtype=bool)
+        for index, value in enumerate(values):
+            if value is None:
+                continue
+            try:
+                column[index] = float(value)
+            except (ValueError, TypeError):
+                invalid[index] = True
+        invalid |= np.isinf(column)
+        return column, invalid
+
+def to_nullable_list(column: np.ndarray, missing: np.ndarray, dtype) -> List[Any]:
+    """numpy列转换为Python列表，缺失值为None"""
+    if not missing.any():
+        return column.astype(dtype).tolist()
+    if missing.all():
+        return [None] * len(column)
+    values = np.where(missing, 0, column).astype(dtype).astype(object)
+    values[missing] = None
+    return values.tolist()
+
+def field_values(samples: List[dict], field: str) -> List[Any]:
+    """取出所有样本的某个字段，缺失为None"""
+    return list(map(dict.get, samples, repeat(field)))
+
+def validate_samples(samples: List[dict], max_errors: int = 100) -> Tuple[Dict[str, list], np.ndarray, List[dict]]:
+    """
+    向量化校验样本
+
+    返回 ({字段: 值列表}, 有效样本掩码, 错误列表)。错误最多返回max_errors条，
+    有效样本的值已规范化（整数字段为int，缺失为None）。
+    """
+    count = len(samples)
+    columns = {}
+    rejected = np.zeros(count, dtype=bool)
+    errors = []
+
+    def reject(field: str, mask: np.ndarray, detail: str):
+        nonlocal rejected
+        rejected |= mask
+        for index in np.flatnonzero(mask)[:max(0, max_errors - len(errors))]:
+            errors.append({"index": int(index), "field": field, "detail": detail})
+
+    # ip：非空字符串
+    ips = field_values(samples, "ip")
+    if set(map(type, ips)) - {str} or "" in ips:
+        reject("ip", ~np.fromiter((isinstance(ip, str) and ip != "" for ip in ips), dtype=bool, count=count), "必填，且为非空字符串")
+    columns["ip"] = ips
+
+    # ts：必填的正整数
+    ts, invalid = to_float_column(field_values(samples, "ts"))
+    missing = np.isnan(ts)
+    reject("ts", invalid | missing | (~missing & ((ts <= 0) | (ts != np.floor(ts)))), "必填，且为正整数时间戳")
+    columns["ts"] = to_nullable_list(ts, missing, np.int64)
+
+    for field in FLOAT_COLUMNS + INTEGER_COLUMNS:
+        column, invalid = to_float_column(field_values(samples, field))
+        missing = np.isnan(column)
+        reject(field, invalid, "应为数值")
+        if field in INTEGER_COLUMNS:
+            reject(field, ~missing & ((column != np.floor(column)) | (np.abs(column) > MAX_EXACT_INTEGER)), "应为整数")
+            columns[field] = to_nullable_list(column, missing, np.int64)
+        else:
+            if field in PERCENT_COLUMNS:
+                reject(field, ~missing & ((column < 0) | (column > 100)), "应在0到100之间")
+            columns[field] = to_nullable_list(column, missing, np.float64)
+
+    for field in TEXT_COLUMNS:
+        values = field_values(samples, field)
+        if set(map(type, values)) - {str, type(None)}:
+            reject(field, ~np.fromiter((value is None or isinstance(value, str) for value in values), dtype=bool, count=count), "应为字符串")
+        columns[field] = values
+
+    return columns, ~rejected, errors
+
+def copy_rows(db: Session, rows: List[tuple]):
+    """PostgreSQL：COPY FROM STDIN 写入整批"""
+    buffer = io.StringIO()
+    # QUOTE_MINIMAL下None写为未加引号的空值，COPY CSV格式将其解析为NULL
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY node_monitor_metrics ({', '.join(INGEST_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def executemany_rows(db: Session, rows: List[tuple]):
+    """
+    其他数据库：编译一次INSERT语句，直接交给驱动executemany（不逐行构造参数dict）
+
+    id由数据库分配（SQLite 中为自增的 INTEGER PRIMARY KEY），不在客户端计算，并发写入时也不会冲突或乱序。
+    """
+    dialect = db.get_bind().dialect
+    columns = list(INGEST_COLUMNS)
+    statement = insert(NodeMonitorMetrics.__table__).compile(dialect=dialect, column_keys=columns)
+    if statement.positional:
+        order = [columns.index(name) for name in statement.positiontup]
+        if order != list(range(len(columns))):
+            rows = [tuple(row[index] for index in order) for row in rows]
+    else:
+        rows = [dict(zip(columns, row)) for row in rows]
+    db.connection().exec_driver_sql(statement.string, rows)
+
+def write_samples(db: Session, columns: Dict[str, list], valid: np.ndarray) -> Tuple[int, str]:
+    """写入有效样本并提交，返回 (写入条数, 写入方式)"""
+    keep = np.flatnonzero(valid)
+    if len(keep) == len(valid):
+        rows = list(zip(*(columns[column] for column in INGEST_COLUMNS)))
+    else:
+        rows = list(zip(*(np.array(columns[column], dtype=object)[keep].tolist() for column in INGEST_COLUMNS)))
+    if not rows:
+        return 0, "none"
+
+    method = "copy" if db.get_bind().dialect.name == "postgresql" else "executemany"
+    try:
+        if method == "copy":
+            copy_rows(db, rows)
+        else:
+            executemany_rows(db, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows), method
+
+def is_backfill(ts: List[Any], valid: np.ndarray) -> bool:
+    """有效样本中是否有时间已稳定（结束超过 SERIES_CACHE_SETTLE_SECONDS）的回填数据"""
+    oldest = np.asarray(ts, dtype=object)[valid].min()
+    return oldest + settings.series_cache_settle_seconds <= int(time.time())
+
+def ingest_samples(db: Session, body: bytes, content_type: str, skip_invalid: bool) -> dict:
+    """
+    解析、校验并写入一个批次
+
+    skip_invalid为False时，存在无效样本则整批不写入。
+    """
+    started = time.perf_counter()
+    samples = parse_samples(body, content_type)
+    if len(samples) > settings.ingest_max_batch_size:
+        raise IngestBatchTooLarge(f"单批最多 {settings.ingest_max_batch_size} 个样本，实际 {len(samples)} 个")
+    parsed = time.perf_counter()
+
+    columns, valid, errors = validate_samples(samples)
+    validated = time.perf_counter()
+
+    rejected = int(len(samples) - valid.sum())
+    inserted, method = 0, "none"
+    if samples and (skip_invalid or rejected == 0):
+        inserted, method = write_samples(db, columns, valid)
+        if inserted and is_backfill(columns["ts"], valid):
+            # 写入了已稳定时间段的数据，该时间段的ETag需要变化
+            bump_closed_data_version()
+    finished = time.perf_counter()
+
+    total = finished - started
+    return {
+        "received": len(samples),
+        "inserted": inserted,
+        "rejected": rejected,
+        "errors": errors,
+        "method": method,
+        "timings": {
+            "parse_ms": round((parsed - started) * 1000, 2),
+            "validate_ms": round((validated - parsed) * 1000, 2),
+            "write_ms": round((finished - validated) * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+        },
+        "samples_per_second": round(inserted / total, 1) if total > 0 else 0.0,
+    }
@@ -0,0 +1,126 @@
+"""
+按小时的活跃IP HyperLogLog 草图
+
+每个整点小时在Redis中保存一个HLL（PFADD该小时上报过数据的IP），长时间范围的去重IP数
+通过对各小时草图执行 PFCOUNT（并集基数，标准误差约0.81%）得到，不再扫描原始记录：
+
+- 预聚合任务处理每批新记录后，把本批涉及的 (ip, 小时) 写入对应草图
+- 草图缺失（Redis清空、任务启动前的历史数据）时由 node_metrics_rollups 的1小时粒度数据重建
+- 时间范围首尾不足一小时的部分查询原始表，写入临时草图后一起参与 PFCOUNT
+
+草图键不在 node_monitor:* 命名空间下，按模式清理接口缓存时不会被删除。
+"""
+
+import logging
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+from app.cache import cache, cache_key
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SKETCH_SECONDS = 3600
+
+def sketch_key(hour_start: int) -> str:
+    """生成小时草图键"""
+    return cache_key("metrics_hll", "ips", hour_start)
+
+def record_ip_hours(pairs: Iterable[Tuple[str, int]]) -> bool:
+    """把 (ip, 小时起始时间) 写入对应小时的草图（一次pipeline往返）"""
+    ips_by_hour: Dict[int, List[str]] = {}
+    for ip, hour_start in pairs:
+        ips_by_hour.setdefault(int(hour_start), []).append(ip)
+    if not ips_by_hour or not cache.is_available():
+        return False
+
+    try:
+        pipeline = cache.redis_client.pipeline(transaction=False)
+        for hour_start, ips in ips_by_hour.items():
+            pipeline.pfadd(sketch_key(hour_start), *ips)
+            pipeline.expire(sketch_key(hour_start), settings.ip_sketch_ttl_seconds)
+        pipeline.execute()
+        return True
+    except Exception as e:
+        logger.error(f"写入活跃IP草图失败: {e}")
+        return False
+
+def record_batch(db: Session, from_id: int, to_id: int) -> bool:
+    """把一批新记录 (from_id, to_id] 涉及的 (ip, 小时) 写入草图"""
+    result = db.execute(text(f"""
+        SELECT DISTINCT ip, (ts / {SKETCH_SECONDS}) * {SKETCH_SECONDS} AS hour_start
+        FROM node_monitor_metrics
+        WHERE id > :from_id AND id <= :to_id
+    """), {"from_id": from_id, "to_id": to_id})
+    return record_ip_hours(result.fetchall())
+
+def rebuild_sketches(db: Session, hours: List[int]):
+    """由1小时粒度的预聚合数据重建缺失的小时草图"""
+    if not hours:
+        return
+    query = text("""
+        SELECT ip, bucket_ts FROM node_metrics_rollups
+        WHERE resolution = :resolution AND bucket_ts IN :hours
+    """).bindparams(bindparam("hours", expanding=True))
+    result = db.execute(query, {"resolution": SKETCH_SECONDS, "hours": hours})
+    record_ip_hours(result.fetchall())
+
+def full_hours(start_time: int, end_time: int) -> Tuple[int, int]:
+    """[start_time, end_time] 内完整小时的范围 [first, last)，没有完整小时时 first >= last"""
+    first = -(-start_time // SKETCH_SECONDS) * SKETCH_SECONDS
+    last = (end_time + 1) // SKETCH_SECONDS * SKETCH_SECONDS
+    return first, last
+
+def approximate_summary(db: Session, start_time: int, end_time: int) -> Optional[Tuple[int, int]]:
+    """
+    近似统计时间段内的 (活跃IP数, 总记录数)
+
+    - 活跃IP数：完整小时的草图与首尾零散部分的IP一起 PFCOUNT
+    - 总记录数：完整小时取1小时预聚合的样本数之和，首尾零散部分查询原始表（结果精确）
+
+    没有完整小时或Redis不可用时返回None，由调用方精确统计。
+    调用方需先确认预聚合已追上最新数据（rollups_available）。
+    """
+    first, last = full_hours(start_time, end_time)
+    if first >= last or not cache.is_available():
+        return None
+    hours = list(range(first, last, SKETCH_SECONDS))
+    hour_keys = [sketch_key(hour_start) for hour_start in hours]
+
+    # 重建缺失的草图
+    pipeline = cache.redis_client.pipeline(transaction=False)
+    for key in hour_keys:
+        pipeline.exists(key)
+    missing_hours = [hour_start for hour_start, exists in zip(hours, pipeline.execute()) if not exists]
+    rebuild_sketches(db, missing_hours)
+
+    # 首尾不足一小时的部分查询原始表
+    edge_result = db.execute(text("""
+        SELECT ip, COUNT(*) AS record_count
+        FROM node_monitor_metrics
+        WHERE (ts >= :start_time AND ts < :first_hour) OR (ts >= :last_hour AND ts <= :end_time)
+        GROUP BY ip
+    """), {"start_time": start_time, "end_time": end_time, "first_hour": first, "last_hour": last})
+    edge_rows = edge_result.fetchall()
+
+    total_result = db.execute(text("""
+        SELECT COALESCE(SUM(sample_count), 0) FROM node_metrics_rollups
+        WHERE resolution = :resolution AND bucket_ts >= :first_hour AND bucket_ts < :last_hour
+    """), {"resolution": SKETCH_SECONDS, "first_hour": first, "last_hour": last})
+    total_records = int(total_result.scalar()) + sum(row.record_count for row in edge_rows)
+
+    # 首尾部分的IP写入临时草图，与各小时草图一起计算并集基数
+    keys = list(hour_keys)
+    edge_key = None
+    if edge_rows:
+        edge_key = cache_key("metrics_hll", "tmp", uuid.uuid4().hex)
+        cache.redis_client.pfadd(edge_key, *[row.ip for row in edge_rows])
+        keys.append(edge_key)
+    try:
+        active_ip_count = int(cache.redis_client.pfcount(*keys))
+    finally:
+        if edge_key:
+            cache.redis_client.delete(edge_key)
+
+    return active_ip_count, total_records
@@ -0,0 +1,175 @@
+"""
+节点监控数据实时推送（Server-Sent Events）
+
+每个worker进程只有一个 LiveFeed 轮询任务：按自增id增量读取新写入的监控记录，
+再分发给本进程内所有订阅者的队列，由 /node-monitor/live 接口以SSE推送给客户端。
+打开的看板数量不影响数据库查询次数，每个轮询周期最多一次增量查询。
+
+推送的事件：
+- latest：连接建立时各订阅IP的最新记录（来自 node_latest_metrics 快照），之后每批新记录中各IP的最新一条
+- metrics：新写入的原始记录（字段与 /node-monitor/ip-metrics 一致）
+
+水位只保存在内存中：没有订阅者时不查询，第一个订阅者连接时从当前最大id开始。
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+from sqlalchemy import select, text, bindparam
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models import NodeMonitorMetrics
+from app.node_snapshot import SNAPSHOT_COLUMNS, is_snapshot_ready
+from app.utils.fast_json import dumps
+from app.watermarks import get_max_metrics_id, next_id_batch
+
+logger = logging.getLogger(__name__)
+
+def format_event(event: str, data) -> bytes:
+    """编码一条SSE事件"""
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+
+def latest_by_ip(records: List[dict]) -> Dict[str, dict]:
+    """每个IP取ts最大的一条记录"""
+    latest = {}
+    for record in records:
+        current = latest.get(record["ip"])
+        if current is None or record["ts"] >= current["ts"]:
+            latest[record["ip"]] = record
+    return latest
+
+def query_snapshot_records(db: Session, ips: Optional[Set[str]]) -> List[dict]:
+    """读取订阅IP在快照中的最新记录，快照尚未初始化时返回空列表"""
+    # 避免与 app.routers.node_monitor 循环导入
+    from app.routers.node_monitor import build_metric_records
+
+    if not is_snapshot_ready(db):
+        return []
+    sql = f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM node_latest_metrics"
+    # 按原始表的列类型解析结果（inserted_at 等）
+    columns = NodeMonitorMetrics.__table__.columns
+    if ips is None:
+        result = db.execute(text(sql + " ORDER BY ip").columns(*columns))
+    else:
+        query = text(sql + " WHERE ip IN :ips ORDER BY ip").bindparams(bindparam("ips", expanding=True))
+        result = db.execute(query.columns(*columns), {"ips": sorted(ips)})
+    return build_metric_records(result.fetchall())
+
+def query_new_records(db: Session, from_id: int, to_id: int, ips: Optional[Set[str]]) -> List[dict]:
+    """读取id区间 (from_id, to_id] 内的新记录，ips不为None时只读取这些IP"""
+    from app.routers.node_monitor import build_metric_records
+
+    table = NodeMonitorMetrics.__table__
+    statement = select(table).where(table.c.id > from_id, table.c.id <= to_id)
+    if ips is not None:
+        statement = statement.where(table.c.ip.in_(sorted(ips)))
+    return build_metric_records(db.execute(statement.order_by(table.c.id)).fetchall())
+
+class LiveSubscription:
+    """一个SSE连接的订阅：关注的IP（None表示全部）和待推送的事件队列"""
+
+    def __init__(self, ips: Optional[Set[str]]):
+        self.ips = ips
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.live_queue_size)
+        self.lagged = False
+
+    def publish(self, event: bytes):
+        """放入一条事件；队列已满说明客户端消费过慢，标记后由接口断开连接"""
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+            logger.warning("实时推送订阅者消费过慢，断开连接")
+
+    def dispatch(self, records: List[dict]):
+        """把一批新记录中属于本订阅的部分推送出去"""
+        if self.ips is not None:
+            records = [record for record in records if record["ip"] in self.ips]
+        if not records:
+            return
+        self.publish(format_event("metrics", records))
+        self.publish(format_event("latest", latest_by_ip(records)))
+
+class LiveFeed:
+    """按id水位增量读取新记录并分发给所有订阅者"""
+
+    def __init__(self):
+        self.running = False
+        self.last_id: Optional[int] = None
+        self.subscribers: Set[LiveSubscription] = set()
+
+    def subscribe(self, ips: Optional[Set[str]]) -> LiveSubscription:
+        """新增订阅"""
+        subscription = LiveSubscription(ips)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        """取消订阅"""
+        self.subscribers.discard(subscription)
+
+    def watched_ips(self) -> Optional[Set[str]]:
+        """所有订阅者关注的IP并集，有订阅者关注全部IP时返回None"""
+        ips = set()
+        for subscription in self.subscribers:
+            if subscription.ips is None:
+                return None
+            ips |= subscription.ips
+        return ips
+
+    def poll_once(self, db: Session, ips: Optional[Set[str]]) -> List[dict]:
+        """读取一批新记录（最多 LIVE_BATCH_SIZE 条id），首次调用只初始化水位"""
+        if self.last_id is None:
+            self.last_id = get_max_metrics_id(db)
+            return []
+        # 实时推送优先低延迟，不等待水位稳定
+        batch = next_id_batch(db, self.last_id, settings.live_batch_size, settled=False)
+        if not batch:
+            return []
+        from_id, to_id = batch
+        records = query_new_records(db, from_id, to_id, ips)
+        self.last_id = to_id
+        return records
+
+    def poll(self, ips: Optional[Set[str]]) -> List[dict]:
+        """在独立会话中读取新记录，直到追上最新数据"""
+        db = SessionLocal()
+        try:
+            records = []
+            while True:
+                last_id = self.last_id
+                records.extend(self.poll_once(db, ips))
+                if last_id is None or self.last_id - last_id < settings.live_batch_size:
+                    return records
+        finally:
+            db.close()
+
+    async def start_polling(self):
+        """启动实时推送轮询任务"""
+        self.running = True
+        logger.info("启动节点监控实时推送任务...")
+
+        while self.running:
+            if not self.subscribers:
+                # 没有订阅者时不查询，下一个订阅者从当时的最新数据开始
+                self.last_id = None
+            else:
+                try:
+                    records = await asyncio.to_thread(self.poll, self.watched_ips())
+                    if records:
+                        for subscription in list(self.subscribers):
+                            subscription.dispatch(records)
+                except Exception as e:
+                    logger.error(f"实时推送轮询失败: {e}")
+            await asyncio.sleep(settings.live_poll_seconds)
+
+    def stop(self):
+        """停止实时推送"""
+        self.running = False
+        logger.info("停止节点监控实时推送任务")
+
+# 全局实时推送实例（每个worker进程一个）
+live_feed = LiveFeed()
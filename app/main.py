@@ -4,6 +4,14 @@ from app.database import engine, Base
 from app.routers import auth, users, node_monitor, alert_management, scoring, heartbeat, cache_management, user_profile
 from app.access_logger import set_client_ip, RequestLoggingMiddleware
 from app.heartbeat_checker import heartbeat_checker
+from app.node_snapshot import node_snapshot_refresher
+from app.nodes import node_registry_worker
+from app.rollups import node_rollup_worker
+from app.partitions import partition_manager
+from app.live_feed import live_feed
+from app.replicas import replica_pool
+from app.alert_state import alert_state_evaluator
+from app.conditional import etag_middleware
 import asyncio
 import logging
 
@@ -34,6 +42,9 @@ app.add_middleware(
 # 添加请求日志中间件
 app.add_middleware(RequestLoggingMiddleware)
 
+# 条件GET：为挂了conditional_get依赖的接口加上ETag响应头
+app.middleware("http")(etag_middleware)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     # 获取客户端IP地址
@@ -64,7 +75,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "database_replicas": replica_pool.status()}
 
 @app.on_event("startup")
 async def startup_event():
@@ -74,9 +85,44 @@ async def startup_event():
     # 在后台启动心跳检查任务
     asyncio.create_task(heartbeat_checker.start_heartbeat_check())
     logger.info("心跳检查任务已启动")
+    
+    # 在后台启动节点最新数据快照刷新任务
+    asyncio.create_task(node_snapshot_refresher.start_refresh())
+    logger.info("节点快照刷新任务已启动")
+    
+    # 在后台启动节点注册表刷新任务
+    asyncio.create_task(node_registry_worker.start_refresh())
+    logger.info("节点注册表刷新任务已启动")
+    
+    # 在后台启动监控数据预聚合任务
+    asyncio.create_task(node_rollup_worker.start_refresh())
+    logger.info("监控数据预聚合任务已启动")
+    
+    # 在后台启动告警评估任务（维护alert_events告警状态）
+    asyncio.create_task(alert_state_evaluator.start_refresh())
+    logger.info("后台告警评估任务已启动")
+    
+    # 在后台启动监控数据分区维护任务
+    asyncio.create_task(partition_manager.start_maintenance())
+    logger.info("监控数据分区维护任务已启动")
+    
+    # 在后台启动节点监控实时推送轮询任务
+    asyncio.create_task(live_feed.start_polling())
+    logger.info("节点监控实时推送任务已启动")
+    
+    # 在后台启动只读副本健康检查任务（未配置副本时直接结束）
+    asyncio.create_task(replica_pool.start_health_check())
+    logger.info("只读副本健康检查任务已启动")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时停止心跳检查任务"""
     logger.info("关闭应用...")
-    heartbeat_checker.stop()
\ No newline at end of file
+    heartbeat_checker.stop()
+    node_snapshot_refresher.stop()
+    node_registry_worker.stop()
+    node_rollup_worker.stop()
+    alert_state_evaluator.stop()
+    partition_manager.stop()
+    live_feed.stop()
+    replica_pool.stop()
\ No newline at end of file
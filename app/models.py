@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Float, Text, JSON, LargeBinary
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Float, Text, JSON, LargeBinary, Index
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from app.security.field_encryption import get_field_encryption_service
@@ -90,8 +90,10 @@ class User(Base):
 class NodeMonitorMetrics(Base):
     __tablename__ = "node_monitor_metrics"
     
-    id = Column(BigInteger, primary_key=True, index=True)
-    ip = Column(Text, nullable=False, index=True)
+    # 按ts分区后数据库中的主键为 (id, ts)，id 仍全局唯一（见 sql/node_monitor_metrics_partitioned.sql）
+    # SQLite 中映射为 INTEGER PRIMARY KEY（rowid别名），由数据库自增分配id
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True)
+    ip = Column(Text, nullable=False)
     ts = Column(BigInteger, nullable=False, index=True)
     cpu_usr = Column(Float)
     cpu_sys = Column(Float)
@@ -119,6 +121,117 @@ class NodeMonitorMetrics(Base):
     net_tx_kbps = Column(Float)
     version = Column(Text)
     inserted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # 索引定义与 sql/node_monitor_metrics_indexes.sql 保持一致
+    __table_args__ = (
+        # 覆盖 ip = ? AND ts BETWEEN ? AND ? 及按IP取最新记录的查询，INCLUDE衍生指标所需字段
+        Index(
+            "idx_node_monitor_metrics_ip_ts", ip, ts.desc(),
+            postgresql_include=[
+                "cpu_usr", "cpu_sys", "cpu_iow", "mem_total", "mem_free",
+                "swap_total", "swap_used", "disk_used_percent", "net_rx_kbps", "net_tx_kbps",
+            ]
+        ),
+        # 追加写入的表按时间顺序存放，BRIN索引体积极小
+        Index("idx_node_monitor_metrics_ts_brin", ts, postgresql_using="brin").ddl_if(dialect="postgresql"),
+        Index("idx_node_monitor_metrics_inserted_at_brin", inserted_at, postgresql_using="brin").ddl_if(dialect="postgresql"),
+        # 按id水位增量处理依赖id单调递增：SQLite 删除最大id的记录后也不复用
+        {"sqlite_autoincrement": True},
+    )
+
+class NodeLatestMetricsSnapshot(Base):
+    """每个节点的最新一条监控记录（由node_snapshot刷新任务按id水位增量维护）"""
+    __tablename__ = "node_latest_metrics"
+    
+    ip = Column(Text, primary_key=True)
+    id = Column(BigInteger, nullable=False)  # 来源记录在node_monitor_metrics中的id
+    ts = Column(BigInteger, nullable=False, index=True)
+    cpu_usr = Column(Float)
+    cpu_sys = Column(Float)
+    cpu_iow = Column(Float)
+    mem_total = Column(BigInteger)
+    mem_free = Column(BigInteger)
+    mem_buff = Column(BigInteger)
+    mem_cache = Column(BigInteger)
+    swap_total = Column(BigInteger)
+    swap_used = Column(BigInteger)
+    swap_in = Column(BigInteger)
+    swap_out = Column(BigInteger)
+    system_in = Column(BigInteger)
+    system_cs = Column(BigInteger)
+    disk_name = Column(Text)
+    disk_total = Column(BigInteger)
+    disk_used = Column(BigInteger)
+    disk_used_percent = Column(Float)
+    disk_iops = Column(BigInteger)
+    disk_r = Column(BigInteger)
+    disk_w = Column(BigInteger)
+    net_rx_kbytes = Column(Float)
+    net_tx_kbytes = Column(Float)
+    net_rx_kbps = Column(Float)
+    net_tx_kbps = Column(Float)
+    version = Column(Text)
+    inserted_at = Column(DateTime(timezone=True), nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class Node(Base):
+    """节点注册表：每个上报过监控数据的IP一行（由nodes任务按id水位增量维护）"""
+    __tablename__ = "nodes"
+    
+    ip = Column(Text, primary_key=True)
+    first_seen_ts = Column(BigInteger, nullable=False)  # 最早一条记录的ts
+    last_seen_ts = Column(BigInteger, nullable=False)  # 最新一条记录的ts
+    sample_count = Column(BigInteger, nullable=False, default=0)  # 累计记录数
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("idx_nodes_last_seen_ts", last_seen_ts),
+    )
+
+class MetricsWatermark(Base):
+    """增量处理node_monitor_metrics的id水位，每个后台任务一行"""
+    __tablename__ = "metrics_watermarks"
+    
+    name = Column(String(50), primary_key=True)
+    last_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# 预聚合的数值字段及每个字段保存的聚合值
+ROLLUP_METRIC_FIELDS = [
+    "cpu_usr", "cpu_sys", "cpu_iow",
+    "mem_total", "mem_free", "mem_buff", "mem_cache",
+    "swap_total", "swap_used", "swap_in", "swap_out",
+    "system_in", "system_cs",
+    "disk_total", "disk_used", "disk_used_percent", "disk_iops", "disk_r", "disk_w",
+    "net_rx_kbytes", "net_tx_kbytes", "net_rx_kbps", "net_tx_kbps",
+]
+ROLLUP_AGGREGATES = ["avg", "min", "max", "last"]
+
+class NodeMetricsRollup(Base):
+    """
+    按IP和时间桶预聚合的监控数据（由rollups任务按id水位增量维护）
+
+    resolution为桶宽度（60/300/3600秒），bucket_ts为按resolution对齐的桶起始时间。
+    每个数值字段保存 {field}_avg / {field}_min / {field}_max / {field}_last 四列，
+    网络速率先把负数视为0再聚合。
+    """
+    __tablename__ = "node_metrics_rollups"
+
+    ip = Column(Text, primary_key=True)
+    resolution = Column(Integer, primary_key=True)
+    bucket_ts = Column(BigInteger, primary_key=True)
+    sample_count = Column(BigInteger, nullable=False)
+    last_ts = Column(BigInteger, nullable=False)  # 桶内最新一条记录的ts
+    max_id = Column(BigInteger, nullable=False)  # 桶内最大的来源记录id
+    last_id = Column(BigInteger, nullable=False)  # 桶内最新一条记录的id
+    disk_name = Column(Text)
+    version = Column(Text)
+    inserted_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+for _field in ROLLUP_METRIC_FIELDS:
+    for _aggregate in ROLLUP_AGGREGATES:
+        setattr(NodeMetricsRollup, f"{_field}_{_aggregate}", Column(Float))
 
 class AlertRule(Base):
     __tablename__ = "alert_rules"
@@ -137,6 +250,9 @@ class AlertRule(Base):
     time_range_start = Column(BigInteger)
     time_range_end = Column(BigInteger)
     
+    # 持续时间条件：条件连续满足该时长（秒）后才告警，0表示立即告警（仅时间段评估使用）
+    duration_seconds = Column(Integer, default=0, server_default="0", nullable=False)
+    
     # 告警级别和消息
     alert_level = Column(String(20), default="warning")  # info, warning, error, critical
     alert_message = Column(Text)
@@ -146,6 +262,47 @@ class AlertRule(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True))
 
+class AlertEvent(Base):
+    """
+    告警事件：一条规则在一个IP上从触发到恢复的一段持续告警
+    
+    由后台告警评估任务（app/alert_state.py）按id水位增量维护：规则开始命中时插入
+    status='firing' 的事件，持续命中时更新当前值和 last_ts，不再命中时置为 'resolved'
+    并记录 ended_at。每个 (ip, rule_id) 同时最多一条 firing 事件。
+    """
+    __tablename__ = "alert_events"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    ip = Column(Text, nullable=False)
+    rule_id = Column(Integer, nullable=False)
+    rule_name = Column(String(100), nullable=False)
+    rule_type = Column(String(20), nullable=False)
+    alert_level = Column(String(20), nullable=False)
+    condition_field = Column(String(50), nullable=False)
+    condition_operator = Column(String(10), nullable=False)
+    threshold_value = Column(Float, nullable=False)
+    current_value = Column(Float, nullable=False)  # 最近一次评估时的值
+    alert_message = Column(Text)
+    status = Column(String(20), nullable=False)  # "firing" 或 "resolved"
+    started_at = Column(BigInteger, nullable=False)  # 第一条命中记录的ts
+    ended_at = Column(BigInteger)  # 第一条不再命中记录的ts，firing时为NULL
+    last_ts = Column(BigInteger, nullable=False)  # 最近一次命中记录的ts
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # 索引定义与 sql/alert_events.sql 保持一致
+    __table_args__ = (
+        # 当前告警查询，同时保证每个 (ip, rule_id) 只有一条 firing 事件
+        Index(
+            "uq_alert_events_firing", ip, rule_id, unique=True,
+            postgresql_where=text("status = 'firing'"),
+            sqlite_where=text("status = 'firing'")
+        ),
+        # 告警历史按时间段查询
+        Index("idx_alert_events_started_at", started_at),
+        Index("idx_alert_events_ip_started_at", ip, started_at),
+    )
+
 class ServiceHeartbeat(Base):
     __tablename__ = "service_heartbeat"
     
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models import NodeMonitorMetrics
+from app.watermarks import get_watermark, set_watermark, get_max_metrics_id, next_id_batch
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_WATERMARK = "node_snapshot"
+
+# 快照表与node_monitor_metrics的公共字段（id为来源记录id）
+SNAPSHOT_COLUMNS = [column.name for column in NodeMonitorMetrics.__table__.columns]
+
+def _snapshot_upsert_sql() -> str:
+    """生成从一个id区间内的新记录刷新快照的UPSERT语句"""
+    columns = ", ".join(SNAPSHOT_COLUMNS)
+    updates = ",\n            ".join(
+        f"{column} = excluded.{column}" for column in SNAPSHOT_COLUMNS if column != "ip"
+    )
+    return f"""
+        INSERT INTO node_latest_metrics ({columns}, refreshed_at)
+        SELECT {columns}, CURRENT_TIMESTAMP FROM (
+            SELECT {columns},
+                   ROW_NUMBER() OVER (PARTITION BY ip ORDER BY ts DESC, id DESC) AS rn
+            FROM node_monitor_metrics
+            WHERE id > :from_id AND id <= :to_id
+        ) batch
+        WHERE rn = 1
+        ON CONFLICT (ip) DO UPDATE SET
+            {updates},
+            refreshed_at = excluded.refreshed_at
+        WHERE excluded.ts > node_latest_metrics.ts
+           OR (excluded.ts = node_latest_metrics.ts AND excluded.id > node_latest_metrics.id)
+    """
+
+SNAPSHOT_UPSERT_SQL = _snapshot_upsert_sql()
+
+def is_snapshot_ready(db: Session) -> bool:
+    """快照是否已由刷新任务初始化"""
+    return get_watermark(db, SNAPSHOT_WATERMARK) is not None
+
+def snapshot_available(db: Session) -> bool:
+    """快照是否已追上最新数据（落后不超过一批），刷新任务滞后或持续失败时查询回退到原始表"""
+    last_id = get_watermark(db, SNAPSHOT_WATERMARK)
+    if last_id is None:
+        return False
+    return get_max_metrics_id(db) - last_id <= settings.node_snapshot_batch_size
+
+def _row_to_metrics(row) -> NodeMonitorMetrics:
+    """将快照行转换为NodeMonitorMetrics对象（不加入会话）"""
+    data = row._asdict()
+    return NodeMonitorMetrics(**{column: data[column] for column in SNAPSHOT_COLUMNS})
+
+def snapshot_covers_range(db: Session, end_time: int) -> bool:
+    """
+    快照能否回答截止到end_time的"每个IP最新记录"查询
+
+    快照只保存每个IP的全局最新记录，因此仅当没有任何IP的最新记录晚于end_time时，
+    快照中ts落在时间段内的行才等价于"时间段内每个IP的最新记录"。
+    """
+    if not snapshot_available(db):
+        return False
+
+    newer = db.execute(
+        text("SELECT 1 FROM node_latest_metrics WHERE ts > :end_time LIMIT 1"),
+        {"end_time": end_time}
+    ).fetchone()
+    return newer is None
+
+def latest_metrics_sql(db: Session, end_time: int, columns: List[str]) -> str:
+    """
+    生成"时间段内每个IP最新记录"的SELECT语句，使用 :start_time / :end_time 参数
+
+    快照可以回答时读取快照（O(节点数)），否则使用窗口函数扫描时间段内的原始记录。
+    """
+    column_list = ", ".join(columns)
+    if snapshot_covers_range(db, end_time):
+        return f"""
+            SELECT {column_list}
+            FROM node_latest_metrics
+            WHERE ts BETWEEN :start_time AND :end_time
+        """
+    return f"""
+        SELECT {column_list} FROM (
+            SELECT {column_list},
+                   ROW_NUMBER() OVER (PARTITION BY ip ORDER BY ts DESC) AS rn
+            FROM node_monitor_metrics
+            WHERE ts BETWEEN :start_time AND :end_time
+        ) ranked_metrics
+        WHERE rn = 1
+    """
+
+def get_snapshot_metrics(db: Session, ip: str, start_time: Optional[int] = None,
+                         end_time: Optional[int] = None) -> Optional[NodeMonitorMetrics]:
+    """
+    从快照读取指定IP的最新记录
+
+    仅当快照记录落在给定时间段内时返回，否则返回None，由调用方回退到原始表查询。
+    """
+    if not snapshot_available(db):
+        return None
+
+    result = db.execute(text(f"""
+        SELECT {", ".join(SNAPSHOT_COLUMNS)}
+        FROM node_latest_metrics
+        WHERE ip = :ip
+    """), {"ip": ip})
+    row = result.fetchone()
+    if not row:
+        return None
+    if start_time is not None and row.ts < start_time:
+        return None
+    if end_time is not None and row.ts > end_time:
+        return None
+    return _row_to_metrics(row)
+
+class NodeSnapshotRefresher:
+    """按id水位增量刷新node_latest_metrics快照"""
+
+    def __init__(self):
+        self.running = False
+
+    def refresh_once(self, db: Session) -> int:
+        """处理一批新记录，返回本批的id跨度（0表示没有新数据）"""
+        last_id = get_watermark(db, SNAPSHOT_WATERMARK) or 0
+        batch = next_id_batch(db, last_id, settings.node_snapshot_batch_size)
+        if not batch:
+            if get_watermark(db, SNAPSHOT_WATERMARK) is None and get_max_metrics_id(db) == 0:
+                # 空表也记录水位，标记快照已可用（非空表等到第一批记录稳定后处理）
+                set_watermark(db, SNAPSHOT_WATERMARK, last_id)
+                db.commit()
+            return 0
+
+        from_id, to_id = batch
+        db.execute(text(SNAPSHOT_UPSERT_SQL), {"from_id": from_id, "to_id": to_id})
+        set_watermark(db, SNAPSHOT_WATERMARK, to_id)
+        db.commit()
+        return to_id - from_id
+
+    def refresh_until_caught_up(self):
+        """持续处理直到追上最新记录"""
+        db = SessionLocal()
+        try:
+            while self.refresh_once(db) >= settings.node_snapshot_batch_size:
+                pass
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def start_refresh(self):
+        """启动快照刷新定时任务"""
+        self.running = True
+        logger.info("启动节点最新数据快照刷新任务...")
+
+        while self.running:
+            try:
+                await asyncio.to_thread(self.refresh_until_caught_up)
+            except Exception as e:
+                logger.error(f"节点快照刷新失败: {e}")
+            await asyncio.sleep(settings.node_snapshot_refresh_seconds)
+
+    def stop(self):
+        """停止快照刷新"""
+        self.running = False
+        logger.info("停止节点最新数据快照刷新任务")
+
+# 全局快照刷新器实例
+node_snapshot_refresher = NodeSnapshotRefresher()
@@ -0,0 +1,200 @@
+"""
+节点注册表
+
+节点发现原来对 node_monitor_metrics 执行 SELECT DISTINCT ip（不带时间条件时为全表扫描）。
+nodes 表为每个IP保存一行 (ip, first_seen_ts, last_seen_ts, sample_count)，由后台任务按id水位
+增量维护：每批新记录按IP聚合后UPSERT，first_seen_ts / last_seen_ts 取较小 / 较大值，
+sample_count 累加。节点发现和节点清单读取该表，并合并水位之后尚未处理的记录（主键范围，最多一批），
+开销只与节点数量有关；注册表落后超过一批时回退到原始表。
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.node_snapshot import latest_metrics_sql
+from app.watermarks import get_watermark, set_watermark, advance_watermark, get_max_metrics_id, next_id_batch
+
+logger = logging.getLogger(__name__)
+
+NODES_WATERMARK = "nodes"
+
+# 把一个id区间内的新记录按IP聚合后合并到注册表
+# （CASE代替LEAST/GREATEST，PostgreSQL和SQLite通用）
+NODES_UPSERT_SQL = """
+    INSERT INTO nodes (ip, first_seen_ts, last_seen_ts, sample_count, updated_at)
+    SELECT ip, MIN(ts), MAX(ts), COUNT(*), CURRENT_TIMESTAMP
+    FROM node_monitor_metrics
+    WHERE id > :from_id AND id <= :to_id
+    GROUP BY ip
+    ON CONFLICT (ip) DO UPDATE SET
+        first_seen_ts = CASE WHEN excluded.first_seen_ts < nodes.first_seen_ts
+                             THEN excluded.first_seen_ts ELSE nodes.first_seen_ts END,
+        last_seen_ts = CASE WHEN excluded.last_seen_ts > nodes.last_seen_ts
+                            THEN excluded.last_seen_ts ELSE nodes.last_seen_ts END,
+        sample_count = nodes.sample_count + excluded.sample_count,
+        updated_at = excluded.updated_at
+"""
+
+def registry_watermark(db: Session) -> Optional[int]:
+    """
+    注册表的水位，尚未初始化或落后超过一批（首次回填期间、刷新任务持续失败）时返回None，读取方回退到原始表
+
+    水位之后尚未处理的记录（最多一批）由读取方按主键范围直接合并，新节点不必等到下一轮刷新。
+    """
+    last_id = get_watermark(db, NODES_WATERMARK)
+    if last_id is None or get_max_metrics_id(db) - last_id > settings.nodes_batch_size:
+        return None
+    return last_id
+
+def _query_ips(db: Session, query: str, params: dict, ips: Optional[List[str]] = None) -> List[str]:
+    """执行返回IP列的查询，ips不为空时绑定为展开参数"""
+    statement = text(query)
+    if ips:
+        statement = statement.bindparams(bindparam("ips", expanding=True))
+        params["ips"] = list(ips)
+    return [row[0] for row in db.execute(statement, params).fetchall()]
+
+def registry_covers_range(db: Session, last_id: int, end_time: int) -> bool:
+    """
+    注册表（合并水位之后的记录）能否回答"时间段内有监控数据的IP"
+
+    注册表只保存每个IP的最新上报时间，仅当注册表和水位之后的记录中都没有晚于end_time的数据时，
+    最新上报时间落在时间段内的IP才等价于时间段内有数据的IP（与快照的判断相同）。
+    """
+    newer = db.execute(text("""
+        SELECT 1 FROM nodes WHERE last_seen_ts > :end_time
+        UNION ALL
+        SELECT 1 FROM node_monitor_metrics WHERE id > :last_id AND ts > :end_time
+        LIMIT 1
+    """), {"last_id": last_id, "end_time": end_time}).fetchone()
+    return newer is None
+
+def active_node_ips(db: Session, start_time: int, end_time: int,
+                    ips: Optional[List[str]] = None) -> List[str]:
+    """时间段内有监控数据的IP（按IP排序），注册表无法回答时回退到每个IP最新记录的查询"""
+    ip_filter = " AND ip IN :ips" if ips else ""
+    last_id = registry_watermark(db)
+    if last_id is not None and registry_covers_range(db, last_id, end_time):
+        query = f"""
+            SELECT ip FROM nodes
+            WHERE last_seen_ts BETWEEN :start_time AND :end_time{ip_filter}
+            UNION
+            SELECT ip FROM node_monitor_metrics
+            WHERE id > :last_id AND ts BETWEEN :start_time AND :end_time{ip_filter}
+            ORDER BY ip
+        """
+    else:
+        query = f"""
+            SELECT ip FROM ({latest_metrics_sql(db, end_time, ["ip"])}) active_ips
+            WHERE 1 = 1{ip_filter}
+            ORDER BY ip
+        """
+    return _query_ips(db, query, {"start_time": start_time, "end_time": end_time, "last_id": last_id}, ips)
+
+def list_nodes(db: Session, start_time: Optional[int] = None, end_time: Optional[int] = None) -> list:
+    """
+    读取节点清单，按 last_seen_ts 所在时间段过滤，返回 (ip, first_seen_ts, last_seen_ts, sample_count) 行
+
+    注册表水位之后尚未处理的记录按IP聚合后合并进结果；注册表不可用时直接按IP聚合原始表。
+    """
+    conditions = []
+    params = {}
+    if start_time is not None:
+        conditions.append("last_seen_ts >= :start_time")
+        params["start_time"] = start_time
+    if end_time is not None:
+        conditions.append("last_seen_ts <= :end_time")
+        params["end_time"] = end_time
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    last_id = registry_watermark(db)
+    if last_id is None:
+        source = """
+            SELECT ip, MIN(ts) AS first_seen_ts, MAX(ts) AS last_seen_ts, COUNT(*) AS sample_count
+            FROM node_monitor_metrics
+            GROUP BY ip
+        """
+    else:
+        source = """
+            SELECT ip, MIN(first_seen_ts) AS first_seen_ts, MAX(last_seen_ts) AS last_seen_ts,
+                   CAST(SUM(sample_count) AS BIGINT) AS sample_count
+            FROM (
+                SELECT ip, first_seen_ts, last_seen_ts, sample_count FROM nodes
+                UNION ALL
+                SELECT ip, MIN(ts), MAX(ts), COUNT(*)
+                FROM node_monitor_metrics
+                WHERE id > :last_id
+                GROUP BY ip
+            ) merged
+            GROUP BY ip
+        """
+        params["last_id"] = last_id
+    return db.execute(text(f"""
+        SELECT ip, first_seen_ts, last_seen_ts, sample_count
+        FROM ({source}) node_list
+        {where}
+        ORDER BY ip
+    """), params).fetchall()
+
+class NodeRegistryWorker:
+    """按id水位增量维护nodes注册表"""
+
+    def __init__(self):
+        self.running = False
+
+    def refresh_once(self, db: Session) -> int:
+        """处理一批新记录，返回本批的id跨度（0表示没有新数据或本批已由其他worker处理）"""
+        watermark = get_watermark(db, NODES_WATERMARK)
+        last_id = watermark or 0
+        batch = next_id_batch(db, last_id, settings.nodes_batch_size)
+        if not batch:
+            if watermark is None and get_max_metrics_id(db) == 0:
+                # 空表也记录水位，标记注册表已可用（非空表等到第一批记录稳定后处理）
+                set_watermark(db, NODES_WATERMARK, last_id)
+                db.commit()
+            return 0
+
+        from_id, to_id = batch
+        # sample_count累加不是幂等的：先推进水位，同一批只由一个worker写入
+        if not advance_watermark(db, NODES_WATERMARK, watermark, to_id):
+            db.rollback()
+            return 0
+        db.execute(text(NODES_UPSERT_SQL), {"from_id": from_id, "to_id": to_id})
+        db.commit()
+        return to_id - from_id
+
+    def refresh_until_caught_up(self):
+        """持续处理直到追上最新记录"""
+        db = SessionLocal()
+        try:
+            while self.refresh_once(db) >= settings.nodes_batch_size:
+                pass
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def start_refresh(self):
+        """启动注册表刷新定时任务"""
+        self.running = True
+        logger.info("启动节点注册表刷新任务...")
+
+        while self.running:
+            try:
+                await asyncio.to_thread(self.refresh_until_caught_up)
+            except Exception as e:
+                logger.error(f"节点注册表刷新失败: {e}")
+            await asyncio.sleep(settings.nodes_refresh_seconds)
+
+    def stop(self):
+        """停止注册表刷新"""
+        self.running = False
+        logger.info("停止节点注册表刷新任务")
+
+# 全局节点注册表刷新器实例
+node_registry_worker = NodeRegistryWorker()
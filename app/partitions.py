@@ -0,0 +1,159 @@
+"""
+node_monitor_metrics 时间分区管理
+
+node_monitor_metrics 按 ts 声明式范围分区（PostgreSQL，建表与迁移见
+sql/node_monitor_metrics_partitioned.sql 和 scripts/migrate_node_monitor_partitioning.py），
+分区宽度由 METRICS_PARTITION_INTERVAL_SECONDS 配置（默认1天，按UTC对齐）。
+
+后台任务定期：
+- 预先创建当前及未来 METRICS_PARTITION_PREMAKE 个分区，写入不会落入默认分区
+- 按 METRICS_RETENTION_DAYS 整个删除过期分区（DROP TABLE），不产生大批量DELETE和VACUUM
+
+表未分区或不是PostgreSQL时任务不做任何操作。所有范围查询都带 ts BETWEEN 条件，
+PostgreSQL在规划时即可裁剪掉时间段之外的分区。
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.series_cache import bump_closed_data_version
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLE = "node_monitor_metrics"
+
+# pg_get_expr 返回的分区范围，如 FOR VALUES FROM ('1700000000') TO ('1700086400')
+_BOUND_PATTERN = re.compile(r"FROM \('?(-?\d+)'?\) TO \('?(-?\d+)'?\)")
+
+def partition_bounds(ts: int, interval: Optional[int] = None) -> Tuple[int, int]:
+    """ts所在分区的范围 [start, end)，按UTC纪元对齐"""
+    interval = interval or settings.metrics_partition_interval_seconds
+    start = ts // interval * interval
+    return start, start + interval
+
+def partition_name(start_ts: int, interval: Optional[int] = None) -> str:
+    """分区表名：按天分区为 node_monitor_metrics_p20250101，否则精确到分钟"""
+    interval = interval or settings.metrics_partition_interval_seconds
+    start = datetime.fromtimestamp(start_ts, tz=timezone.utc)
+    suffix = start.strftime("%Y%m%d") if interval % 86400 == 0 else start.strftime("%Y%m%d_%H%M")
+    return f"{PARTITIONED_TABLE}_p{suffix}"
+
+def is_partitioned(db: Session) -> bool:
+    """node_monitor_metrics 是否为分区表"""
+    if db.bind.dialect.name != "postgresql":
+        return False
+    result = db.execute(text("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = :table AND c.relnamespace = 'public'::regnamespace
+    """), {"table": PARTITIONED_TABLE})
+    return result.fetchone() is not None
+
+def list_partitions(db: Session, parent: str = PARTITIONED_TABLE) -> List[Tuple[str, int, int]]:
+    """列出所有范围分区 (name, start_ts, end_ts)，按起始时间排序，不含默认分区"""
+    result = db.execute(text("""
+        SELECT child.relname AS name, pg_get_expr(child.relpartbound, child.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table AND parent.relnamespace = 'public'::regnamespace
+    """), {"table": parent})
+
+    partitions = []
+    for row in result.fetchall():
+        match = _BOUND_PATTERN.search(row.bound or "")
+        if match:
+            partitions.append((row.name, int(match.group(1)), int(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def create_partition(db: Session, start_ts: int, end_ts: int, parent: str = PARTITIONED_TABLE) -> str:
+    """创建 [start_ts, end_ts) 的分区（已存在时跳过），不提交事务"""
+    name = partition_name(start_ts)
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} "
+        f"FOR VALUES FROM ({int(start_ts)}) TO ({int(end_ts)})"
+    ))
+    return name
+
+def ensure_partitions(db: Session, now_ts: int) -> List[str]:
+    """创建当前及未来 METRICS_PARTITION_PREMAKE 个分区，返回新建的分区名"""
+    existing = {start for _, start, _ in list_partitions(db)}
+    interval = settings.metrics_partition_interval_seconds
+    current_start, _ = partition_bounds(now_ts, interval)
+
+    created = []
+    for offset in range(settings.metrics_partition_premake + 1):
+        start = current_start + offset * interval
+        if start in existing:
+            continue
+        created.append(create_partition(db, start, start + interval))
+        db.commit()
+    return created
+
+def drop_expired_partitions(db: Session, now_ts: int) -> List[str]:
+    """整个删除结束时间早于保留期的分区，METRICS_RETENTION_DAYS为0时不删除"""
+    if settings.metrics_retention_days <= 0:
+        return []
+
+    cutoff = now_ts - settings.metrics_retention_days * 86400
+    dropped = []
+    for name, _, end_ts in list_partitions(db):
+        if end_ts > cutoff:
+            break
+        db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        db.commit()
+        dropped.append(name)
+    return dropped
+
+class PartitionManager:
+    """定期预建分区并按保留期删除过期分区"""
+
+    def __init__(self):
+        self.running = False
+
+    def maintain_once(self):
+        """执行一次分区维护"""
+        db = SessionLocal()
+        try:
+            if not is_partitioned(db):
+                return
+
+            now_ts = int(datetime.now(timezone.utc).timestamp())
+            created = ensure_partitions(db, now_ts)
+            dropped = drop_expired_partitions(db, now_ts)
+            if created:
+                logger.info(f"已创建监控数据分区: {', '.join(created)}")
+            if dropped:
+                logger.info(f"已删除过期监控数据分区: {', '.join(dropped)}")
+                bump_closed_data_version()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def start_maintenance(self):
+        """启动分区维护定时任务"""
+        self.running = True
+        logger.info("启动监控数据分区维护任务...")
+
+        while self.running:
+            try:
+                await asyncio.to_thread(self.maintain_once)
+            except Exception as e:
+                logger.error(f"监控数据分区维护失败: {e}")
+            await asyncio.sleep(settings.metrics_partition_check_seconds)
+
+    def stop(self):
+        """停止分区维护"""
+        self.running = False
+        logger.info("停止监控数据分区维护任务")
+
+# 全局分区维护实例
+partition_manager = PartitionManager()
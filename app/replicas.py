@@ -0,0 +1,175 @@
+"""
+只读副本路由
+
+主库同时承担看板查询和监控数据写入。配置 DATABASE_REPLICA_URLS 后，只读接口
+（节点监控、机器评分、告警计算、系统状态）通过 get_read_db 获取会话：
+
+1. 在健康的副本之间轮询（round-robin）选择
+2. 后台任务每 REPLICA_HEALTH_CHECK_SECONDS 秒检查一次各副本：连接失败、超时或复制延迟
+   超过 REPLICA_MAX_LAG_SECONDS 的副本暂停使用，检查通过后恢复
+3. 请求执行中副本连接断开或无法建立连接时立即暂停该副本，不必等下一次检查
+4. 没有健康的副本，或请求带 X-Read-Your-Writes 请求头时使用主库
+
+用户、告警规则、心跳上报和日志等写入以及规则管理接口仍使用主库（get_async_db）。
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Callable, List, Optional
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import (
+    AsyncSessionLocal, SessionLocal, async_database_url, create_sync_engine,
+    before_execute, after_execute, handle_error, async_after_execute, async_handle_error
+)
+
+logger = logging.getLogger(__name__)
+
+# 带该请求头（值为 1/true/yes）的只读请求使用主库，用于刚写入后需要立即读到结果的场景
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+# 复制延迟（秒）：WAL已全部回放时为0，否则为距最后一个回放事务的时间；主库上两者均为NULL，结果为0
+REPLICATION_LAG_SQL = {
+    "postgresql": """
+        SELECT CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """,
+}
+
+class Replica:
+    """一个只读副本：异步引擎供路由使用，同步引擎供流式导出使用"""
+
+    def __init__(self, name: str, database_url: str):
+        self.name = name
+        self.display_url = make_url(database_url).render_as_string(hide_password=True)
+        self.async_engine = create_async_engine(async_database_url(database_url), pool_pre_ping=True)
+        self.async_session_factory = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.engine = create_sync_engine(database_url)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        # 通过第一次健康检查之前不使用
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+
+def log_replica_access(conn, clauseelement, multiparams, params, execution_options, result):
+    """副本上的查询同样记录数据库访问日志，健康检查除外"""
+    if not execution_options.get("health_check"):
+        async_after_execute(conn, clauseelement, multiparams, params, execution_options, result)
+
+class ReplicaPool:
+    """只读副本池：轮询选择、健康检查和故障摘除"""
+
+    def __init__(self, database_urls: List[str]):
+        self.running = False
+        self.replicas = [Replica(f"replica-{index}", url) for index, url in enumerate(database_urls, start=1)]
+        self._counter = itertools.count()
+        for replica in self.replicas:
+            self._attach_listeners(replica)
+
+    def _attach_listeners(self, replica: Replica):
+        """访问日志沿用主库的监听器；连接错误时立即摘除副本"""
+        def eject_on_connection_error(exception_context):
+            # 建立连接失败时没有connection
+            if exception_context.is_disconnect or exception_context.connection is None:
+                self.eject(replica, f"连接错误: {exception_context.original_exception}")
+
+        event.listen(replica.async_engine.sync_engine, "after_execute", log_replica_access)
+        event.listen(replica.async_engine.sync_engine, "handle_error", async_handle_error)
+        event.listen(replica.async_engine.sync_engine, "handle_error", eject_on_connection_error)
+        event.listen(replica.engine, "before_execute", before_execute)
+        event.listen(replica.engine, "after_execute", after_execute)
+        event.listen(replica.engine, "handle_error", handle_error)
+        event.listen(replica.engine, "handle_error", eject_on_connection_error)
+
+    def choose(self) -> Optional[Replica]:
+        """轮询选择一个健康的副本，没有时返回None"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def eject(self, replica: Replica, reason: str):
+        """暂停使用副本，直到健康检查再次通过"""
+        replica.last_error = reason
+        if replica.healthy:
+            replica.healthy = False
+            logger.warning(f"只读副本 {replica.name} ({replica.display_url}) 暂停使用: {reason}")
+
+    async def probe(self, replica: Replica) -> float:
+        """执行一次探测查询，返回复制延迟（秒）"""
+        sql = REPLICATION_LAG_SQL.get(replica.async_engine.dialect.name, "SELECT 0")
+        async with replica.async_engine.connect() as conn:
+            result = await conn.execute(text(sql).execution_options(health_check=True))
+            return float(result.scalar() or 0)
+
+    async def check_replica(self, replica: Replica):
+        """检查一个副本，按结果摘除或恢复"""
+        replica.last_checked = time.time()
+        try:
+            lag = await asyncio.wait_for(self.probe(replica), timeout=settings.replica_health_check_timeout_seconds)
+        except Exception as e:
+            self.eject(replica, f"健康检查失败: {e!r}")
+            return
+
+        replica.lag_seconds = lag
+        if settings.replica_max_lag_seconds > 0 and lag > settings.replica_max_lag_seconds:
+            self.eject(replica, f"复制延迟 {lag:.1f}s 超过 {settings.replica_max_lag_seconds}s")
+        elif not replica.healthy:
+            replica.healthy = True
+            replica.last_error = None
+            logger.info(f"只读副本 {replica.name} ({replica.display_url}) 开始使用，复制延迟 {lag:.1f}s")
+
+    async def start_health_check(self):
+        """启动副本健康检查任务，未配置副本时直接返回"""
+        if not self.replicas:
+            return
+        self.running = True
+        logger.info(f"启动只读副本健康检查任务，共 {len(self.replicas)} 个副本...")
+
+        while self.running:
+            await asyncio.gather(*(self.check_replica(replica) for replica in self.replicas))
+            await asyncio.sleep(settings.replica_health_check_seconds)
+
+    def stop(self):
+        """停止健康检查"""
+        self.running = False
+        logger.info("停止只读副本健康检查任务")
+
+    def status(self) -> List[dict]:
+        """各副本状态"""
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag_seconds,
+            }
+            for replica in self.replicas
+        ]
+
+# 全局只读副本池
+replica_pool = ReplicaPool(settings.database_replica_urls)
+
+def wants_primary(request: Request) -> bool:
+    """请求是否要求读取主库（读己之写）"""
+    return request.headers.get(READ_YOUR_WRITES_HEADER, "").strip().lower() in ("1", "true", "yes")
+
+async def get_read_db(request: Request):
+    """只读接口的异步数据库会话依赖：轮询使用健康的副本，没有可用副本或要求读己之写时使用主库"""
+    replica = None if wants_primary(request) else replica_pool.choose()
+    session_factory = replica.async_session_factory if replica else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
+def read_session_factory(request: Request) -> Callable:
+    """只读的同步会话工厂（流式导出等在线程中执行的查询使用）"""
+    replica = None if wants_primary(request) else replica_pool.choose()
+    return replica.session_factory if replica else SessionLocal
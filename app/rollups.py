@@ -0,0 +1,299 @@
+"""
+监控数据预聚合（rollups）
+
+后台任务按 node_monitor_metrics.id 水位增量维护 node_metrics_rollups 表，
+每个IP在 1分钟 / 5分钟 / 1小时 三个粒度上保存各数值字段的 avg/min/max/last：
+
+1. 取水位之后的一批新记录，找出它们落入的 (ip, 1分钟桶)，从原始表重新计算这些桶
+2. 由刚更新的1分钟桶重新计算所在的5分钟桶，再由5分钟桶重新计算1小时桶
+3. 与聚合结果在同一事务中推进水位（先按比较并交换推进，同一批只由一个worker计算）
+4. 把本批涉及的 (ip, 小时) 写入活跃IP草图（见 app/ip_sketches.py）
+
+查询层按请求的时间桶宽度选择不超过它的最粗粒度，长时间范围的曲线只需要读取数千行预聚合数据；
+水位之后尚未聚合的记录所在的时间桶及之后的部分读取原始表。
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models import ROLLUP_METRIC_FIELDS, ROLLUP_AGGREGATES
+from app.ip_sketches import record_batch
+from app.watermarks import get_watermark, set_watermark, advance_watermark, next_id_batch, get_max_metrics_id
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_WATERMARK = "rollups"
+
+# 预聚合粒度（秒），从细到粗，每一级由上一级计算
+ROLLUP_RESOLUTIONS = (60, 300, 3600)
+
+# 网络速率先把负数视为0再聚合，与原始数据分桶查询口径一致
+NETWORK_RATE_FIELDS = ("net_rx_kbps", "net_tx_kbps")
+
+def _sample_expression(field: str) -> str:
+    """原始记录中参与聚合的字段表达式"""
+    if field in NETWORK_RATE_FIELDS:
+        return f"CASE WHEN m.{field} > 0 THEN m.{field} ELSE 0 END AS {field}"
+    return f"m.{field}"
+
+def _rollup_columns() -> List[str]:
+    columns = ["ip", "resolution", "bucket_ts", "sample_count", "last_ts", "max_id", "last_id",
+               "disk_name", "version", "inserted_at"]
+    columns += [f"{field}_{aggregate}" for field in ROLLUP_METRIC_FIELDS
+                for aggregate in ROLLUP_AGGREGATES]
+    return columns + ["updated_at"]
+
+ROLLUP_COLUMNS = _rollup_columns()
+
+def _upsert_clause() -> str:
+    updates = ",\n            ".join(
+        f"{column} = excluded.{column}"
+        for column in ROLLUP_COLUMNS if column not in ("ip", "resolution", "bucket_ts")
+    )
+    return f"""
+        ON CONFLICT (ip, resolution, bucket_ts) DO UPDATE SET
+            {updates}
+    """
+
+def _raw_rollup_sql(resolution: int) -> str:
+    """从原始记录重新计算本批记录涉及的最细粒度桶"""
+    samples = ", ".join(_sample_expression(field) for field in ROLLUP_METRIC_FIELDS)
+    aggregates = ",\n                ".join(
+        f"AVG({field}), MIN({field}), MAX({field}), MAX(CASE WHEN rn = 1 THEN {field} END)"
+        for field in ROLLUP_METRIC_FIELDS
+    )
+    return f"""
+        WITH touched AS (
+            SELECT DISTINCT ip, (ts / {resolution}) * {resolution} AS bucket_ts
+            FROM node_monitor_metrics
+            WHERE id > :from_id AND id <= :to_id
+        ),
+        ranked AS (
+            SELECT m.ip, t.bucket_ts, m.id, m.ts, m.disk_name, m.version, m.inserted_at, {samples},
+                   ROW_NUMBER() OVER (PARTITION BY m.ip, t.bucket_ts ORDER BY m.ts DESC, m.id DESC) AS rn
+            FROM node_monitor_metrics m
+            JOIN touched t ON m.ip = t.ip AND m.ts >= t.bucket_ts AND m.ts < t.bucket_ts + {resolution}
+        )
+        INSERT INTO node_metrics_rollups ({", ".join(ROLLUP_COLUMNS)})
+        SELECT ip, {resolution}, bucket_ts, COUNT(*), MAX(ts), MAX(id),
+               MAX(CASE WHEN rn = 1 THEN id END),
+               MAX(CASE WHEN rn = 1 THEN disk_name END),
+               MAX(CASE WHEN rn = 1 THEN version END),
+               MAX(inserted_at),
+               {aggregates},
+               CURRENT_TIMESTAMP
+        FROM ranked
+        WHERE true
+        GROUP BY ip, bucket_ts
+        {_upsert_clause()}
+    """
+
+def _merge_rollup_sql(source_resolution: int, resolution: int) -> str:
+    """由细一级的桶重新计算本批记录涉及的粗粒度桶，平均值按样本数加权"""
+    aggregates = ",\n                ".join(
+        f"SUM({field}_avg * sample_count) / SUM(CASE WHEN {field}_avg IS NOT NULL THEN sample_count END), "
+        f"MIN({field}_min), MAX({field}_max), MAX(CASE WHEN rn = 1 THEN {field}_last END)"
+        for field in ROLLUP_METRIC_FIELDS
+    )
+    return f"""
+        WITH touched AS (
+            SELECT DISTINCT ip, (ts / {resolution}) * {resolution} AS bucket_ts
+            FROM node_monitor_metrics
+            WHERE id > :from_id AND id <= :to_id
+        ),
+        ranked AS (
+            SELECT r.*, t.bucket_ts AS target_ts,
+                   ROW_NUMBER() OVER (PARTITION BY r.ip, t.bucket_ts ORDER BY r.bucket_ts DESC) AS rn
+            FROM node_metrics_rollups r
+            JOIN touched t ON r.ip = t.ip
+                AND r.resolution = {source_resolution}
+                AND r.bucket_ts >= t.bucket_ts AND r.bucket_ts < t.bucket_ts + {resolution}
+        )
+        INSERT INTO node_metrics_rollups ({", ".join(ROLLUP_COLUMNS)})
+        SELECT ip, {resolution}, target_ts, SUM(sample_count), MAX(last_ts), MAX(max_id),
+               MAX(CASE WHEN rn = 1 THEN last_id END),
+               MAX(CASE WHEN rn = 1 THEN disk_name END),
+               MAX(CASE WHEN rn = 1 THEN version END),
+               MAX(inserted_at),
+               {aggregates},
+               CURRENT_TIMESTAMP
+        FROM ranked
+        WHERE true
+        GROUP BY ip, target_ts
+        {_upsert_clause()}
+    """
+
+def _rollup_statements() -> List[str]:
+    statements = [_raw_rollup_sql(ROLLUP_RESOLUTIONS[0])]
+    for source_resolution, resolution in zip(ROLLUP_RESOLUTIONS, ROLLUP_RESOLUTIONS[1:]):
+        statements.append(_merge_rollup_sql(source_resolution, resolution))
+    return statements
+
+ROLLUP_STATEMENTS = _rollup_statements()
+
+def rollups_available(db: Session) -> bool:
+    """预聚合是否已追上最新数据（落后不超过一批），落后时查询回退到原始表"""
+    last_id = get_watermark(db, ROLLUP_WATERMARK)
+    if last_id is None:
+        return False
+    return get_max_metrics_id(db) - last_id <= settings.rollup_batch_size
+
+def rollup_pending_ts(db: Session) -> Optional[int]:
+    """水位之后尚未聚合的记录中最早的ts，没有待处理记录时返回None"""
+    last_id = get_watermark(db, ROLLUP_WATERMARK) or 0
+    result = db.execute(
+        text("SELECT MIN(ts) FROM node_monitor_metrics WHERE id > :last_id"),
+        {"last_id": last_id}
+    )
+    pending_ts = result.scalar()
+    return int(pending_ts) if pending_ts is not None else None
+
+def rollup_split_time(db: Session, start_time: int, end_time: int,
+                      bucket_seconds: int, resolution: int) -> int:
+    """
+    请求的时间桶中可以完全由预聚合回答的部分的结束时间（不含）
+
+    包含尚未聚合记录的预聚合桶不完整，它所归入的请求桶及之后的桶需要查询原始表；
+    返回值按请求的桶对齐，end_time + 1 表示全部由预聚合回答。
+    """
+    pending_ts = rollup_pending_ts(db)
+    if pending_ts is None:
+        return end_time + 1
+    pending_bucket_ts = pending_ts // resolution * resolution
+    if pending_bucket_ts <= start_time:
+        return start_time
+    split_time = start_time + (pending_bucket_ts - start_time) // bucket_seconds * bucket_seconds
+    return min(split_time, end_time + 1)
+
+def select_resolution(db: Session, bucket_seconds: int) -> Optional[int]:
+    """
+    选择不超过请求时间桶宽度的最粗预聚合粒度
+
+    没有合适粒度或预聚合不可用时返回None，由调用方查询原始表。
+    """
+    candidates = [resolution for resolution in ROLLUP_RESOLUTIONS if resolution <= bucket_seconds]
+    if not candidates:
+        return None
+    if not rollups_available(db):
+        return None
+    return max(candidates)
+
+def query_rollup_buckets(db: Session, ips: List[str], start_time: int, end_time: int,
+                         bucket_seconds: int, mode: str, resolution: int):
+    """
+    从预聚合表按请求的时间桶聚合多个IP（一条 ip IN 查询）
+
+    预聚合桶按起始时间归入请求的桶（bucket = (bucket_ts - start_time) / bucket_seconds），
+    时间段首尾最多包含一个预聚合桶宽度的边界数据。返回的行字段与原始数据分桶查询一致，按ip、bucket排序。
+    """
+    if mode == "avg":
+        select_fields = [
+            f"SUM({field}_avg * sample_count) / SUM(CASE WHEN {field}_avg IS NOT NULL THEN sample_count END) AS {field}"
+            for field in ROLLUP_METRIC_FIELDS
+        ]
+    elif mode in ("min", "max"):
+        agg = mode.upper()
+        select_fields = [f"{agg}({field}_{mode}) AS {field}" for field in ROLLUP_METRIC_FIELDS]
+    else:
+        select_fields = [f"MAX(CASE WHEN rn = 1 THEN {field}_last END) AS {field}" for field in ROLLUP_METRIC_FIELDS]
+
+    id_field = "MAX(CASE WHEN rn = 1 THEN last_id END)" if mode == "last" else "MAX(max_id)"
+
+    query = text(f"""
+        SELECT
+            ip,
+            bucket,
+            {id_field} AS id,
+            MAX(CASE WHEN rn = 1 THEN disk_name END) AS disk_name,
+            MAX(CASE WHEN rn = 1 THEN version END) AS version,
+            MAX(inserted_at) AS inserted_at,
+            {", ".join(select_fields)}
+        FROM (
+            SELECT r.*,
+                   (bucket_ts - :start_time) / :bucket_seconds AS bucket,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY ip, (bucket_ts - :start_time) / :bucket_seconds
+                       ORDER BY bucket_ts DESC
+                   ) AS rn
+            FROM node_metrics_rollups r
+            WHERE ip IN :ips AND resolution = :resolution
+              AND bucket_ts > :start_time - :resolution AND bucket_ts <= :end_time
+        ) buckets
+        GROUP BY ip, bucket
+        ORDER BY ip, bucket
+    """).bindparams(bindparam("ips", expanding=True))
+
+    result = db.execute(query, {
+        "ips": list(ips),
+        "start_time": start_time,
+        "end_time": end_time,
+        "bucket_seconds": bucket_seconds,
+        "resolution": resolution
+    })
+    return result.fetchall()
+
+class NodeRollupWorker:
+    """按id水位增量维护node_metrics_rollups"""
+
+    def __init__(self):
+        self.running = False
+
+    def refresh_once(self, db: Session) -> int:
+        """处理一批新记录，返回本批的id跨度（0表示没有新数据或本批已由其他worker处理）"""
+        watermark = get_watermark(db, ROLLUP_WATERMARK)
+        last_id = watermark or 0
+        batch = next_id_batch(db, last_id, settings.rollup_batch_size)
+        if not batch:
+            if watermark is None and get_max_metrics_id(db) == 0:
+                set_watermark(db, ROLLUP_WATERMARK, last_id)
+                db.commit()
+            return 0
+
+        from_id, to_id = batch
+        # 先推进水位：同一批只由一个worker重新计算，避免重复计算和并发UPSERT相互死锁
+        if not advance_watermark(db, ROLLUP_WATERMARK, watermark, to_id):
+            db.rollback()
+            return 0
+        params = {"from_id": from_id, "to_id": to_id}
+        for statement in ROLLUP_STATEMENTS:
+            db.execute(text(statement), params)
+        db.commit()
+        # 同步更新按小时的活跃IP草图（失败时查询会由预聚合数据重建）
+        record_batch(db, from_id, to_id)
+        return to_id - from_id
+
+    def refresh_until_caught_up(self):
+        """持续处理直到追上最新记录"""
+        db = SessionLocal()
+        try:
+            while self.refresh_once(db) >= settings.rollup_batch_size:
+                pass
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def start_refresh(self):
+        """启动预聚合定时任务"""
+        self.running = True
+        logger.info("启动监控数据预聚合任务...")
+
+        while self.running:
+            try:
+                await asyncio.to_thread(self.refresh_until_caught_up)
+            except Exception as e:
+                logger.error(f"监控数据预聚合失败: {e}")
+            await asyncio.sleep(settings.rollup_refresh_seconds)
+
+    def stop(self):
+        """停止预聚合任务"""
+        self.running = False
+        logger.info("停止监控数据预聚合任务")
+
+# 全局预聚合任务实例
+node_rollup_worker = NodeRollupWorker()
@@ -1,14 +1,27 @@
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import text, and_, or_
-from app.database import get_db
+from sqlalchemy import text, and_, or_, select
+from app.database import get_async_db
+from app.replicas import get_read_db
 from app.models import AlertRule, NodeMonitorMetrics
-from app.schemas import AlertRuleCreate, AlertRuleUpdate, AlertRuleResponse, AlertInfo, AlertsResponse, AlertQueryParams
+from app.schemas import AlertRuleCreate, AlertRuleUpdate, AlertRuleResponse, AlertInfo, AlertsResponse, AlertQueryParams, AlertHistoryResponse, FiringIntervalsResponse
 from app.auth import get_current_user, User, get_admin_user
 from app.cache import cache, CacheTTL, cache_key
 from app.decorators import cached, invalidate_cache_pattern
+from app.conditional import conditional_get
+from app.node_snapshot import get_snapshot_metrics, latest_metrics_sql
+from app.nodes import active_node_ips
+from app.derived_metrics import columns_from_rows
+from app.alert_evaluation import AlertPlan
+from app.rule_cache import rule_plan_cache, bump_rules_version
+from app.alert_state import get_firing_alerts, get_alert_history
+from app.alert_ranges import RangeAlertPlan, RANGE_MODES, load_samples
+from app.alert_pushdown import compile_plan_sql
+from app.config import settings
+from app.rollups import ROLLUP_RESOLUTIONS
 
 router = APIRouter(
     prefix="/alert-management",
@@ -16,14 +29,35 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 不限时间段的查询使用的结束时间（晚于任何记录的ts）
+UNBOUNDED_END_TIME = 2 ** 62
+
 class AlertRuleEngine:
-    """告警规则引擎"""
+    """告警规则引擎（规则的编译和向量化评估见 app/alert_evaluation.py）"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, plan: Optional[AlertPlan] = None):
         self.db = db
+        self._plan = plan
+    
+    @property
+    def plan(self) -> AlertPlan:
+        """
+        本引擎使用的已编译规则（来自按规则版本失效的进程内缓存）
+
+        路由应先用 rule_plan_cache.get_plan_async() 取得规则集并传入构造函数，
+        这里的同步读取只用于脚本和后台线程。
+        """
+        if self._plan is None:
+            self._plan = rule_plan_cache.get_plan()
+        return self._plan
     
     def get_latest_metrics(self, ip: str) -> Optional[NodeMonitorMetrics]:
         """获取指定IP的最新监控数据"""
+        # 优先读取最新数据快照
+        metrics = get_snapshot_metrics(self.db, ip)
+        if metrics:
+            return metrics
+        
         query = text("""
             SELECT * FROM node_monitor_metrics 
             WHERE ip = :ip 
@@ -36,228 +70,102 @@ class AlertRuleEngine:
             return NodeMonitorMetrics(**row._asdict())
         return None
     
-    def calculate_derived_metrics(self, metrics: NodeMonitorMetrics) -> Dict[str, float]:
-        """计算衍生指标"""
-        derived = {}
-        
-        # CPU使用率
-        if metrics.cpu_usr is not None and metrics.cpu_sys is not None and metrics.cpu_iow is not None:
-            derived["cpu_usage_rate"] = round(metrics.cpu_usr + metrics.cpu_sys + metrics.cpu_iow, 2)
-        
-        # 内存使用率
-        if metrics.mem_total is not None and metrics.mem_total > 0 and metrics.mem_free is not None:
-            # 使用公式：1 - free/total
-            derived["memory_usage_rate"] = round((1 - metrics.mem_free / metrics.mem_total) * 100, 2)
-        
-        # Swap使用率
-        if metrics.swap_total is not None and metrics.swap_total > 0 and metrics.swap_used is not None:
-            derived["swap_usage_rate"] = round((metrics.swap_used / metrics.swap_total) * 100, 2)
-        
-        # 网络总速率
-        if metrics.net_rx_kbps is not None and metrics.net_tx_kbps is not None:
-            rx_rate = max(0, metrics.net_rx_kbps) if metrics.net_rx_kbps is not None else 0
-            tx_rate = max(0, metrics.net_tx_kbps) if metrics.net_tx_kbps is not None else 0
-            derived["network_rate"] = round(rx_rate + tx_rate, 2)
-        
-        return derived
-    
-    def get_field_value(self, metrics: NodeMonitorMetrics, field_name: str) -> Optional[float]:
-        """获取字段值，支持衍生指标"""
-        # 先尝试衍生指标
-        derived = self.calculate_derived_metrics(metrics)
-        if field_name in derived:
-            return derived[field_name]
-        
-        # 尝试原始字段
-        if hasattr(metrics, field_name):
-            value = getattr(metrics, field_name)
-            if value is not None:
-                return float(value)
-        
-        return None
-    
-    def evaluate_condition(self, current_value: float, operator: str, threshold: float) -> bool:
-        """评估条件"""
-        if operator == ">":
-            return current_value > threshold
-        elif operator == "<":
-            return current_value < threshold
-        elif operator == ">=":
-            return current_value >= threshold
-        elif operator == "<=":
-            return current_value <= threshold
-        elif operator == "==":
-            return current_value == threshold
-        elif operator == "!=":
-            return current_value != threshold
-        return False
-    
-    def format_alert_message(self, template: str, ip: str, current_value: float, threshold: float, field_name: str) -> str:
-        """格式化告警消息"""
-        if not template:
-            template = f"IP {ip} {field_name} 值 {current_value} {field_name} 阈值 {threshold}"
-        
-        return template.format(
-            ip=ip,
-            current_value=current_value,
-            threshold=threshold,
-            threshold_value=threshold,  # 添加 threshold_value 以兼容数据库中的模板
-            field_name=field_name
-        )
+    def evaluate_metrics(self, ip: str, metrics: Optional[NodeMonitorMetrics]) -> List[AlertInfo]:
+        """用已编译的规则评估一条监控记录"""
+        if not metrics:
+            return []
+        columns = columns_from_rows([metrics], self.plan.source_fields)
+        return self.plan.evaluate_one(ip, metrics.ts, columns)
     
     def evaluate_rules_for_ip(self, ip: str) -> List[AlertInfo]:
         """评估指定IP的所有规则"""
-        metrics = self.get_latest_metrics(ip)
-        if not metrics:
-            return []
-        
-        alerts = []
-        current_time = int(datetime.now().timestamp())
-        
-        # 分别获取全局规则和该IP的个例规则
-        global_rules_query = self.db.query(AlertRule).filter(
-            AlertRule.is_active == True,
-            AlertRule.rule_type == "global"
-        ).order_by(AlertRule.id)
-        
-        specific_rules_query = self.db.query(AlertRule).filter(
-            AlertRule.is_active == True,
-            AlertRule.rule_type == "specific",
-            AlertRule.target_ip == ip
-        ).order_by(AlertRule.id)
-        
-        global_rules = global_rules_query.all()
-        specific_rules = specific_rules_query.all()
-        
-        # 构建规则冲突检测字典
-        # key: (alert_level, condition_field, condition_operator)
-        # value: specific_rule
-        specific_rule_override = {}
-        for specific_rule in specific_rules:
-            # 检查规则时间范围
-            if specific_rule.time_range_start and current_time < specific_rule.time_range_start:
-                continue
-            if specific_rule.time_range_end and current_time > specific_rule.time_range_end:
-                continue
-            
-            key = (specific_rule.alert_level, specific_rule.condition_field, specific_rule.condition_operator)
-            specific_rule_override[key] = specific_rule
-        
-        # 处理全局规则，排除被个例规则覆盖的规则
-        effective_rules = []
-        for global_rule in global_rules:
-            # 检查规则时间范围
-            if global_rule.time_range_start and current_time < global_rule.time_range_start:
-                continue
-            if global_rule.time_range_end and current_time > global_rule.time_range_end:
-                continue
-            
-            key = (global_rule.alert_level, global_rule.condition_field, global_rule.condition_operator)
-            # 如果存在相同key的个例规则，跳过这个全局规则
-            if key not in specific_rule_override:
-                effective_rules.append(global_rule)
-        
-        # 添加所有个例规则
-        for specific_rule in specific_rules:
-            # 检查规则时间范围
-            if specific_rule.time_range_start and current_time < specific_rule.time_range_start:
-                continue
-            if specific_rule.time_range_end and current_time > specific_rule.time_range_end:
-                continue
-            effective_rules.append(specific_rule)
-        
-        # 评估所有有效规则
-        for rule in effective_rules:
-            # 获取字段值
-            field_value = self.get_field_value(metrics, rule.condition_field)
-            if field_value is None:
-                continue
-            
-            # 评估条件
-            if self.evaluate_condition(field_value, rule.condition_operator, rule.condition_value):
-                alert_message = self.format_alert_message(
-                    rule.alert_message or "",
-                    ip,
-                    field_value,
-                    rule.condition_value,
-                    rule.condition_field
-                )
-                
-                alert = AlertInfo(
-                    ip=ip,
-                    rule_id=rule.id,
-                    rule_name=rule.rule_name,
-                    alert_level=rule.alert_level,
-                    alert_message=alert_message,
-                    current_value=field_value,
-                    threshold_value=rule.condition_value,
-                    condition_field=rule.condition_field,
-                    condition_operator=rule.condition_operator,
-                    timestamp=metrics.ts,
-                    rule_type=rule.rule_type
-                )
-                alerts.append(alert)
-        
-        return alerts
+        return self.evaluate_metrics(ip, self.get_latest_metrics(ip))
     
     def get_all_alerts(self, params: AlertQueryParams) -> AlertsResponse:
-        """获取所有告警信息"""
-        # 获取所有活跃IP
-        active_ips_query = text("""
-            SELECT DISTINCT ip FROM node_monitor_metrics 
-            ORDER BY ip
-        """)
-        result = self.db.execute(active_ips_query)
-        ips = [row[0] for row in result.fetchall()]
-        
-        # 如果指定了IP列表，进行过滤
-        if params.ips:
-            ips = [ip for ip in ips if ip in params.ips]
-        
-        all_alerts = []
-        for ip in ips:
-            alerts = self.evaluate_rules_for_ip(ip)
-            all_alerts.extend(alerts)
-        
-        # 过滤告警级别
-        if params.alert_levels:
-            all_alerts = [alert for alert in all_alerts if alert.alert_level in params.alert_levels]
-        
-        # 过滤规则类型
-        if params.rule_types:
-            all_alerts = [alert for alert in all_alerts if alert.rule_type in params.rule_types]
-        
-        return AlertsResponse(
-            alerts=all_alerts,
-            total_count=len(all_alerts),
-            query_time=datetime.now()
+        """获取所有告警信息（每个IP的最新一条记录，不限时间段）"""
+        # 与时间段告警共用批量评估：快照可用时一次读取每个IP的最新记录（O(节点数)），不再逐IP查询
+        return self.get_all_alerts_with_time_range(
+            0, UNBOUNDED_END_TIME, params.ips, params.alert_levels, params.rule_types
         )
     
-    def get_all_alerts_with_time_range(self, start_time: int, end_time: int, 
-                                     ips: Optional[List[str]] = None,
-                                     alert_levels: Optional[List[str]] = None,
-                                     rule_types: Optional[List[str]] = None) -> AlertsResponse:
-        """获取指定时间段内的所有告警信息"""
-        # 获取指定时间段内有监控数据的IP
-        active_ips_query = text("""
-            SELECT DISTINCT ip FROM node_monitor_metrics 
-            WHERE ts BETWEEN :start_time AND :end_time
-            ORDER BY ip
-        """)
-        result = self.db.execute(active_ips_query, {
+    def evaluate_fleet(self, start_time: int, end_time: int,
+                       ips: Optional[List[str]] = None, source: str = "live") -> Dict[str, List[AlertInfo]]:
+        """
+        评估时间段内有监控数据的所有IP
+        
+        一次查询读取每个IP在时间段内的最新记录（只读取规则用到的列），所有规则整列向量化评估；
+        source为state时读取后台评估的告警状态。
+        返回 {ip: 告警列表}，按IP排序，包含没有告警的IP。
+        """
+        if source == "state":
+            return self.fleet_state(start_time, end_time, ips)
+        if settings.alert_sql_pushdown:
+            return self.evaluate_fleet_in_sql(start_time, end_time, ips)
+        
+        plan = self.plan
+        # 优先读取最新数据快照（每个IP一行），无法覆盖时使用窗口函数
+        query = text(latest_metrics_sql(self.db, end_time, plan.query_fields) + " ORDER BY ip")
+        rows = self.db.execute(query, {
             "start_time": start_time,
             "end_time": end_time
-        })
-        time_range_ips = [row[0] for row in result.fetchall()]
+        }).fetchall()
         
         # 如果指定了IP列表，进行过滤
         if ips:
-            time_range_ips = [ip for ip in time_range_ips if ip in ips]
-        
-        all_alerts = []
-        for ip in time_range_ips:
-            alerts = self.evaluate_rules_for_ip_with_time_range(ip, start_time, end_time)
-            all_alerts.extend(alerts)
+            wanted = set(ips)
+            rows = [row for row in rows if row[0] in wanted]
+        
+        return plan.evaluate_rows(rows)
+    
+    def evaluate_fleet_in_sql(self, start_time: int, end_time: int, ips: Optional[List[str]] = None,
+                              include_quiet_ips: bool = True) -> Dict[str, List[AlertInfo]]:
+        """
+        在数据库中评估时间段内有监控数据的所有IP（ALERT_SQL_PUSHDOWN）
+        
+        规则集编译为一条SQL，只返回命中的告警；include_quiet_ips为True时结果包含没有告警的IP。
+        """
+        plan = self.plan
+        latest_sql = latest_metrics_sql(self.db, end_time, plan.query_fields)
+        statement, params, rules = compile_plan_sql(plan, latest_sql, ips, include_quiet_ips)
+        rows = self.db.execute(statement, dict(params, start_time=start_time, end_time=end_time)).fetchall()
+        
+        alerts_by_ip: Dict[str, List[AlertInfo]] = {}
+        for ip, ts, rule_order, value in rows:
+            alerts = alerts_by_ip.setdefault(ip, [])
+            if rule_order >= 0:
+                alerts.append(plan.build_alert(rules[rule_order], ip, value, ts))
+        return alerts_by_ip
+    
+    def fleet_state(self, start_time: int, end_time: int,
+                    ips: Optional[List[str]] = None) -> Dict[str, List[AlertInfo]]:
+        """时间段内有监控数据的所有IP及其当前firing的告警（读取alert_events，不评估规则）"""
+        alerts_by_ip = {ip: [] for ip in active_node_ips(self.db, start_time, end_time, ips)}
+        
+        for alert in get_firing_alerts(self.db, start_time, end_time, ips):
+            if alert.ip in alerts_by_ip:
+                alerts_by_ip[alert.ip].append(alert)
+        return alerts_by_ip
+    
+    def get_all_alerts_with_time_range(self, start_time: int, end_time: int, 
+                                     ips: Optional[List[str]] = None,
+                                     alert_levels: Optional[List[str]] = None,
+                                     rule_types: Optional[List[str]] = None,
+                                     source: str = "live") -> AlertsResponse:
+        """获取指定时间段内的所有告警信息"""
+        if source == "state":
+            all_alerts = get_firing_alerts(self.db, start_time, end_time, ips)
+        elif settings.alert_sql_pushdown:
+            all_alerts = [
+                alert
+                for alerts in self.evaluate_fleet_in_sql(start_time, end_time, ips, include_quiet_ips=False).values()
+                for alert in alerts
+            ]
+        else:
+            all_alerts = [
+                alert
+                for alerts in self.evaluate_fleet(start_time, end_time, ips).values()
+                for alert in alerts
+            ]
         
         # 过滤告警级别
         if alert_levels:
@@ -275,6 +183,11 @@ class AlertRuleEngine:
     
     def get_latest_metrics_in_time_range(self, ip: str, start_time: int, end_time: int) -> Optional[NodeMonitorMetrics]:
         """获取指定IP在时间段内的最新监控数据"""
+        # 快照中的最新记录落在时间段内时直接使用
+        metrics = get_snapshot_metrics(self.db, ip, start_time, end_time)
+        if metrics:
+            return metrics
+        
         query = text("""
             SELECT * FROM node_monitor_metrics 
             WHERE ip = :ip AND ts BETWEEN :start_time AND :end_time
@@ -293,105 +206,42 @@ class AlertRuleEngine:
     
     def evaluate_rules_for_ip_with_time_range(self, ip: str, start_time: int, end_time: int) -> List[AlertInfo]:
         """评估指定IP在时间段内的所有规则"""
-        metrics = self.get_latest_metrics_in_time_range(ip, start_time, end_time)
-        if not metrics:
-            return []
+        return self.evaluate_metrics(ip, self.get_latest_metrics_in_time_range(ip, start_time, end_time))
+    
+    def evaluate_intervals(self, start_time: int, end_time: int,
+                           ips: Optional[List[str]] = None,
+                           alert_levels: Optional[List[str]] = None,
+                           rule_types: Optional[List[str]] = None,
+                           resolution: int = 0, mode: str = "avg",
+                           max_gap_seconds: Optional[int] = None) -> FiringIntervalsResponse:
+        """
+        评估时间段内的每条样本（或预聚合桶），返回告警区间
+        
+        规则生效时间按样本的数据时间判断，支持持续时间条件，见 app/alert_ranges.py。
+        """
+        plan = RangeAlertPlan(self.plan.rules)
+        resolution, rows = load_samples(self.db, start_time, end_time, plan.query_fields, ips, resolution, mode)
+        intervals = plan.evaluate_rows(rows, max_gap_seconds)
+        
+        if alert_levels:
+            intervals = [interval for interval in intervals if interval.alert_level in alert_levels]
+        if rule_types:
+            intervals = [interval for interval in intervals if interval.rule_type in rule_types]
         
-        alerts = []
-        current_time = int(datetime.now().timestamp())
-        
-        # 分别获取全局规则和该IP的个例规则
-        global_rules_query = self.db.query(AlertRule).filter(
-            AlertRule.is_active == True,
-            AlertRule.rule_type == "global"
-        ).order_by(AlertRule.id)
-        
-        specific_rules_query = self.db.query(AlertRule).filter(
-            AlertRule.is_active == True,
-            AlertRule.rule_type == "specific",
-            AlertRule.target_ip == ip
-        ).order_by(AlertRule.id)
-        
-        global_rules = global_rules_query.all()
-        specific_rules = specific_rules_query.all()
-        
-        # 构建规则冲突检测字典
-        # key: (alert_level, condition_field, condition_operator)
-        # value: specific_rule
-        specific_rule_override = {}
-        for specific_rule in specific_rules:
-            # 检查规则时间范围
-            if specific_rule.time_range_start and current_time < specific_rule.time_range_start:
-                continue
-            if specific_rule.time_range_end and current_time > specific_rule.time_range_end:
-                continue
-            
-            key = (specific_rule.alert_level, specific_rule.condition_field, specific_rule.condition_operator)
-            specific_rule_override[key] = specific_rule
-        
-        # 处理全局规则，排除被个例规则覆盖的规则
-        effective_rules = []
-        for global_rule in global_rules:
-            # 检查规则时间范围
-            if global_rule.time_range_start and current_time < global_rule.time_range_start:
-                continue
-            if global_rule.time_range_end and current_time > global_rule.time_range_end:
-                continue
-            
-            key = (global_rule.alert_level, global_rule.condition_field, global_rule.condition_operator)
-            # 如果存在相同key的个例规则，跳过这个全局规则
-            if key not in specific_rule_override:
-                effective_rules.append(global_rule)
-        
-        # 添加所有个例规则
-        for specific_rule in specific_rules:
-            # 检查规则时间范围
-            if specific_rule.time_range_start and current_time < specific_rule.time_range_start:
-                continue
-            if specific_rule.time_range_end and current_time > specific_rule.time_range_end:
-                continue
-            effective_rules.append(specific_rule)
-        
-        # 评估所有有效规则
-        for rule in effective_rules:
-            # 获取字段值
-            field_value = self.get_field_value(metrics, rule.condition_field)
-            if field_value is None:
-                continue
-            
-            # 评估条件
-            if self.evaluate_condition(field_value, rule.condition_operator, rule.condition_value):
-                alert_message = self.format_alert_message(
-                    rule.alert_message or "",
-                    ip,
-                    field_value,
-                    rule.condition_value,
-                    rule.condition_field
-                )
-                
-                alert = AlertInfo(
-                    ip=ip,
-                    rule_id=rule.id,
-                    rule_name=rule.rule_name,
-                    alert_level=rule.alert_level,
-                    alert_message=alert_message,
-                    current_value=field_value,
-                    threshold_value=rule.condition_value,
-                    condition_field=rule.condition_field,
-                    condition_operator=rule.condition_operator,
-                    timestamp=metrics.ts,
-                    rule_type=rule.rule_type
-                )
-                alerts.append(alert)
-        
-        return alerts
+        return FiringIntervalsResponse(
+            intervals=intervals,
+            total_count=len(intervals),
+            resolution=resolution,
+            sample_count=len(rows),
+            query_time=datetime.now()
+        )
 
 # 规则管理API（仅管理员）
 @router.post("/rules", response_model=AlertRuleResponse)
 @invalidate_cache_pattern("alert:rules:*")
 async def create_alert_rule(
     rule: AlertRuleCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -413,6 +263,7 @@ async def create_alert_rule(
     - condition_value: 阈值（必填，浮点数）
     - time_range_start: 生效开始时间（可选，Unix时间戳）
     - time_range_end: 生效结束时间（可选，Unix时间戳）
+    - duration_seconds: 持续时间（可选，秒，默认0）；条件连续满足该时长后才告警，仅时间段评估（/alerts/intervals）使用
     - alert_level: 告警级别（可选，"info", "warning", "error", "critical"，默认"warning"）
     - alert_message: 告警消息模板（可选，支持{ip}, {current_value}, {threshold_value}, {field_name}变量）
     - is_active: 是否激活（可选，布尔值，默认true）
@@ -427,6 +278,7 @@ async def create_alert_rule(
     - condition_value: 阈值
     - time_range_start: 生效开始时间
     - time_range_end: 生效结束时间
+    - duration_seconds: 持续时间（秒）
     - alert_level: 告警级别
     - alert_message: 告警消息模板
     - is_active: 是否激活
@@ -444,15 +296,17 @@ async def create_alert_rule(
         
         db_rule = AlertRule(**rule.model_dump())
         db.add(db_rule)
-        db.commit()
-        db.refresh(db_rule)
+        await db.commit()
+        # 通知所有worker重新编译规则
+        bump_rules_version()
+        await db.refresh(db_rule)
         
         return db_rule
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"创建规则失败: {str(e)}")
 
 def alert_rules_cache_key(rule_type: Optional[str], is_active: Optional[bool]) -> str:
@@ -466,7 +320,7 @@ def alert_rules_cache_key(rule_type: Optional[str], is_active: Optional[bool]) -
 async def get_alert_rules(
     rule_type: Optional[str] = Query(None, description="规则类型过滤"),
     is_active: Optional[bool] = Query(None, description="是否激活过滤"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -487,6 +341,7 @@ async def get_alert_rules(
     - condition_value: 阈值
     - time_range_start: 生效开始时间
     - time_range_end: 生效结束时间
+    - duration_seconds: 持续时间（秒）
     - alert_level: 告警级别
     - alert_message: 告警消息模板
     - is_active: 是否激活
@@ -494,15 +349,15 @@ async def get_alert_rules(
     - updated_at: 更新时间
     """
     try:
-        query = db.query(AlertRule)
+        query = select(AlertRule)
         
         if rule_type:
-            query = query.filter(AlertRule.rule_type == rule_type)
+            query = query.where(AlertRule.rule_type == rule_type)
         
         if is_active is not None:
-            query = query.filter(AlertRule.is_active == is_active)
+            query = query.where(AlertRule.is_active == is_active)
         
-        rules = query.order_by(AlertRule.rule_type.desc(), AlertRule.id).all()
+        rules = (await db.execute(query.order_by(AlertRule.rule_type.desc(), AlertRule.id))).scalars().all()
         
         # 转换为字典列表以提高缓存序列化性能
         rules_dict = []
@@ -517,6 +372,7 @@ async def get_alert_rules(
                 "condition_value": rule.condition_value,
                 "time_range_start": rule.time_range_start,
                 "time_range_end": rule.time_range_end,
+                "duration_seconds": rule.duration_seconds,
                 "alert_level": rule.alert_level,
                 "alert_message": rule.alert_message,
                 "is_active": rule.is_active,
@@ -533,7 +389,7 @@ async def get_alert_rules(
 @router.get("/rules/{rule_id}", response_model=AlertRuleResponse)
 async def get_alert_rule(
     rule_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -553,6 +409,7 @@ async def get_alert_rule(
     - condition_value: 阈值
     - time_range_start: 生效开始时间
     - time_range_end: 生效结束时间
+    - duration_seconds: 持续时间（秒）
     - alert_level: 告警级别
     - alert_message: 告警消息模板
     - is_active: 是否激活
@@ -562,7 +419,7 @@ async def get_alert_rule(
     错误码：
     - 404: 规则不存在
     """
-    rule = db.query(AlertRule).filter(AlertRule.id == rule_id).first()
+    rule = (await db.execute(select(AlertRule).where(AlertRule.id == rule_id))).scalars().first()
     if not rule:
         raise HTTPException(status_code=404, detail="规则不存在")
     return rule
@@ -572,7 +429,7 @@ async def get_alert_rule(
 async def update_alert_rule(
     rule_id: int,
     rule_update: AlertRuleUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -590,6 +447,7 @@ async def update_alert_rule(
     - condition_value: 阈值（可选，浮点数）
     - time_range_start: 生效开始时间（可选，Unix时间戳）
     - time_range_end: 生效结束时间（可选，Unix时间戳）
+    - duration_seconds: 持续时间（可选，秒）
     - alert_level: 告警级别（可选，"info", "warning", "error", "critical"）
     - alert_message: 告警消息模板（可选，字符串）
     - is_active: 是否激活（可选，布尔值）
@@ -602,7 +460,7 @@ async def update_alert_rule(
     - 404: 规则不存在
     """
     try:
-        db_rule = db.query(AlertRule).filter(AlertRule.id == rule_id).first()
+        db_rule = (await db.execute(select(AlertRule).where(AlertRule.id == rule_id))).scalars().first()
         if not db_rule:
             raise HTTPException(status_code=404, detail="规则不存在")
         
@@ -618,21 +476,22 @@ async def update_alert_rule(
         for field, value in update_data.items():
             setattr(db_rule, field, value)
         
-        db.commit()
-        db.refresh(db_rule)
+        await db.commit()
+        bump_rules_version()
+        await db.refresh(db_rule)
         return db_rule
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"更新规则失败: {str(e)}")
 
 @router.delete("/rules/{rule_id}")
 @invalidate_cache_pattern("alert:rules:*")
 async def delete_alert_rule(
     rule_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -648,37 +507,40 @@ async def delete_alert_rule(
     - 404: 规则不存在
     """
     try:
-        db_rule = db.query(AlertRule).filter(AlertRule.id == rule_id).first()
+        db_rule = (await db.execute(select(AlertRule).where(AlertRule.id == rule_id))).scalars().first()
         if not db_rule:
             raise HTTPException(status_code=404, detail="规则不存在")
         
-        db.delete(db_rule)
-        db.commit()
+        await db.delete(db_rule)
+        await db.commit()
+        bump_rules_version()
         return {"message": "规则删除成功"}
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"删除规则失败: {str(e)}")
 
 # 告警查询API（所有认证用户）
-def alerts_cache_key(start_time: int, end_time: int, ips: Optional[str], alert_levels: Optional[str], rule_types: Optional[str]) -> str:
+def alerts_cache_key(start_time: int, end_time: int, ips: Optional[str], alert_levels: Optional[str], rule_types: Optional[str],
+                     source: str = "live") -> str:
     """生成告警信息缓存键"""
     ips_str = ips or "all"
     levels_str = alert_levels or "all"
     types_str = rule_types or "all"
-    return cache_key("alert", "alerts", start_time, end_time, ips_str, levels_str, types_str)
+    return cache_key("alert", "alerts", start_time, end_time, ips_str, levels_str, types_str, source)
 
-@router.get("/alerts", response_model=AlertsResponse)
-@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=alerts_cache_key)
+@router.get("/alerts", response_model=AlertsResponse, dependencies=[Depends(conditional_get(rules=True, time_bucket="alerts"))])
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=alerts_cache_key, time_bucket="alerts", raw_response=True)
 async def get_alerts(
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
     ips: Optional[str] = Query(None, description="指定IP列表，逗号分隔"),
     alert_levels: Optional[str] = Query(None, description="告警级别过滤，逗号分隔"),
     rule_types: Optional[str] = Query(None, description="规则类型过滤，逗号分隔"),
-    db: Session = Depends(get_db),
+    source: Literal["live", "state"] = Query("live", description="告警来源：live实时计算，state读取后台评估的告警状态"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -690,6 +552,10 @@ async def get_alerts(
     - ips: 指定IP列表（可选，逗号分隔的IP地址字符串）
     - alert_levels: 告警级别过滤（可选，逗号分隔的级别："info", "warning", "error", "critical"）
     - rule_types: 规则类型过滤（可选，逗号分隔的类型："global", "specific"）
+    - source: 告警来源（可选，默认live）
+      * live: 实时计算
+      * state: 读取后台告警评估任务维护的当前告警（alert_events中firing且最近一次命中记录在时间段内），
+        不评估规则，结果滞后后台任务的评估周期
     
     返回参数：
     - alerts: 告警信息列表，每个告警包含：
@@ -708,7 +574,7 @@ async def get_alerts(
     - query_time: 查询时间
     
     说明：
-    - 实时生成告警信息，不存储在数据库中
+    - source=live时实时生成告警信息
     - 只查询指定时间段内有监控数据的机器
     - 基于每个IP在时间段内的最新监控数据进行规则匹配
     - 个例规则优先级高于全局规则
@@ -727,29 +593,188 @@ async def get_alerts(
         if rule_types:
             type_list = [t.strip() for t in rule_types.split(",") if t.strip()]
         
-        engine = AlertRuleEngine(db)
-        return engine.get_all_alerts_with_time_range(
+        plan = await rule_plan_cache.get_plan_async()
+        return await db.run_sync(lambda session: AlertRuleEngine(session, plan).get_all_alerts_with_time_range(
             start_time=start_time,
             end_time=end_time,
             ips=ip_list,
             alert_levels=level_list,
-            rule_types=type_list
-        )
+            rule_types=type_list,
+            source=source
+        ))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询告警失败: {str(e)}")
 
+@router.get("/alerts/history", response_model=AlertHistoryResponse)
+async def get_alerts_history(
+    start_time: int = Query(..., description="开始时间戳"),
+    end_time: int = Query(..., description="结束时间戳"),
+    ip: Optional[str] = Query(None, description="指定IP"),
+    rule_id: Optional[int] = Query(None, description="指定规则ID"),
+    alert_levels: Optional[str] = Query(None, description="告警级别过滤，逗号分隔"),
+    status: Optional[Literal["firing", "resolved"]] = Query(None, description="事件状态过滤"),
+    limit: int = Query(100, ge=1, le=1000, description="每页事件数"),
+    offset: int = Query(0, ge=0, description="跳过的事件数"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询告警历史（所有认证用户）
+    
+    查询参数：
+    - start_time: 开始时间戳（必填，Unix时间戳）
+    - end_time: 结束时间戳（必填，Unix时间戳）
+    - ip: 指定IP（可选）
+    - rule_id: 指定规则ID（可选）
+    - alert_levels: 告警级别过滤（可选，逗号分隔的级别："info", "warning", "error", "critical"）
+    - status: 事件状态过滤（可选，"firing" 或 "resolved"）
+    - limit: 每页事件数（可选，默认100，最大1000）
+    - offset: 跳过的事件数（可选，默认0）
+    
+    返回参数：
+    - events: 告警事件列表（按开始时间倒序），每个事件包含：
+      - id: 事件ID
+      - ip、rule_id、rule_name、rule_type、alert_level、condition_field、condition_operator: 同告警信息
+      - threshold_value: 阈值
+      - current_value: 最近一次评估时的值
+      - alert_message: 告警消息
+      - status: firing（告警中）或 resolved（已恢复）
+      - started_at: 开始告警的数据时间戳
+      - ended_at: 恢复的数据时间戳，告警中为null
+      - last_ts: 最近一次命中的数据时间戳
+    - total_count: 符合条件的事件总数
+    - query_time: 查询时间
+    
+    说明：
+    - 事件由后台告警评估任务写入，返回与时间段有交集的事件（开始于end_time之前，且未恢复或恢复于start_time之后）
+    """
+    try:
+        level_list = None
+        if alert_levels:
+            level_list = [level.strip() for level in alert_levels.split(",") if level.strip()]
+        
+        total_count, events = await db.run_sync(lambda session: get_alert_history(
+            session, start_time, end_time,
+            ip=ip,
+            rule_id=rule_id,
+            alert_levels=level_list,
+            status=status,
+            limit=limit,
+            offset=offset
+        ))
+        
+        return AlertHistoryResponse(
+            events=events,
+            total_count=total_count,
+            query_time=datetime.now()
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询告警历史失败: {str(e)}")
+
+def alert_intervals_cache_key(start_time: int, end_time: int, ips: Optional[str], alert_levels: Optional[str],
+                              rule_types: Optional[str], resolution: int, mode: str,
+                              max_gap_seconds: Optional[int]) -> str:
+    """生成告警区间缓存键"""
+    ips_str = ips or "all"
+    levels_str = alert_levels or "all"
+    types_str = rule_types or "all"
+    return cache_key("alert", "alerts", "intervals", start_time, end_time, ips_str, levels_str, types_str,
+                     resolution, mode, max_gap_seconds or 0)
+
+@router.get("/alerts/intervals", response_model=FiringIntervalsResponse, dependencies=[Depends(conditional_get(rules=True))])
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=alert_intervals_cache_key, raw_response=True)
+async def get_alert_intervals(
+    start_time: int = Query(..., description="开始时间戳"),
+    end_time: int = Query(..., description="结束时间戳"),
+    ips: Optional[str] = Query(None, description="指定IP列表，逗号分隔"),
+    alert_levels: Optional[str] = Query(None, description="告警级别过滤，逗号分隔"),
+    rule_types: Optional[str] = Query(None, description="规则类型过滤，逗号分隔"),
+    resolution: int = Query(0, description="评估粒度（秒）：0为原始样本，60/300/3600为预聚合桶"),
+    mode: str = Query("avg", description="预聚合桶取值：avg、min、max、last"),
+    max_gap_seconds: Optional[int] = Query(None, ge=1, description="相邻样本间隔超过该值时视为数据中断，告警区间断开"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    按时间段评估告警区间（所有认证用户）
+    
+    查询参数：
+    - start_time: 开始时间戳（必填，Unix时间戳）
+    - end_time: 结束时间戳（必填，Unix时间戳）
+    - ips: 指定IP列表（可选，逗号分隔的IP地址字符串）
+    - alert_levels: 告警级别过滤（可选，逗号分隔的级别："info", "warning", "error", "critical"）
+    - rule_types: 规则类型过滤（可选，逗号分隔的类型："global", "specific"）
+    - resolution: 评估粒度（可选，默认0按原始样本；60/300/3600按预聚合桶，预聚合不可用时回退到原始样本）
+    - mode: 按预聚合桶评估时各字段的取值（可选，avg、min、max、last，默认avg）
+    - max_gap_seconds: 数据中断阈值（可选，秒），相邻样本间隔超过该值时告警区间断开
+    
+    返回参数：
+    - intervals: 告警区间列表（按IP、先全局规则后个例规则排序），每个区间包含：
+      - ip、rule_id、rule_name、rule_type、alert_level、condition_field、condition_operator: 同告警信息
+      - threshold_value: 阈值
+      - duration_seconds: 规则的持续时间条件（秒）
+      - started_at: 条件开始连续满足的样本时间
+      - firing_at: 持续时间达到条件、开始告警的样本时间
+      - ended_at: 第一条不再满足条件的样本时间，持续到时间段内最后一条样本时为null
+      - last_ts: 最后一条满足条件的样本时间
+      - sample_count: 区间内满足条件的样本数
+      - min_value、max_value: 区间内的最小值、最大值
+    - total_count: 告警区间总数
+    - resolution: 实际使用的评估粒度（0为原始样本）
+    - sample_count: 参与评估的样本数
+    - query_time: 查询时间
+    
+    说明：
+    - 对时间段内的每条样本评估所有规则，规则生效时间（time_range_start/time_range_end）按样本的数据时间判断
+    - 条件连续满足的时长（最后一条与第一条样本的时间差）达到规则的 duration_seconds 后才产生告警区间
+    - 个例规则在其生效的样本上覆盖判定键相同的全局规则
+    """
+    if resolution and resolution not in ROLLUP_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"不支持的评估粒度: {resolution}")
+    if mode not in RANGE_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的取值模式: {mode}")
+    
+    try:
+        ip_list = None
+        if ips:
+            ip_list = [ip.strip() for ip in ips.split(",") if ip.strip()]
+        
+        level_list = None
+        if alert_levels:
+            level_list = [level.strip() for level in alert_levels.split(",") if level.strip()]
+        
+        type_list = None
+        if rule_types:
+            type_list = [t.strip() for t in rule_types.split(",") if t.strip()]
+        
+        plan = await rule_plan_cache.get_plan_async()
+        return await db.run_sync(lambda session: AlertRuleEngine(session, plan).evaluate_intervals(
+            start_time=start_time,
+            end_time=end_time,
+            ips=ip_list,
+            alert_levels=level_list,
+            rule_types=type_list,
+            resolution=resolution,
+            mode=mode,
+            max_gap_seconds=max_gap_seconds
+        ))
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"评估告警区间失败: {str(e)}")
+
 def ip_alerts_cache_key(ip: str, start_time: int, end_time: int) -> str:
     """生成IP告警缓存键"""
     return cache_key("alert", "alerts", ip, start_time, end_time)
 
-@router.get("/alerts/{ip}", response_model=AlertsResponse)
-@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=ip_alerts_cache_key)
+@router.get("/alerts/{ip}", response_model=AlertsResponse, dependencies=[Depends(conditional_get(per_ip=True, rules=True))])
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=ip_alerts_cache_key, raw_response=True)
 async def get_ip_alerts(
     ip: str,
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -784,8 +809,10 @@ async def get_ip_alerts(
     - 如果该IP在时间段内没有监控数据，返回空告警列表
     """
     try:
-        engine = AlertRuleEngine(db)
-        alerts = engine.evaluate_rules_for_ip_with_time_range(ip, start_time, end_time)
+        plan = await rule_plan_cache.get_plan_async()
+        alerts = await db.run_sync(
+            lambda session: AlertRuleEngine(session, plan).evaluate_rules_for_ip_with_time_range(ip, start_time, end_time)
+        )
         
         return AlertsResponse(
             alerts=alerts,
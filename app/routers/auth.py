@@ -1,8 +1,10 @@
+import asyncio
 from datetime import timedelta, datetime
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.schemas import Token, UserLogin, UserCreate, UserResponse
 from app.auth import authenticate_user, create_access_token, get_password_hash, get_current_user
 from app.models import User
@@ -12,9 +14,9 @@ from app.utils.phone_validation import check_phone_unique, find_user_by_phone
 router = APIRouter(prefix="/auth", tags=["认证"])
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # 检查用户名是否已存在
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = (await db.execute(select(User).where(User.username == user_data.username))).scalars().first()
     if existing_user:
         if existing_user.is_active:
             raise HTTPException(
@@ -31,7 +33,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # 检查手机号唯一性和是否被禁用用户使用
     if user_data.phone is not None and user_data.phone.strip() != "":
         # 查找使用该手机号的用户
-        phone_user = find_user_by_phone(db, user_data.phone)
+        phone_user = await db.run_sync(find_user_by_phone, user_data.phone)
         if phone_user:
             if phone_user.is_active:
                 raise HTTPException(
@@ -46,7 +48,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
                 )
     
     # 创建新用户
-    hashed_password = get_password_hash(user_data.password)
+    # 密码哈希为CPU密集计算，放到线程中执行
+    hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
     new_user = User(
         username=user_data.username,
         hashed_password=hashed_password,
@@ -57,21 +60,21 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     new_user.set_phone_encrypted(user_data.phone)
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return new_user
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     from app.auth import is_bcrypt_hash
     
     # 首先尝试用户名登录
-    user = db.query(User).filter(User.username == user_data.username).first()
+    user = (await db.execute(select(User).where(User.username == user_data.username))).scalars().first()
     
     # 如果用户名登录失败，尝试手机号登录
     if not user:
-        user = find_user_by_phone(db, user_data.username)
+        user = await db.run_sync(find_user_by_phone, user_data.username)
     
     if not user:
         raise HTTPException(
@@ -89,7 +92,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     
     # 验证密码
     from app.auth import verify_password
-    if not verify_password(user_data.password, user.hashed_password):
+    if not await asyncio.to_thread(verify_password, user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -101,13 +104,13 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         print(f"迁移用户 {user.username} 的密码哈希到PBKDF2-HMAC-SM3")
         # 生成新的PBKDF2-HMAC-SM3哈希
         from app.auth import get_password_hash
-        new_hash = get_password_hash(user_data.password)
+        new_hash = await asyncio.to_thread(get_password_hash, user_data.password)
         user.hashed_password = new_hash
         print(f"密码哈希迁移完成")
     
     # 更新最后登录时间
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
@@ -4,6 +4,7 @@ from typing import Optional, List
 from app.database import get_db
 from app.cache import cache
 from app.auth import get_current_user, get_admin_user, User
+from app.config import settings
 
 router = APIRouter(
     prefix="/cache-management",
@@ -58,11 +59,18 @@ async def get_cache_status(
     返回参数：
     - available: Redis是否可用
     - info: Redis信息（如果可用）
+    - time_bucket: 缓存时间桶对齐配置
+    - hit_stats: 各接口的缓存命中次数、未命中次数和命中率（如果可用）
     """
     try:
         is_available = cache.is_available()
         result = {
-            "available": is_available
+            "available": is_available,
+            "time_bucket": {
+                "enabled": settings.cache_time_bucket_enabled,
+                "default_seconds": settings.cache_time_bucket_seconds,
+                "overrides": settings.cache_time_bucket_overrides
+            }
         }
         
         if is_available:
@@ -84,12 +92,33 @@ async def get_cache_status(
                 keys_info[pattern] = len(keys)
             
             result["keys_count"] = keys_info
+            result["hit_stats"] = cache.get_hit_stats()
         
         return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取缓存状态失败: {str(e)}")
 
+@router.delete("/stats")
+async def reset_cache_stats(
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    清空缓存命中统计（仅管理员）
+    
+    返回参数：
+    - message: 清理结果消息
+    """
+    try:
+        if not cache.reset_hit_stats():
+            raise HTTPException(status_code=500, detail="Redis不可用")
+        return {"message": "已清空缓存命中统计"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"清空缓存命中统计失败: {str(e)}")
+
 @router.get("/keys")
 async def get_cache_keys(
     pattern: str = "*",
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_
 from datetime import datetime, timedelta
@@ -6,7 +7,8 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import logging
 import re
-from app.database import get_db
+from app.database import get_async_db
+from app.replicas import get_read_db
 from app.models import ServiceHeartbeat, NodeMonitorMetrics, ServiceAccessLog, AccessLog, RequestLog
 from app.auth import get_admin_user, User
 
@@ -52,7 +54,7 @@ class HeartbeatRequest(BaseModel):
 @router.post("/report", summary="服务探活报告")
 async def report_heartbeat(
     request: HeartbeatRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     服务探活报告接口
@@ -71,8 +73,8 @@ async def report_heartbeat(
         )
         
         db.add(heartbeat)
-        db.commit()
-        db.refresh(heartbeat)
+        await db.commit()
+        await db.refresh(heartbeat)
         
         response_data = {
             "status": "success",
@@ -91,7 +93,7 @@ async def report_heartbeat(
         return response_data
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"记录探活失败 - IP地址: {request.ip_address}, 服务名称: {request.service_name}, "
                     f"错误信息: {str(e)}")
         raise HTTPException(status_code=500, detail=f"记录探活失败: {str(e)}")
@@ -99,7 +101,7 @@ async def report_heartbeat(
 @router.post("/status", summary="查询系统状态")
 async def get_heartbeat_status(
     request: TimeRangeRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -115,10 +117,10 @@ async def get_heartbeat_status(
         current_time = datetime.utcnow()
         
         # 第一部分：存活情况
-        service_status = get_service_status(db, start_datetime, end_datetime, current_time)
+        service_status = await db.run_sync(get_service_status, start_datetime, end_datetime, current_time)
         
         # 第二部分：连接数情况
-        connection_status = get_connection_status(db, start_datetime, end_datetime)
+        connection_status = await db.run_sync(get_connection_status, start_datetime, end_datetime)
         
         return HeartbeatStatusResponse(
             # 存活情况
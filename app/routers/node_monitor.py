@@ -1,14 +1,38 @@
+import asyncio
+import csv
+import io
+import json
+import numpy as np
 from datetime import datetime
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from itertools import compress
+from typing import Dict, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func
-from app.database import get_db
+from sqlalchemy import text, func, select, bindparam
+from app.database import get_db, SessionLocal
+from app.replicas import get_read_db, read_session_factory
 from app.models import NodeMonitorMetrics
-from app.schemas import ActiveIPsResponse, NodeLatestMetrics, NodeMetricsResponse, IPMetricsRequest, TimeRangeParams, UsageTopRequest, UsageTopResponse, DimensionUsage
-from app.auth import get_current_user, User
+from app.schemas import ActiveIPsResponse, NodeInfo, NodesResponse, NodeLatestMetrics, NodeMetricsResponse, NodeMetricsColumns, ResponseFormat, IPMetricsRequest, TimeRangeParams, UsageTopRequest, UsageTopResponse, DimensionUsage, IPMetricsBatchRequest, IPMetricsBatchResponse, IPMetricsBatchResult, IngestResponse
+from app.auth import get_current_user, get_admin_user, User
 from app.cache import cache, CacheTTL, cache_key
 from app.decorators import cached
+from app.conditional import conditional_get
+from app.node_snapshot import latest_metrics_sql
+from app.nodes import list_nodes
+from app.rollups import select_resolution, rollup_split_time, query_rollup_buckets, rollups_available
+from app.ip_sketches import approximate_summary
+from app.series_cache import get_series, get_series_for_ips, current_closed_data_version
+from app.ingest import ingest_samples, IngestError, IngestBatchTooLarge
+from app.live_feed import live_feed, format_event, latest_by_ip, query_snapshot_records
+from app.config import settings
+from app.derived_metrics import (
+    DIMENSION_METRICS, rounded_metric_sql, to_column, clean_network,
+    derived_metrics_for_rows, to_optional_list
+)
+from app.utils.fast_json import FastJSONResponse, format_datetime
+from app.utils.downsampling import DOWNSAMPLE_MODES, resolve_bucket_seconds, resolve_point_count, lttb_indices
 
 router = APIRouter(
     prefix="/node-monitor",
@@ -16,124 +40,58 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-def calculate_cpu_usage(cpu_usr: Optional[float], cpu_sys: Optional[float], cpu_iow: Optional[float]) -> Optional[float]:
-    """计算CPU使用率"""
-    if cpu_usr is None or cpu_sys is None or cpu_iow is None:
-        return None
-    return round(cpu_usr + cpu_sys + cpu_iow, 2)
-
-def calculate_memory_usage(mem_total: Optional[int], mem_free: Optional[int], mem_buff: Optional[int], mem_cache: Optional[int]) -> Optional[float]:
-    """计算内存使用率"""
-    if mem_total is None or mem_total == 0:
-        return None
-    if mem_free is None:
-        return None
-    # 使用公式：1 - free/total
-    return round((1 - mem_free / mem_total) * 100, 2)
-
-def calculate_swap_usage(swap_total: Optional[int], swap_used: Optional[int]) -> Optional[float]:
-    """计算Swap使用率"""
-    if swap_total is None or swap_total == 0 or swap_used is None:
-        return None
-    return round((swap_used / swap_total) * 100, 2)
-
-def calculate_network_rate(net_rx_kbps: Optional[float], net_tx_kbps: Optional[float]) -> Optional[float]:
-    """计算网络速率（总速率）"""
-    if net_rx_kbps is None or net_tx_kbps is None:
-        return None
-    
-    # 处理负数情况：将负数视为0
-    rx_rate = max(0, net_rx_kbps) if net_rx_kbps is not None else 0
-    tx_rate = max(0, net_tx_kbps) if net_tx_kbps is not None else 0
-    
-    return round(rx_rate + tx_rate, 2)
-
-def clean_network_data(net_rx_kbps: Optional[float], net_tx_kbps: Optional[float]) -> tuple:
-    """清理网络数据，处理负数"""
-    clean_rx = max(0, net_rx_kbps) if net_rx_kbps is not None and net_rx_kbps >= 0 else 0
-    clean_tx = max(0, net_tx_kbps) if net_tx_kbps is not None and net_tx_kbps >= 0 else 0
-    return clean_rx, clean_tx
+# 计算五维使用率所需的原始字段
+USAGE_SOURCE_FIELDS = [
+    "ip", "ts",
+    "cpu_usr", "cpu_sys", "cpu_iow",
+    "mem_total", "mem_free", "mem_buff", "mem_cache",
+    "swap_total", "swap_used",
+    "disk_used_percent",
+    "net_rx_kbps", "net_tx_kbps",
+]
 
 def active_ips_cache_key(start_time: int, end_time: int) -> str:
     """生成活跃IP缓存键"""
     return cache_key("node_monitor", "active_ips", start_time, end_time)
 
-@router.get("/active-ips", response_model=ActiveIPsResponse)
-@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=active_ips_cache_key)
+@router.get("/active-ips", response_model=ActiveIPsResponse, dependencies=[Depends(conditional_get(time_bucket="active_ips"))])
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=active_ips_cache_key, time_bucket="active_ips")
 async def get_active_ips(
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     返回当前选中的时间段活跃的IP地址信息，和每个IP的最新CPU使用率、磁盘使用率、内存使用率、Swap使用率、网络速率
     """
     try:
-        # 使用窗口函数获取每个IP的最新记录，避免使用DISTINCT
-        query = text("""
-            WITH ranked_metrics AS (
-                SELECT 
-                    ip,
-                    ts,
-                    cpu_usr,
-                    cpu_sys,
-                    cpu_iow,
-                    mem_total,
-                    mem_free,
-                    mem_buff,
-                    mem_cache,
-                    swap_total,
-                    swap_used,
-                    disk_used_percent,
-                    net_rx_kbps,
-                    net_tx_kbps,
-                    ROW_NUMBER() OVER (PARTITION BY ip ORDER BY ts DESC) as rn
-                FROM node_monitor_metrics 
-                WHERE ts BETWEEN :start_time AND :end_time
-            )
-            SELECT 
-                ip,
-                ts as latest_ts,
-                cpu_usr,
-                cpu_sys,
-                cpu_iow,
-                mem_total,
-                mem_free,
-                mem_buff,
-                mem_cache,
-                swap_total,
-                swap_used,
-                disk_used_percent,
-                net_rx_kbps,
-                net_tx_kbps
-            FROM ranked_metrics 
-            WHERE rn = 1
-            ORDER BY ip
-        """)
+        # 优先读取增量维护的最新数据快照（每个IP一行），无法覆盖时使用窗口函数
+        query = text(await db.run_sync(latest_metrics_sql, end_time, USAGE_SOURCE_FIELDS) + " ORDER BY ip")
         
-        result = db.execute(query, {
+        result = await db.execute(query, {
             "start_time": start_time,
             "end_time": end_time
         })
         
         rows = result.fetchall()
         
+        # 批量计算所有IP最新记录的衍生指标
+        derived = {
+            field: to_optional_list(values)
+            for field, values in derived_metrics_for_rows(rows).items()
+        }
+        
         active_ips = []
-        for row in rows:
-            cpu_usage = calculate_cpu_usage(row.cpu_usr, row.cpu_sys, row.cpu_iow)
-            memory_usage = calculate_memory_usage(row.mem_total, row.mem_free, row.mem_buff, row.mem_cache)
-            swap_usage = calculate_swap_usage(row.swap_total, row.swap_used)
-            network_rate = calculate_network_rate(row.net_rx_kbps, row.net_tx_kbps)
-            
+        for index, row in enumerate(rows):
             latest_metrics = NodeLatestMetrics(
                 ip=row.ip,
-                latest_ts=row.latest_ts,
-                cpu_usage_rate=cpu_usage,
-                disk_usage_rate=round(row.disk_used_percent, 2) if row.disk_used_percent is not None else None,
-                memory_usage_rate=memory_usage,
-                swap_usage_rate=swap_usage,
-                network_rate=network_rate
+                latest_ts=row.ts,
+                cpu_usage_rate=derived["cpu_usage_rate"][index],
+                disk_usage_rate=derived["disk_usage_rate"][index],
+                memory_usage_rate=derived["memory_usage_rate"][index],
+                swap_usage_rate=derived["swap_usage_rate"][index],
+                network_rate=derived["network_rate"][index]
             )
             active_ips.append(latest_metrics)
         
@@ -149,198 +107,789 @@ async def get_active_ips(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询活跃IP失败: {str(e)}")
 
-def ip_metrics_cache_key(ip: str, start_time: int, end_time: int) -> str:
-    """生成IP指标缓存键"""
-    return cache_key("node_monitor", "ip_metrics", ip, start_time, end_time)
+def nodes_cache_key(start_time: Optional[int] = None, end_time: Optional[int] = None) -> str:
+    """生成节点清单缓存键"""
+    return cache_key("node_monitor", "nodes", start_time, end_time)
+
+@router.get("/nodes", response_model=NodesResponse)
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=nodes_cache_key)
+async def get_nodes(
+    start_time: Optional[int] = Query(None, description="最近上报时间不早于该时间戳"),
+    end_time: Optional[int] = Query(None, description="最近上报时间不晚于该时间戳"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    节点清单：所有上报过监控数据的IP及其首次、最近上报时间和累计记录数
+
+    读取增量维护的nodes注册表（每个IP一行，合并水位之后尚未处理的记录），按最近上报时间过滤，
+    如 end_time=当前时间-600 可得到10分钟内没有上报的节点。
+    """
+    try:
+        rows = await db.run_sync(list_nodes, start_time, end_time)
+        nodes = [
+            NodeInfo(
+                ip=row.ip,
+                first_seen_ts=row.first_seen_ts,
+                last_seen_ts=row.last_seen_ts,
+                sample_count=row.sample_count
+            )
+            for row in rows
+        ]
+        return NodesResponse(
+            nodes=nodes,
+            total_count=len(nodes),
+            time_range={
+                "start_time": start_time,
+                "end_time": end_time
+            }
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询节点清单失败: {str(e)}")
+
+# 降采样时按平均/最小/最大值聚合的数值字段
+INT_METRIC_FIELDS = [
+    "mem_total", "mem_free", "mem_buff", "mem_cache",
+    "swap_total", "swap_used", "swap_in", "swap_out",
+    "system_in", "system_cs",
+    "disk_total", "disk_used", "disk_iops", "disk_r", "disk_w",
+]
+FLOAT_METRIC_FIELDS = [
+    "cpu_usr", "cpu_sys", "cpu_iow", "disk_used_percent",
+    "net_rx_kbytes", "net_tx_kbytes",
+]
+
+# LTTB模式可用的取值字段（衍生指标 + 原始数值字段）
+LTTB_DERIVED_FIELDS = ["cpu_usage_rate", "memory_usage_rate", "swap_usage_rate", "network_rate"]
+LTTB_FIELDS = LTTB_DERIVED_FIELDS + FLOAT_METRIC_FIELDS + INT_METRIC_FIELDS + ["net_rx_kbps", "net_tx_kbps"]
+
+def build_node_metrics_response(metric, clean_rx: float, clean_tx: float) -> NodeMetricsResponse:
+    """将一条监控记录和清理后的网络速率转换为响应对象"""
+    return NodeMetricsResponse(
+        id=metric.id,
+        ip=metric.ip,
+        ts=metric.ts,
+        cpu_usr=metric.cpu_usr,
+        cpu_sys=metric.cpu_sys,
+        cpu_iow=metric.cpu_iow,
+        mem_total=metric.mem_total,
+        mem_free=metric.mem_free,
+        mem_buff=metric.mem_buff,
+        mem_cache=metric.mem_cache,
+        swap_total=metric.swap_total,
+        swap_used=metric.swap_used,
+        swap_in=metric.swap_in,
+        swap_out=metric.swap_out,
+        system_in=metric.system_in,
+        system_cs=metric.system_cs,
+        disk_name=metric.disk_name,
+        disk_total=metric.disk_total,
+        disk_used=metric.disk_used,
+        disk_used_percent=metric.disk_used_percent,
+        disk_iops=metric.disk_iops,
+        disk_r=metric.disk_r,
+        disk_w=metric.disk_w,
+        net_rx_kbytes=metric.net_rx_kbytes,
+        net_tx_kbytes=metric.net_tx_kbytes,
+        net_rx_kbps=clean_rx,
+        net_tx_kbps=clean_tx,
+        version=metric.version,
+        inserted_at=metric.inserted_at
+    )
+
+def build_node_metrics_responses(metrics: List) -> List[NodeMetricsResponse]:
+    """批量转换监控记录为响应对象，并清理网络数据中的负数"""
+    clean_rx, clean_tx = clean_network(
+        to_column(metric.net_rx_kbps for metric in metrics),
+        to_column(metric.net_tx_kbps for metric in metrics)
+    )
+    return [
+        build_node_metrics_response(metric, rx, tx)
+        for metric, rx, tx in zip(metrics, clean_rx.tolist(), clean_tx.tolist())
+    ]
+
+def get_metric_column(metrics: List, field: str) -> np.ndarray:
+    """获取一批记录中某个字段的值数组，支持衍生指标，缺失值为NaN"""
+    if field in LTTB_DERIVED_FIELDS:
+        return derived_metrics_for_rows(metrics)[field]
+    return to_column(getattr(metric, field, None) for metric in metrics)
+
+# 列式响应包含的字段（ip由请求确定，不重复返回）
+COLUMNAR_FIELDS = [field for field in NodeMetricsResponse.model_fields if field != "ip"]
 
-@router.get("/ip-metrics/{ip}", response_model=List[NodeMetricsResponse])
-@cached(ttl_seconds=CacheTTL.TEN_MINUTES, key_func=ip_metrics_cache_key)
+def metrics_to_columns(metrics: List, fields: Optional[List[str]] = None) -> NodeMetricsColumns:
+    """把监控记录（响应对象或分段缓存中的dict）转换为列式结构 {字段: 数组}"""
+    records = [metric if isinstance(metric, dict) else metric.model_dump(mode="json") for metric in metrics]
+    return {field: [record[field] for record in records] for field in (fields or COLUMNAR_FIELDS)}
+
+def metrics_to_records(metrics: List, include: Optional[set] = None) -> List[dict]:
+    """把监控记录（响应对象或dict）转换为可序列化的dict，可只保留指定字段"""
+    records = []
+    for metric in metrics:
+        if isinstance(metric, dict):
+            records.append({field: value for field, value in metric.items() if include is None or field in include})
+        else:
+            records.append(metric.model_dump(mode="json", include=include))
+    return records
+
+def build_bucketed_responses(ips: List[str], start_time: int, bucket_seconds: int, rows) -> Dict[str, List[NodeMetricsResponse]]:
+    """将分桶聚合结果按IP转换为响应对象：ts为桶起始时间，整数字段四舍五入，浮点字段保留两位小数"""
+    bucketed_metrics = {ip: [] for ip in ips}
+    for row in rows:
+        values = row._asdict()
+        for field in INT_METRIC_FIELDS:
+            if values[field] is not None:
+                values[field] = int(round(float(values[field])))
+        for field in FLOAT_METRIC_FIELDS + ["net_rx_kbps", "net_tx_kbps"]:
+            if values[field] is not None:
+                values[field] = round(float(values[field]), 2)
+        bucketed_metrics[values["ip"]].append(NodeMetricsResponse(
+            ts=start_time + int(values.pop("bucket")) * bucket_seconds,
+            **values
+        ))
+    return bucketed_metrics
+
+def query_bucketed_metrics(db: Session, ips: List[str], start_time: int, end_time: int,
+                           bucket_seconds: int, mode: str) -> Dict[str, List[NodeMetricsResponse]]:
+    """
+    在数据库中按时间桶聚合多个IP的监控数据（一条 ip IN 查询）
+
+    每个IP的每个桶返回一条记录：ts为桶起始时间，数值字段为桶内的avg/min/max（last模式取桶内最新一条记录），
+    网络速率先把负数视为0再聚合，id和inserted_at取桶内最大值。
+    """
+    net_fields = [
+        "CASE WHEN net_rx_kbps > 0 THEN net_rx_kbps ELSE 0 END",
+        "CASE WHEN net_tx_kbps > 0 THEN net_tx_kbps ELSE 0 END",
+    ]
+    if mode == "last":
+        select_fields = INT_METRIC_FIELDS + FLOAT_METRIC_FIELDS + [
+            f"{net_fields[0]} AS net_rx_kbps",
+            f"{net_fields[1]} AS net_tx_kbps",
+        ]
+        query = text(f"""
+            SELECT ip, bucket, id, disk_name, version, inserted_at, {", ".join(select_fields)}
+            FROM (
+                SELECT *,
+                       (ts - :start_time) / :bucket_seconds AS bucket,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY ip, (ts - :start_time) / :bucket_seconds
+                           ORDER BY ts DESC, id DESC
+                       ) AS rn
+                FROM node_monitor_metrics
+                WHERE ip IN :ips AND ts BETWEEN :start_time AND :end_time
+            ) ranked_metrics
+            WHERE rn = 1
+            ORDER BY ip, bucket
+        """)
+    else:
+        agg = {"avg": "AVG", "min": "MIN", "max": "MAX"}[mode]
+        select_fields = [f"{agg}({field}) AS {field}" for field in INT_METRIC_FIELDS + FLOAT_METRIC_FIELDS]
+        select_fields += [
+            f"{agg}({net_fields[0]}) AS net_rx_kbps",
+            f"{agg}({net_fields[1]}) AS net_tx_kbps",
+        ]
+        query = text(f"""
+            SELECT 
+                ip,
+                (ts - :start_time) / :bucket_seconds AS bucket,
+                MAX(id) AS id,
+                MAX(disk_name) AS disk_name,
+                MAX(version) AS version,
+                MAX(inserted_at) AS inserted_at,
+                {", ".join(select_fields)}
+            FROM node_monitor_metrics 
+            WHERE ip IN :ips AND ts BETWEEN :start_time AND :end_time
+            GROUP BY ip, (ts - :start_time) / :bucket_seconds
+            ORDER BY ip, bucket
+        """)
+    
+    result = db.execute(query.bindparams(bindparam("ips", expanding=True)), {
+        "ips": list(ips),
+        "start_time": start_time,
+        "end_time": end_time,
+        "bucket_seconds": bucket_seconds
+    })
+    
+    return build_bucketed_responses(ips, start_time, bucket_seconds, result.fetchall())
+
+def query_ip_metrics_for_ips(db: Session, ips: List[str], start_time: int, end_time: int,
+                             max_points: Optional[int] = None, bucket_seconds: Optional[int] = None,
+                             downsample_mode: str = "avg",
+                             lttb_field: str = "cpu_usage_rate") -> Dict[str, List[NodeMetricsResponse]]:
+    """
+    查询多个IP在同一时间段内的监控记录（参数相同的查询合并为一条 ip IN 查询），可选服务端降采样
+
+    - 未指定max_points和bucket_seconds时返回全部原始记录
+    - avg/min/max/last模式在数据库中分桶聚合，桶宽度不小于1分钟时读取预聚合数据
+    - lttb模式按lttb_field的曲线形状挑选代表性原始记录（每个IP分别降采样）
+    """
+    if downsample_mode != "lttb":
+        resolved_bucket = resolve_bucket_seconds(start_time, end_time, max_points, bucket_seconds)
+        if resolved_bucket:
+            resolution = select_resolution(db, resolved_bucket)
+            if resolution:
+                # 尚未聚合的记录所在的桶及之后的部分读取原始表，避免返回（并缓存）不完整的尾部桶
+                split_time = rollup_split_time(db, start_time, end_time, resolved_bucket, resolution)
+                rows = []
+                if split_time > start_time:
+                    rows = query_rollup_buckets(db, ips, start_time, split_time - 1, resolved_bucket, downsample_mode, resolution)
+                bucketed_metrics = build_bucketed_responses(ips, start_time, resolved_bucket, rows)
+                if split_time <= end_time:
+                    trailing = query_bucketed_metrics(db, ips, split_time, end_time, resolved_bucket, downsample_mode)
+                    for ip in ips:
+                        bucketed_metrics[ip] += trailing[ip]
+                return bucketed_metrics
+            return query_bucketed_metrics(db, ips, start_time, end_time, resolved_bucket, downsample_mode)
+    
+    # 查询这些IP在时间段内的所有记录
+    query = db.query(NodeMonitorMetrics).filter(
+        NodeMonitorMetrics.ip.in_(ips),
+        NodeMonitorMetrics.ts >= start_time,
+        NodeMonitorMetrics.ts <= end_time
+    ).order_by(NodeMonitorMetrics.ip, NodeMonitorMetrics.ts.asc())
+    
+    metrics_by_ip = {ip: [] for ip in ips}
+    for metric in query.all():
+        metrics_by_ip[metric.ip].append(metric)
+    
+    threshold = resolve_point_count(start_time, end_time, max_points, bucket_seconds) if downsample_mode == "lttb" else None
+    for ip, metrics in metrics_by_ip.items():
+        if threshold and len(metrics) > threshold:
+            xs = [metric.ts for metric in metrics]
+            ys = np.nan_to_num(get_metric_column(metrics, lttb_field), nan=0.0).tolist()
+            metrics = [metrics[i] for i in lttb_indices(xs, ys, threshold)]
+        # 清理网络数据中的负数
+        metrics_by_ip[ip] = build_node_metrics_responses(metrics)
+    return metrics_by_ip
+
+def query_ip_metrics(db: Session, ip: str, start_time: int, end_time: int,
+                     max_points: Optional[int] = None, bucket_seconds: Optional[int] = None,
+                     downsample_mode: str = "avg", lttb_field: str = "cpu_usage_rate") -> List[NodeMetricsResponse]:
+    """查询指定IP在时间段内的监控记录，可选服务端降采样（见 query_ip_metrics_for_ips）"""
+    return query_ip_metrics_for_ips(
+        db, [ip], start_time, end_time,
+        max_points=max_points,
+        bucket_seconds=bucket_seconds,
+        downsample_mode=downsample_mode,
+        lttb_field=lttb_field
+    )[ip]
+
+# 原始记录dict的字段顺序与NodeMetricsResponse一致
+METRIC_RECORD_FIELDS = list(NodeMetricsResponse.model_fields)
+
+def build_metric_records(rows) -> List[dict]:
+    """
+    把原始记录行直接转换为可序列化的dict（不构造响应对象），并清理网络数据中的负数
+
+    输出与 NodeMetricsResponse.model_dump(mode="json") 一致。
+    """
+    clean_rx, clean_tx = clean_network(
+        to_column(row.net_rx_kbps for row in rows),
+        to_column(row.net_tx_kbps for row in rows)
+    )
+    records = []
+    for row, rx, tx in zip(rows, clean_rx.tolist(), clean_tx.tolist()):
+        values = row._mapping
+        record = {field: values[field] for field in METRIC_RECORD_FIELDS}
+        record["net_rx_kbps"] = rx
+        record["net_tx_kbps"] = tx
+        record["inserted_at"] = format_datetime(record["inserted_at"])
+        records.append(record)
+    return records
+
+def query_raw_metrics_for_ips(db: Session, ips: List[str], start_time: int, end_time: int) -> Dict[str, List[dict]]:
+    """一次查询多个IP在同一时间段内的原始记录，按IP分组返回可序列化的dict"""
+    table = NodeMonitorMetrics.__table__
+    statement = select(table).where(
+        table.c.ip.in_(ips),
+        table.c.ts >= start_time,
+        table.c.ts <= end_time
+    ).order_by(table.c.ip, table.c.ts.asc())
+    
+    metrics_by_ip = {ip: [] for ip in ips}
+    for record in build_metric_records(db.execute(statement).fetchall()):
+        metrics_by_ip[record["ip"]].append(record)
+    return metrics_by_ip
+
+def validate_downsample_params(downsample_mode: str, lttb_field: str):
+    """校验降采样参数"""
+    if downsample_mode not in DOWNSAMPLE_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的降采样模式: {downsample_mode}")
+    if downsample_mode == "lttb" and lttb_field not in LTTB_FIELDS:
+        raise HTTPException(status_code=400, detail=f"不支持的LTTB字段: {lttb_field}")
+
+def ip_metrics_cache_key(ip: str, start_time: int, end_time: int, max_points: Optional[int] = None,
+                         bucket_seconds: Optional[int] = None, downsample_mode: str = "avg",
+                         lttb_field: str = "cpu_usage_rate", format: str = "rows",
+                         data_version: Optional[str] = None) -> Optional[str]:
+    """
+    生成IP指标缓存键，未降采样的查询由分段缓存处理，返回None
+
+    键中包含已稳定数据版本号（未传入时读取），回填或删除分区后旧的结果不再命中；
+    读取不到版本号（Redis不可用）时返回None，不缓存。
+    """
+    if not max_points and not bucket_seconds:
+        return None
+    if data_version is None:
+        data_version = current_closed_data_version()
+        if data_version is None:
+            return None
+    parts = ["node_monitor", "ip_metrics", ip, start_time, end_time,
+             max_points or 0, bucket_seconds or 0, downsample_mode, lttb_field, data_version]
+    if format != "rows":
+        parts.append(format)
+    return cache_key(*parts)
+
+@router.get("/ip-metrics/{ip}", response_model=Union[List[NodeMetricsResponse], NodeMetricsColumns], dependencies=[Depends(conditional_get(per_ip=True))])
+@cached(ttl_seconds=CacheTTL.TEN_MINUTES, key_func=ip_metrics_cache_key, raw_response=True)
 async def get_ip_metrics(
     ip: str,
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
-    db: Session = Depends(get_db),
+    max_points: Optional[int] = Query(None, ge=2, description="最多返回的数据点数，超过时服务端降采样"),
+    bucket_seconds: Optional[int] = Query(None, ge=1, description="降采样时间桶宽度（秒），优先于max_points"),
+    downsample_mode: str = Query("avg", description="降采样模式：avg、min、max、last、lttb"),
+    lttb_field: str = Query("cpu_usage_rate", description="lttb模式下用于保留曲线形状的字段"),
+    format: ResponseFormat = Query("rows", description="响应格式：rows（每条记录一个对象）或columnar（每个字段一个数组）"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     返回某一个IP选定时间段的所有记录信息，按照时间先后顺序排序
+    
+    format=columnar 时返回 {"ts": [...], "cpu_usr": [...], ...}，各数组按下标对应同一条记录（不含ip）。
+    
+    未降采样时按固定时间段分段缓存，只查询缓存中缺失的时间段。
+    
+    指定max_points或bucket_seconds时在服务端降采样：
+    - avg/min/max/last：按时间桶聚合，每个桶返回一条记录，ts为桶起始时间；
+      桶宽度不小于1分钟时从1m/5m/1h预聚合数据中选择不超过桶宽度的最粗粒度
+    - lttb：按lttb_field挑选保留曲线形状的原始记录
     """
     try:
-        # 查询指定IP在时间段内的所有记录
-        query = db.query(NodeMonitorMetrics).filter(
-            NodeMonitorMetrics.ip == ip,
-            NodeMonitorMetrics.ts >= start_time,
-            NodeMonitorMetrics.ts <= end_time
-        ).order_by(NodeMonitorMetrics.ts.asc())
+        validate_downsample_params(downsample_mode, lttb_field)
         
-        metrics = query.all()
+        if not max_points and not bucket_seconds:
+            metrics = await db.run_sync(get_series, ip, start_time, end_time, query_raw_metrics_for_ips)
+        else:
+            metrics = await db.run_sync(
+                query_ip_metrics, ip, start_time, end_time,
+                max_points=max_points,
+                bucket_seconds=bucket_seconds,
+                downsample_mode=downsample_mode,
+                lttb_field=lttb_field
+            )
         
         if not metrics:
             raise HTTPException(status_code=404, detail=f"IP {ip} 在指定时间段内没有监控数据")
         
-        # 清理网络数据中的负数
-        cleaned_metrics = []
-        for metric in metrics:
-            clean_rx, clean_tx = clean_network_data(metric.net_rx_kbps, metric.net_tx_kbps)
-            # 创建新的对象，保持其他字段不变
-            cleaned_metric = NodeMetricsResponse(
-                id=metric.id,
-                ip=metric.ip,
-                ts=metric.ts,
-                cpu_usr=metric.cpu_usr,
-                cpu_sys=metric.cpu_sys,
-                cpu_iow=metric.cpu_iow,
-                mem_total=metric.mem_total,
-                mem_free=metric.mem_free,
-                mem_buff=metric.mem_buff,
-                mem_cache=metric.mem_cache,
-                swap_total=metric.swap_total,
-                swap_used=metric.swap_used,
-                swap_in=metric.swap_in,
-                swap_out=metric.swap_out,
-                system_in=metric.system_in,
-                system_cs=metric.system_cs,
-                disk_name=metric.disk_name,
-                disk_total=metric.disk_total,
-                disk_used=metric.disk_used,
-                disk_used_percent=metric.disk_used_percent,
-                disk_iops=metric.disk_iops,
-                disk_r=metric.disk_r,
-                disk_w=metric.disk_w,
-                net_rx_kbytes=metric.net_rx_kbytes,
-                net_tx_kbytes=metric.net_tx_kbytes,
-                net_rx_kbps=clean_rx,
-                net_tx_kbps=clean_tx,
-                version=metric.version,
-                inserted_at=metric.inserted_at
-            )
-            cleaned_metrics.append(cleaned_metric)
-        
-        return cleaned_metrics
+        if format == "columnar":
+            return metrics_to_columns(metrics)
+        return metrics
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询IP监控数据失败: {str(e)}")
 
-def ip_metrics_body_cache_key(request: IPMetricsRequest) -> str:
+def ip_metrics_body_cache_key(request: IPMetricsRequest, data_version: Optional[str] = None) -> Optional[str]:
     """生成IP指标POST请求缓存键"""
-    return cache_key("node_monitor", "ip_metrics", request.ip, request.start_time, request.end_time)
+    return ip_metrics_cache_key(request.ip, request.start_time, request.end_time, request.max_points,
+                                request.bucket_seconds, request.downsample_mode, request.lttb_field,
+                                request.format, data_version)
 
-@router.get("/ip-metrics", response_model=List[NodeMetricsResponse])
-@cached(ttl_seconds=CacheTTL.TEN_MINUTES, key_func=ip_metrics_body_cache_key)
+@router.get("/ip-metrics", response_model=Union[List[NodeMetricsResponse], NodeMetricsColumns])
+@cached(ttl_seconds=CacheTTL.TEN_MINUTES, key_func=ip_metrics_body_cache_key, raw_response=True)
 async def get_ip_metrics_with_body(
     request: IPMetricsRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     返回某一个IP选定时间段的所有记录信息，按照时间先后顺序排序（POST方式）
     """
     try:
-        # 查询指定IP在时间段内的所有记录
-        query = db.query(NodeMonitorMetrics).filter(
-            NodeMonitorMetrics.ip == request.ip,
-            NodeMonitorMetrics.ts >= request.start_time,
-            NodeMonitorMetrics.ts <= request.end_time
-        ).order_by(NodeMonitorMetrics.ts.asc())
+        validate_downsample_params(request.downsample_mode, request.lttb_field)
         
-        metrics = query.all()
+        if not request.max_points and not request.bucket_seconds:
+            metrics = await db.run_sync(get_series, request.ip, request.start_time, request.end_time, query_raw_metrics_for_ips)
+        else:
+            metrics = await db.run_sync(
+                query_ip_metrics, request.ip, request.start_time, request.end_time,
+                max_points=request.max_points,
+                bucket_seconds=request.bucket_seconds,
+                downsample_mode=request.downsample_mode,
+                lttb_field=request.lttb_field
+            )
         
         if not metrics:
             raise HTTPException(status_code=404, detail=f"IP {request.ip} 在指定时间段内没有监控数据")
         
-        # 清理网络数据中的负数
-        cleaned_metrics = []
-        for metric in metrics:
-            clean_rx, clean_tx = clean_network_data(metric.net_rx_kbps, metric.net_tx_kbps)
-            # 创建新的对象，保持其他字段不变
-            cleaned_metric = NodeMetricsResponse(
-                id=metric.id,
-                ip=metric.ip,
-                ts=metric.ts,
-                cpu_usr=metric.cpu_usr,
-                cpu_sys=metric.cpu_sys,
-                cpu_iow=metric.cpu_iow,
-                mem_total=metric.mem_total,
-                mem_free=metric.mem_free,
-                mem_buff=metric.mem_buff,
-                mem_cache=metric.mem_cache,
-                swap_total=metric.swap_total,
-                swap_used=metric.swap_used,
-                swap_in=metric.swap_in,
-                swap_out=metric.swap_out,
-                system_in=metric.system_in,
-                system_cs=metric.system_cs,
-                disk_name=metric.disk_name,
-                disk_total=metric.disk_total,
-                disk_used=metric.disk_used,
-                disk_used_percent=metric.disk_used_percent,
-                disk_iops=metric.disk_iops,
-                disk_r=metric.disk_r,
-                disk_w=metric.disk_w,
-                net_rx_kbytes=metric.net_rx_kbytes,
-                net_tx_kbytes=metric.net_tx_kbytes,
-                net_rx_kbps=clean_rx,
-                net_tx_kbps=clean_tx,
-                version=metric.version,
-                inserted_at=metric.inserted_at
+        if request.format == "columnar":
+            return metrics_to_columns(metrics)
+        return metrics
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询IP监控数据失败: {str(e)}")
+
+# 批量查询可选择的返回字段
+BATCH_FIELDS = set(NodeMetricsResponse.model_fields)
+
+@router.post("/ip-metrics/batch", response_model=IPMetricsBatchResponse)
+async def get_ip_metrics_batch(
+    request: IPMetricsBatchRequest,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量查询多个IP/时间段的监控记录，结果按查询ID返回
+    
+    - 每个查询的参数与 /ip-metrics/{ip} 相同，另可用fields指定返回字段
+    - 降采样查询的缓存在一次Redis往返中批量读取（与单个查询接口共用缓存键），
+      未命中的查询按时间段和降采样参数分组，每组用一条 ip IN (...) 查询完成，结果批量写回
+    - 未降采样的查询按时间段分组读取分段缓存，缺失的时间段对同一时间范围的多个IP用一条 ip IN (...) 查询完成
+    - 单个查询的参数错误或无数据不影响其他查询，通过结果中的status/detail返回
+    """
+    try:
+        query_ids = [query.id for query in request.queries]
+        if len(set(query_ids)) != len(query_ids):
+            raise HTTPException(status_code=400, detail="查询ID不能重复")
+        
+        results = {}
+        valid_queries = []
+        for query in request.queries:
+            try:
+                validate_downsample_params(query.downsample_mode, query.lttb_field)
+                if query.fields:
+                    unknown_fields = set(query.fields) - BATCH_FIELDS
+                    if unknown_fields:
+                        raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(sorted(unknown_fields))}")
+            except HTTPException as e:
+                results[query.id] = IPMetricsBatchResult(ip=query.ip, status=e.status_code, detail=e.detail)
+                continue
+            valid_queries.append(query)
+        
+        downsampled_queries = [query for query in valid_queries if query.max_points or query.bucket_seconds]
+        raw_groups = {}
+        for query in valid_queries:
+            if not query.max_points and not query.bucket_seconds:
+                raw_groups.setdefault((query.start_time, query.end_time), []).append(query)
+        
+        # 一次往返批量读取降采样查询的缓存（批量接口缓存逐条记录格式，列式在返回前转换），
+        # 所有查询共用一次读取的已稳定数据版本号，读取不到时不读写缓存
+        data_version = current_closed_data_version()
+        if data_version is None:
+            cache_keys = [None] * len(downsampled_queries)
+            cached_values = [None] * len(downsampled_queries)
+        else:
+            cache_keys = [
+                ip_metrics_body_cache_key(query.model_copy(update={"format": "rows"}), data_version)
+                for query in downsampled_queries
+            ]
+            cached_values = cache.get_many(cache_keys)
+        
+        metrics_by_query = {}
+        cached_ids = set()
+        missed = []
+        missed_groups = {}
+        for query, key, value in zip(downsampled_queries, cache_keys, cached_values):
+            if value is not None:
+                metrics_by_query[query.id] = value
+                cached_ids.add(query.id)
+                continue
+            missed.append((query, key))
+            group = (query.start_time, query.end_time, query.max_points, query.bucket_seconds,
+                     query.downsample_mode, query.lttb_field)
+            missed_groups.setdefault(group, []).append(query)
+        
+        # 参数相同的未命中降采样查询合并为一条 ip IN (...) 查询
+        for (start_time, end_time, max_points, bucket_seconds, downsample_mode, lttb_field), queries in missed_groups.items():
+            metrics_by_ip = await db.run_sync(
+                query_ip_metrics_for_ips, sorted({query.ip for query in queries}), start_time, end_time,
+                max_points=max_points,
+                bucket_seconds=bucket_seconds,
+                downsample_mode=downsample_mode,
+                lttb_field=lttb_field
             )
-            cleaned_metrics.append(cleaned_metric)
+            for query in queries:
+                metrics_by_query[query.id] = metrics_by_ip[query.ip]
         
-        return cleaned_metrics
+        # 同一时间段的原始数据查询读取分段缓存，缺失的时间段合并查询
+        for (start_time, end_time), queries in raw_groups.items():
+            series, fully_cached = await db.run_sync(
+                get_series_for_ips, sorted({query.ip for query in queries}), start_time, end_time, query_raw_metrics_for_ips
+            )
+            for query in queries:
+                metrics_by_query[query.id] = series[query.ip]
+                if fully_cached[query.ip]:
+                    cached_ids.add(query.id)
+        
+        # 一次往返批量写回降采样查询的缓存（与单个查询接口一致，不缓存空结果）
+        cache.set_many(
+            {key: metrics_by_query[query.id] for query, key in missed if key and metrics_by_query[query.id]},
+            CacheTTL.TEN_MINUTES
+        )
+        
+        for query in valid_queries:
+            metrics = metrics_by_query[query.id]
+            if not metrics:
+                results[query.id] = IPMetricsBatchResult(
+                    ip=query.ip, status=404, detail=f"IP {query.ip} 在指定时间段内没有监控数据"
+                )
+                continue
+            if query.format == "columnar":
+                fields = ["ts"] + [field for field in query.fields if field != "ts"] if query.fields else None
+                data = metrics_to_columns(metrics, fields)
+            else:
+                data = metrics_to_records(metrics, set(query.fields) | {"ts"} if query.fields else None)
+            results[query.id] = IPMetricsBatchResult(
+                ip=query.ip,
+                status=200,
+                cached=query.id in cached_ids,
+                data=data
+            )
+        
+        return FastJSONResponse(IPMetricsBatchResponse(
+            results={query_id: results[query_id] for query_id in query_ids},
+            cache_hits=len(cached_ids),
+            query_time=datetime.now()
+        ))
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"查询IP监控数据失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"批量查询IP监控数据失败: {str(e)}")
+
+# 导出时每批从服务端游标读取的行数
+EXPORT_BATCH_SIZE = 2000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def iter_metrics_export(ip: str, start_time: int, end_time: int, export_format: str, session_factory=SessionLocal):
+    """
+    逐批导出监控记录
+
+    使用独立的数据库会话（session_factory创建，默认主库）和服务端游标（yield_per），
+    每次只在内存中保留一批记录，生成器结束或客户端断开时关闭会话。
+    """
+    table = NodeMonitorMetrics.__table__
+    columns = [column.name for column in table.columns]
+    statement = select(table).where(
+        table.c.ip == ip,
+        table.c.ts >= start_time,
+        table.c.ts <= end_time
+    ).order_by(table.c.ts.asc())
+    
+    db = session_factory()
+    try:
+        result = db.execute(
+            statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+        
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+        
+        for partition in result.partitions():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer) if export_format == "csv" else None
+            # 与ip-metrics接口保持一致：按批清理网络数据中的负数
+            clean_rx, clean_tx = clean_network(
+                to_column(row.net_rx_kbps for row in partition),
+                to_column(row.net_tx_kbps for row in partition)
+            )
+            for row, rx, tx in zip(partition, clean_rx.tolist(), clean_tx.tolist()):
+                record = row._asdict()
+                record["net_rx_kbps"], record["net_tx_kbps"] = rx, tx
+                if record["inserted_at"] is not None and not isinstance(record["inserted_at"], str):
+                    record["inserted_at"] = record["inserted_at"].isoformat()
+                
+                if writer:
+                    writer.writerow([record[column] for column in columns])
+                else:
+                    buffer.write(json.dumps(record, ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+@router.get("/ip-metrics/{ip}/export")
+async def export_ip_metrics(
+    request: Request,
+    ip: str,
+    start_time: int = Query(..., description="开始时间戳"),
+    end_time: int = Query(..., description="结束时间戳"),
+    format: str = Query("ndjson", description="导出格式：ndjson 或 csv"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    流式导出某一个IP选定时间段的所有原始记录，按照时间先后顺序排序
+    
+    - 不经过Redis缓存，使用服务端游标分批读取，内存占用与导出规模无关
+    - ndjson：每行一个JSON对象
+    - csv：首行为字段名
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+    
+    filename = f"node_metrics_{ip}_{start_time}_{end_time}.{format}"
+    return StreamingResponse(
+        iter_metrics_export(ip, start_time, end_time, format, read_session_factory(request)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/ingest", response_model=IngestResponse)
+async def ingest_metrics(
+    request: Request,
+    skip_invalid: bool = Query(False, description="是否跳过无效样本写入其余样本（默认存在无效样本时整批不写入）"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    批量写入监控数据（需要管理员权限）
+    
+    - 请求体：NDJSON（`application/x-ndjson`，每行一个样本，也接受JSON数组）或 msgpack（`application/msgpack`，样本数组）
+    - 样本字段与 node_monitor_metrics 一致，`ip`、`ts` 必填，其余可省略；`id`、`inserted_at` 由数据库生成
+    - PostgreSQL 使用 COPY 写入，其他数据库使用 executemany
+    - 响应包含解析、校验、写入各阶段耗时
+    """
+    try:
+        body = await request.body()
+        if not body:
+            raise HTTPException(status_code=400, detail="请求体为空")
+        
+        # 解析、校验和写入（COPY需要同步驱动）都是CPU或阻塞IO，使用同步会话放到线程中执行，不阻塞事件循环
+        result = await asyncio.to_thread(
+            ingest_samples, db, body, request.headers.get("content-type", ""), skip_invalid
+        )
+        if result["rejected"] and not skip_invalid:
+            raise HTTPException(status_code=422, detail=result)
+        return FastJSONResponse(result)
+    except IngestBatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"写入监控数据失败: {str(e)}")
+
+async def iter_live_events(request: Request, subscription, snapshot: List[dict]):
+    """先推送订阅IP的最新快照，之后推送轮询任务分发的新记录；空闲时定期发送注释行保持连接"""
+    try:
+        yield format_event("latest", latest_by_ip(snapshot))
+        while not subscription.lagged:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.live_keepalive_seconds)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keepalive\n\n"
+                continue
+            yield event
+    finally:
+        live_feed.unsubscribe(subscription)
+
+@router.get("/live")
+async def live_node_metrics(
+    request: Request,
+    ips: Optional[List[str]] = Query(None, description="订阅的IP列表，不传则订阅全部IP"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    实时推送节点监控数据（Server-Sent Events）
+    
+    - 连接建立后先推送一次 latest 事件：订阅IP的最新记录
+    - 之后每当有新记录写入，推送 metrics 事件（新记录列表）和 latest 事件（各IP最新一条）
+    - 所有连接共用每个worker一个的增量轮询任务，不会为每个客户端单独查询数据库
+    """
+    try:
+        watched = set(ips) if ips else None
+        # 先订阅再读取快照，避免两者之间写入的记录丢失
+        subscription = live_feed.subscribe(watched)
+        try:
+            snapshot = await db.run_sync(query_snapshot_records, watched)
+        except Exception:
+            live_feed.unsubscribe(subscription)
+            raise
+        
+        return StreamingResponse(
+            iter_live_events(request, subscription, snapshot),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"建立实时推送失败: {str(e)}")
 
-def summary_cache_key(start_time: int, end_time: int) -> str:
+def summary_cache_key(start_time: int, end_time: int, approximate: bool = False) -> str:
     """生成监控汇总缓存键"""
+    if approximate:
+        return cache_key("node_monitor", "summary", start_time, end_time, "approximate")
     return cache_key("node_monitor", "summary", start_time, end_time)
 
-@router.get("/summary")
-@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=summary_cache_key)
+@router.get("/summary", dependencies=[Depends(conditional_get(time_bucket="summary"))])
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=summary_cache_key, time_bucket="summary")
 async def get_monitoring_summary(
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
-    db: Session = Depends(get_db),
+    approximate: bool = Query(False, description="是否使用按小时HyperLogLog草图近似统计活跃IP数"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取监控数据的汇总信息
+    
+    - 默认一次扫描同时统计活跃IP数和总记录数
+    - approximate=true 时活跃IP数由按小时的HyperLogLog草图合并得到（误差约1%），
+      总记录数由1小时预聚合的样本数累加；时间段首尾不足一小时的部分查询原始表。
+      预聚合未追上最新数据、Redis不可用或时间段不足一小时时回退到精确统计
+    - 返回的approximate表示本次结果是否为近似统计
     """
     try:
-        # 统计活跃IP数量
-        active_ips_query = text("""
-            SELECT COUNT(DISTINCT ip) as active_ip_count
-            FROM node_monitor_metrics 
-            WHERE ts BETWEEN :start_time AND :end_time
-        """)
+        if approximate and await db.run_sync(rollups_available):
+            summary = await db.run_sync(approximate_summary, start_time, end_time)
+            if summary:
+                active_ip_count, total_records = summary
+                return {
+                    "active_ip_count": active_ip_count,
+                    "total_records": total_records,
+                    "approximate": True,
+                    "time_range": {
+                        "start_time": start_time,
+                        "end_time": end_time
+                    }
+                }
         
-        # 统计总记录数
-        total_records_query = text("""
-            SELECT COUNT(*) as total_records
+        # 一次扫描同时统计活跃IP数量和总记录数
+        summary_query = text("""
+            SELECT COUNT(DISTINCT ip) as active_ip_count, COUNT(*) as total_records
             FROM node_monitor_metrics 
             WHERE ts BETWEEN :start_time AND :end_time
         """)
         
-        active_ips_result = db.execute(active_ips_query, {
+        result = await db.execute(summary_query, {
             "start_time": start_time,
             "end_time": end_time
         })
         
-        total_records_result = db.execute(total_records_query, {
-            "start_time": start_time,
-            "end_time": end_time
-        })
-        
-        active_ip_count = active_ips_result.fetchone()[0]
-        total_records = total_records_result.fetchone()[0]
+        active_ip_count, total_records = result.fetchone()
         
         return {
             "active_ip_count": active_ip_count,
             "total_records": total_records,
+            "approximate": False,
             "time_range": {
                 "start_time": start_time,
                 "end_time": end_time
@@ -353,13 +902,16 @@ async def get_monitoring_summary(
 def usage_top_cache_key(request: UsageTopRequest) -> str:
     """生成TOP使用率缓存键"""
     dimensions_str = ",".join(sorted(request.dimensions)) if request.dimensions else "all"
+    if request.format != "rows":
+        return cache_key("node_monitor", "usage_top", request.start_time, request.end_time, request.top_count,
+                         dimensions_str, request.format)
     return cache_key("node_monitor", "usage_top", request.start_time, request.end_time, request.top_count, dimensions_str)
 
 @router.post("/usage-top", response_model=UsageTopResponse)
-@cached(ttl_seconds=CacheTTL.FIVE_MINUTES, key_func=usage_top_cache_key)
+@cached(ttl_seconds=CacheTTL.FIVE_MINUTES, key_func=usage_top_cache_key, raw_response=True)
 async def get_usage_top(
     request: UsageTopRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -370,6 +922,8 @@ async def get_usage_top(
     - end_time: 结束时间戳（Unix时间戳，必填）
     - top_count: 返回top数量，默认10（可选）
     - dimensions: 指定维度列表，可选值：["CPU", "内存", "磁盘", "网络", "Swap"]，默认全部维度
+    - format: 时间序列格式，rows（默认）或columnar；columnar时time_series为
+      {"timestamp": [...], "usage_rate": [...]}
     
     输出格式：
     {
@@ -403,8 +957,8 @@ async def get_usage_top(
     }
     
     说明：
-    - 基于指定时间段内每个IP的最新监控数据计算使用率进行排序
-    - 同时返回每个top IP在时间段内的完整使用率时间序列（按时间排序）
+    - 基于指定时间段内每个IP的最新监控数据计算使用率进行排序（排序在数据库中完成）
+    - 同时返回每个top IP在时间段内的完整使用率时间序列（按时间排序，只查询入选IP的数据）
     - 网络使用率 = net_rx_kbps + net_tx_kbps（单位：kbps）
     - CPU使用率 = cpu_usr + cpu_sys + cpu_iow
     - 内存使用率 = (1 - mem_free / mem_total) * 100
@@ -416,83 +970,80 @@ async def get_usage_top(
         if not request.dimensions:
             request.dimensions = ["CPU", "内存", "磁盘", "网络", "Swap"]
         
-        # 获取时间段内的所有监控数据
-        all_data_query = text("""
-            SELECT 
-                ip,
-                ts,
-                cpu_usr,
-                cpu_sys,
-                cpu_iow,
-                mem_total,
-                mem_free,
-                mem_buff,
-                mem_cache,
-                swap_total,
-                swap_used,
-                disk_used_percent,
-                net_rx_kbps,
-                net_tx_kbps
-            FROM node_monitor_metrics 
-            WHERE ts BETWEEN :start_time AND :end_time
-            ORDER BY ip, ts
-        """)
-        
-        result = db.execute(all_data_query, {
+        params = {
             "start_time": request.start_time,
-            "end_time": request.end_time
-        })
+            "end_time": request.end_time,
+            "top_count": request.top_count
+        }
         
-        rows = result.fetchall()
+        # 第一步：在数据库中计算每个IP最新记录的使用率并按维度排名，只返回各维度前top_count名
+        # （按保留两位小数后的值排名，与返回的usage_rate一致）
+        latest_source = await db.run_sync(latest_metrics_sql, request.end_time, USAGE_SOURCE_FIELDS)
+        usage_columns = ",\n".join(
+            f"{rounded_metric_sql(DIMENSION_METRICS[dimension])} AS usage_{index}"
+            for index, dimension in enumerate(request.dimensions)
+        )
+        rank_columns = ",\n".join(
+            f"ROW_NUMBER() OVER (ORDER BY CASE WHEN usage_{index} IS NULL THEN 1 ELSE 0 END, usage_{index} DESC, ip) AS rank_{index}"
+            for index in range(len(request.dimensions))
+        )
+        rank_filter = " OR ".join(
+            f"(rank_{index} <= :top_count AND usage_{index} IS NOT NULL)"
+            for index in range(len(request.dimensions))
+        )
+        top_query = text(f"""
+            WITH latest AS ({latest_source}),
+            usage AS (
+                SELECT latest.*, {usage_columns}
+                FROM latest
+            ),
+            ranked AS (
+                SELECT usage.*, {rank_columns}
+                FROM usage
+            )
+            SELECT * FROM ranked
+            WHERE {rank_filter}
+        """)
         
-        # 按IP分组数据
-        ip_data = {}
-        for row in rows:
-            if row.ip not in ip_data:
-                ip_data[row.ip] = []
-            ip_data[row.ip].append(row)
-        
-        # 计算每个IP的最新使用率
-        ip_latest_usage = {}
-        for ip, data_rows in ip_data.items():
-            # 获取最新记录
-            latest_row = max(data_rows, key=lambda x: x.ts)
-            
-            ip_latest_usage[ip] = {
-                "latest_timestamp": latest_row.ts,
-                "cpu_usage": calculate_cpu_usage(latest_row.cpu_usr, latest_row.cpu_sys, latest_row.cpu_iow),
-                "memory_usage": calculate_memory_usage(latest_row.mem_total, latest_row.mem_free, latest_row.mem_buff, latest_row.mem_cache),
-                "disk_usage": round(latest_row.disk_used_percent, 2) if latest_row.disk_used_percent is not None else None,
-                "network_usage": calculate_network_rate(latest_row.net_rx_kbps, latest_row.net_tx_kbps),
-                "swap_usage": calculate_swap_usage(latest_row.swap_total, latest_row.swap_used),
-                "all_data": data_rows
-            }
+        top_rows = (await db.execute(top_query, params)).fetchall()
         
-        # 按维度计算使用率并排序
-        dimension_data = {}
-        for dimension in request.dimensions:
-            dimension_data[dimension] = []
+        # 第二步：只查询入选IP的时间序列
+        top_ips = sorted({row.ip for row in top_rows})
+        ip_series = {ip: [] for ip in top_ips}
+        if top_ips:
+            series_query = text("""
+                SELECT 
+                    ip,
+                    ts,
+                    cpu_usr,
+                    cpu_sys,
+                    cpu_iow,
+                    mem_total,
+                    mem_free,
+                    mem_buff,
+                    mem_cache,
+                    swap_total,
+                    swap_used,
+                    disk_used_percent,
+                    net_rx_kbps,
+                    net_tx_kbps
+                FROM node_monitor_metrics 
+                WHERE ip IN :ips AND ts BETWEEN :start_time AND :end_time
+                ORDER BY ip, ts
+            """).bindparams(bindparam("ips", expanding=True))
             
-            for ip, usage_data in ip_latest_usage.items():
-                # 正确的维度映射
-                usage_key_map = {
-                    "CPU": "cpu_usage",
-                    "内存": "memory_usage", 
-                    "磁盘": "disk_usage",
-                    "网络": "network_usage",
-                    "Swap": "swap_usage"
-                }
-                
-                usage_key = usage_key_map.get(dimension)
-                if usage_key and usage_data[usage_key] is not None:
-                    dimension_data[dimension].append({
-                        "ip": ip,
-                        "usage_rate": usage_data[usage_key],
-                        "latest_timestamp": usage_data["latest_timestamp"],
-                        "all_data": usage_data["all_data"]
-                    })
-        
-        # 对每个维度按使用率降序排序，取前top_count个
+            result = await db.execute(series_query, dict(params, ips=top_ips))
+            for row in result:
+                ip_series[row.ip].append(row)
+        
+        # 批量计算入选IP最新记录和时间序列的衍生指标
+        top_derived = derived_metrics_for_rows(top_rows)
+        series_derived = {
+            ip: ([row.ts for row in rows], derived_metrics_for_rows(rows))
+            for ip, rows in ip_series.items()
+        }
+        
+        # 对每个维度按排名取前top_count个，并生成时间序列
         result_dimensions = {}
         dimension_units = {
             "CPU": "%",
@@ -502,46 +1053,39 @@ async def get_usage_top(
             "Swap": "%"
         }
         
-        for dimension in request.dimensions:
-            items = dimension_data[dimension]
-            # 按使用率降序排序
-            items.sort(key=lambda x: x["usage_rate"], reverse=True)
-            # 取前top_count个
-            top_items = items[:request.top_count]
+        for index, dimension in enumerate(request.dimensions):
+            rank_key = f"rank_{index}"
+            usage_key = f"usage_{index}"
+            metric_field = DIMENSION_METRICS[dimension]
+            latest_usage = to_optional_list(top_derived[metric_field])
+            items = [
+                (row, latest_usage[position]) for position, row in enumerate(top_rows)
+                if getattr(row, rank_key) <= request.top_count and getattr(row, usage_key) is not None
+            ]
+            items.sort(key=lambda item: getattr(item[0], rank_key))
             
-            # 为每个top item生成时间序列
             top_items_with_series = []
-            for item in top_items:
+            for item, usage_rate in items:
                 # 生成时间序列数据
-                time_series = []
-                
-                for data_row in item["all_data"]:
-                    if dimension == "CPU":
-                        usage = calculate_cpu_usage(data_row.cpu_usr, data_row.cpu_sys, data_row.cpu_iow)
-                    elif dimension == "内存":
-                        usage = calculate_memory_usage(data_row.mem_total, data_row.mem_free, data_row.mem_buff, data_row.mem_cache)
-                    elif dimension == "磁盘":
-                        usage = round(data_row.disk_used_percent, 2) if data_row.disk_used_percent is not None else None
-                    elif dimension == "网络":
-                        usage = calculate_network_rate(data_row.net_rx_kbps, data_row.net_tx_kbps)
-                    elif dimension == "Swap":
-                        usage = calculate_swap_usage(data_row.swap_total, data_row.swap_used)
-                    else:
-                        usage = None
-                    
-                    if usage is not None:
-                        time_series.append({
-                            "timestamp": data_row.ts,
-                            "usage_rate": usage
-                        })
-                
-                # 按时间戳排序时间序列
-                time_series.sort(key=lambda x: x["timestamp"])
+                timestamps, derived = series_derived.get(item.ip, ([], {}))
+                usages = to_optional_list(derived[metric_field]) if timestamps else []
+                if request.format == "columnar":
+                    valid = [usage is not None for usage in usages]
+                    time_series = {
+                        "timestamp": list(compress(timestamps, valid)),
+                        "usage_rate": list(compress(usages, valid))
+                    }
+                else:
+                    time_series = [
+                        {"timestamp": timestamp, "usage_rate": usage}
+                        for timestamp, usage in zip(timestamps, usages)
+                        if usage is not None
+                    ]
                 
                 top_items_with_series.append({
-                    "ip": item["ip"],
-                    "usage_rate": item["usage_rate"],
-                    "latest_timestamp": item["latest_timestamp"],
+                    "ip": item.ip,
+                    "usage_rate": usage_rate,
+                    "latest_timestamp": item.ts,
                     "time_series": time_series
                 })
             
@@ -1,13 +1,17 @@
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.replicas import get_read_db
 from app.schemas import MachineScore, DimensionScore, ScoreQueryParams, ScoreResponse
 from app.auth import get_current_user, User
 from app.routers.alert_management import AlertRuleEngine, AlertInfo
+from app.alert_evaluation import AlertPlan
+from app.rule_cache import rule_plan_cache
 from app.cache import cache, CacheTTL, cache_key
 from app.decorators import cached
+from app.conditional import conditional_get
 
 router = APIRouter(
     prefix="/scoring",
@@ -18,8 +22,9 @@ router = APIRouter(
 class AlertScoringEngine:
     """告警评分引擎"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, plan: Optional[AlertPlan] = None):
         self.db = db
+        self.plan = plan
     
     def get_dimension_for_field(self, field_name: str) -> str:
         """根据字段名确定所属维度"""
@@ -84,12 +89,8 @@ class AlertScoringEngine:
             deductions=deductions if include_details else []
         )
     
-    def calculate_machine_score(self, ip: str, start_time: int, end_time: int, include_details: bool = True) -> Optional[MachineScore]:
-        """计算单个机器的评分"""
-        # 获取该机器在指定时间范围内的告警
-        alert_engine = AlertRuleEngine(self.db)
-        alerts = alert_engine.evaluate_rules_for_ip_with_time_range(ip, start_time, end_time)
-        
+    def score_from_alerts(self, ip: str, alerts: List[AlertInfo], include_details: bool = True) -> MachineScore:
+        """由一个机器的告警计算评分"""
         if not alerts:
             # 如果没有告警，所有维度都是满分
             dimensions = {
@@ -123,33 +124,24 @@ class AlertScoringEngine:
             evaluation_time=datetime.now()
         )
     
+    def calculate_machine_score(self, ip: str, start_time: int, end_time: int, include_details: bool = True) -> Optional[MachineScore]:
+        """计算单个机器的评分"""
+        # 获取该机器在指定时间范围内的告警
+        alert_engine = AlertRuleEngine(self.db, self.plan)
+        alerts = alert_engine.evaluate_rules_for_ip_with_time_range(ip, start_time, end_time)
+        return self.score_from_alerts(ip, alerts, include_details)
+    
     def get_all_scores(self, params: ScoreQueryParams) -> ScoreResponse:
         """获取所有机器的评分"""
-        # 获取指定时间段内有监控数据的IP
-        from sqlalchemy import text
-        active_ips_query = text("""
-            SELECT DISTINCT ip FROM node_monitor_metrics 
-            WHERE ts BETWEEN :start_time AND :end_time
-            ORDER BY ip
-        """)
-        result = self.db.execute(active_ips_query, {
-            "start_time": params.start_time,
-            "end_time": params.end_time
-        })
-        ips = [row[0] for row in result.fetchall()]
-        
-        # 如果指定了IP列表，进行过滤
-        if params.ips:
-            ips = [ip for ip in ips if ip in params.ips]
+        # 一次查询读取时间段内有监控数据的IP及其最新记录，向量化评估所有规则（或读取后台评估的告警状态）
+        alert_engine = AlertRuleEngine(self.db, self.plan)
+        alerts_by_ip = alert_engine.evaluate_fleet(params.start_time, params.end_time, params.ips, params.source)
         
         # 计算每个机器的评分
-        scores = []
-        for ip in ips:
-            machine_score = self.calculate_machine_score(
-                ip, params.start_time, params.end_time, params.include_details
-            )
-            if machine_score:
-                scores.append(machine_score)
+        scores = [
+            self.score_from_alerts(ip, alerts, params.include_details)
+            for ip, alerts in alerts_by_ip.items()
+        ]
         
         return ScoreResponse(
             scores=scores,
@@ -157,20 +149,22 @@ class AlertScoringEngine:
             query_time=datetime.now()
         )
 
-def machine_scores_cache_key(start_time: int, end_time: int, ips: Optional[str], include_details: bool) -> str:
+def machine_scores_cache_key(start_time: int, end_time: int, ips: Optional[str], include_details: bool,
+                             source: str = "live") -> str:
     """生成机器评分缓存键"""
     ips_str = ips or "all"
     details_str = str(include_details)
-    return cache_key("scoring", "machines", start_time, end_time, ips_str, details_str)
+    return cache_key("scoring", "machines", start_time, end_time, ips_str, details_str, source)
 
-@router.get("/machines", response_model=ScoreResponse)
-@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=machine_scores_cache_key)
+@router.get("/machines", response_model=ScoreResponse, dependencies=[Depends(conditional_get(rules=True, time_bucket="machine_scores"))])
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=machine_scores_cache_key, time_bucket="machine_scores", raw_response=True)
 async def get_machine_scores(
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
     ips: Optional[str] = Query(None, description="指定IP列表，逗号分隔"),
     include_details: bool = Query(True, description="是否包含详细扣分信息"),
-    db: Session = Depends(get_db),
+    source: Literal["live", "state"] = Query("live", description="告警来源：live实时计算，state读取后台评估的告警状态"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -181,6 +175,7 @@ async def get_machine_scores(
     - end_time: 结束时间戳（必填，Unix时间戳）
     - ips: 指定IP列表（可选，逗号分隔的IP地址字符串）
     - include_details: 是否包含详细扣分信息（可选，默认true）
+    - source: 告警来源（可选，默认live；state时按后台告警评估任务维护的当前告警评分）
     
     返回参数：
     - scores: 机器评分列表，每个评分包含：
@@ -232,11 +227,12 @@ async def get_machine_scores(
             start_time=start_time,
             end_time=end_time,
             ips=ip_list,
-            include_details=include_details
+            include_details=include_details,
+            source=source
         )
         
-        engine = AlertScoringEngine(db)
-        return engine.get_all_scores(params)
+        plan = await rule_plan_cache.get_plan_async()
+        return await db.run_sync(lambda session: AlertScoringEngine(session, plan).get_all_scores(params))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询评分失败: {str(e)}")
@@ -246,14 +242,14 @@ def machine_score_cache_key(ip: str, start_time: int, end_time: int, include_det
     details_str = str(include_details)
     return cache_key("scoring", "machine", ip, start_time, end_time, details_str)
 
-@router.get("/machines/{ip}", response_model=MachineScore)
-@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=machine_score_cache_key)
+@router.get("/machines/{ip}", response_model=MachineScore, dependencies=[Depends(conditional_get(per_ip=True, rules=True))])
+@cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=machine_score_cache_key, raw_response=True)
 async def get_machine_score(
     ip: str,
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
     include_details: bool = Query(True, description="是否包含详细扣分信息"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -277,8 +273,10 @@ async def get_machine_score(
     - 404: 机器不存在或指定时间段内无监控数据
     """
     try:
-        engine = AlertScoringEngine(db)
-        machine_score = engine.calculate_machine_score(ip, start_time, end_time, include_details)
+        plan = await rule_plan_cache.get_plan_async()
+        machine_score = await db.run_sync(
+            lambda session: AlertScoringEngine(session, plan).calculate_machine_score(ip, start_time, end_time, include_details)
+        )
         
         if not machine_score:
             raise HTTPException(status_code=404, detail=f"机器 {ip} 不存在或指定时间段内无监控数据")
@@ -290,18 +288,19 @@ async def get_machine_score(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询机器评分失败: {str(e)}")
 
-def scoring_summary_cache_key(start_time: int, end_time: int, ips: Optional[str]) -> str:
+def scoring_summary_cache_key(start_time: int, end_time: int, ips: Optional[str], source: str = "live") -> str:
     """生成评分汇总缓存键"""
     ips_str = ips or "all"
-    return cache_key("scoring", "summary", start_time, end_time, ips_str)
+    return cache_key("scoring", "summary", start_time, end_time, ips_str, source)
 
-@router.get("/summary")
+@router.get("/summary", dependencies=[Depends(conditional_get(rules=True))])
 @cached(ttl_seconds=CacheTTL.ONE_MINUTE, key_func=scoring_summary_cache_key)
 async def get_scoring_summary(
     start_time: int = Query(..., description="开始时间戳"),
     end_time: int = Query(..., description="结束时间戳"),
     ips: Optional[str] = Query(None, description="指定IP列表，逗号分隔"),
-    db: Session = Depends(get_db),
+    source: Literal["live", "state"] = Query("live", description="告警来源：live实时计算，state读取后台评估的告警状态"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -311,6 +310,7 @@ async def get_scoring_summary(
     - start_time: 开始时间戳（必填，Unix时间戳）
     - end_time: 结束时间戳（必填，Unix时间戳）
     - ips: 指定IP列表（可选，逗号分隔的IP地址字符串）
+    - source: 告警来源（可选，默认live，同 /scoring/machines）
     
     返回参数：
     - total_machines: 机器总数
@@ -330,11 +330,12 @@ async def get_scoring_summary(
             start_time=start_time,
             end_time=end_time,
             ips=ip_list,
-            include_details=False  # 汇总不需要详细信息
+            include_details=False,  # 汇总不需要详细信息
+            source=source
         )
         
-        engine = AlertScoringEngine(db)
-        score_response = engine.get_all_scores(params)
+        plan = await rule_plan_cache.get_plan_async()
+        score_response = await db.run_sync(lambda session: AlertScoringEngine(session, plan).get_all_scores(params))
         scores = score_response.scores
         
         if not scores:
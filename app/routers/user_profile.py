@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import User
 from app.schemas import UserProfile, UserPhoneUpdate
 from app.auth import get_current_user
@@ -18,7 +19,7 @@ async def get_my_profile(
 @router.put("/phone", response_model=UserProfile)
 async def update_my_phone(
     phone_update: UserPhoneUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """更新当前用户的手机号"""
@@ -37,7 +38,7 @@ async def update_my_phone(
     
     # 检查手机号唯一性
     if phone_update.phone is not None and phone_update.phone.strip() != "":
-        if not check_phone_unique(db, phone_update.phone, exclude_user_id=current_user.id):
+        if not await db.run_sync(check_phone_unique, phone_update.phone, exclude_user_id=current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Phone number already registered"
@@ -45,18 +46,18 @@ async def update_my_phone(
     
     # 更新手机号（使用加密方法）
     current_user.set_phone_encrypted(phone_update.phone)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     
     return current_user
 
 @router.delete("/phone")
 async def delete_my_phone(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """删除当前用户的手机号（设置为空）"""
     current_user.set_phone_encrypted(None)
-    db.commit()
+    await db.commit()
     
     return {"message": "手机号已删除"}
\ No newline at end of file
@@ -1,7 +1,9 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User
 from app.schemas import UserCreate, UserResponse, UserUpdate, UserPartialUpdate, AdminUserCreate
 from app.auth import get_current_admin_user, get_password_hash
@@ -12,10 +14,10 @@ router = APIRouter(prefix="/users", tags=["用户管理"])
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user: AdminUserCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first()
     if db_user:
         if db_user.is_active:
             raise HTTPException(
@@ -32,7 +34,7 @@ async def create_user(
     # 检查手机号唯一性和是否被禁用用户使用
     if user.phone is not None and user.phone.strip() != "":
         # 查找使用该手机号的用户
-        phone_user = find_user_by_phone(db, user.phone)
+        phone_user = await db.run_sync(find_user_by_phone, user.phone)
         if phone_user:
             if phone_user.is_active:
                 raise HTTPException(
@@ -46,7 +48,7 @@ async def create_user(
                     detail="Phone number is disabled and cannot be registered"
                 )
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await asyncio.to_thread(get_password_hash, user.password)
     db_user = User(
         username=user.username,
         hashed_password=hashed_password,
@@ -56,8 +58,8 @@ async def create_user(
     # 使用加密方法设置手机号
     db_user.set_phone_encrypted(user.phone)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/", response_model=List[UserResponse])
@@ -65,22 +67,22 @@ async def get_users(
     skip: int = 0,
     limit: int = 100,
     include_inactive: bool = Query(False, description="是否包含已停用用户"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    query = db.query(User)
+    query = select(User)
     if not include_inactive:
-        query = query.filter(User.is_active == True)
-    users = query.order_by(User.id).offset(skip).limit(limit).all()
+        query = query.where(User.is_active == True)
+    users = (await db.execute(query.order_by(User.id).offset(skip).limit(limit))).scalars().all()
     return users
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -89,15 +91,15 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user_update.username is not None:
-        existing_user = db.query(User).filter(User.username == user_update.username).first()
+        existing_user = (await db.execute(select(User).where(User.username == user_update.username))).scalars().first()
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -106,7 +108,7 @@ async def update_user(
         db_user.username = user_update.username
     
     if user_update.password is not None:
-        db_user.hashed_password = get_password_hash(user_update.password)
+        db_user.hashed_password = await asyncio.to_thread(get_password_hash, user_update.password)
     
     if user_update.user_type is not None:
         db_user.user_type = user_update.user_type
@@ -117,32 +119,32 @@ async def update_user(
     if user_update.phone is not None:
         # 检查手机号唯一性
         if user_update.phone.strip() != "":
-            if not check_phone_unique(db, user_update.phone, exclude_user_id=user_id):
+            if not await db.run_sync(check_phone_unique, user_update.phone, exclude_user_id=user_id):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Phone number already registered"
                 )
         db_user.set_phone_encrypted(user_update.phone)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.patch("/{user_id}", response_model=UserResponse)
 async def partial_update_user(
     user_id: int,
     user_update: UserPartialUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """部分更新用户信息，只更新提供的字段"""
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
     # 只更新提供的字段
     if user_update.password is not None:
-        db_user.hashed_password = get_password_hash(user_update.password)
+        db_user.hashed_password = await asyncio.to_thread(get_password_hash, user_update.password)
     
     if user_update.user_type is not None:
         db_user.user_type = user_update.user_type
@@ -153,25 +155,25 @@ async def partial_update_user(
     if user_update.phone is not None:
         # 检查手机号唯一性
         if user_update.phone.strip() != "":
-            if not check_phone_unique(db, user_update.phone, exclude_user_id=user_id):
+            if not await db.run_sync(check_phone_unique, user_update.phone, exclude_user_id=user_id):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Phone number already registered"
                 )
         db_user.set_phone_encrypted(user_update.phone)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/{user_id}/deactivate")
 async def deactivate_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """停用用户"""
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -183,35 +185,35 @@ async def deactivate_user(
     
     # 停用用户
     db_user.is_active = False
-    db.commit()
+    await db.commit()
     
     return {"message": "User deactivated successfully"}
 
 @router.post("/{user_id}/activate")
 async def activate_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """激活用户"""
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
     # 激活用户
     db_user.is_active = True
-    db.commit()
+    await db.commit()
     
     return {"message": "User activated successfully"}
 
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """删除用户"""
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -222,7 +224,7 @@ async def delete_user(
         )
     
     # 删除用户
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    await db.commit()
     
     return {"message": "User deleted successfully"}
\ No newline at end of file
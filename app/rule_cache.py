@@ -0,0 +1,109 @@
+"""
+告警规则集缓存
+
+规则变更远少于告警和评分查询。每个worker进程在内存中保存最近一次编译的规则集（AlertPlan），
+用Redis中单调递增的规则版本号判断是否过期：
+
+1. 创建、修改、删除规则的接口提交后调用 bump_rules_version()，对版本号执行INCR，所有worker共享
+2. 评估前读取一次版本号（一次Redis GET），与内存中的版本一致时直接使用已编译的规则集，
+   规则查找只是字典读取
+3. 版本变化时重新读取规则并编译；版本未变但有规则跨过生效时间边界时，用内存中的规则重新编译
+
+规则从主库读取（只在版本变化时执行一次），避免只读副本的复制延迟把旧规则缓存在新版本号下。
+Redis不可用时无法得知其他worker的规则变更，每次都从数据库读取规则。
+
+读取版本号和主库规则都是同步调用，路由中通过 get_plan_async() 在线程池中执行，不阻塞事件循环；
+取得的规则集再传给在 run_sync 中执行的评估代码。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+from app.alert_evaluation import AlertPlan, load_active_rules
+from app.cache import cache, cache_key
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 不使用 alert:rules:* 前缀，规则列表缓存失效时不会删除版本号
+RULES_VERSION_KEY = cache_key("alert", "rule_version")
+
+def current_rules_version() -> Optional[str]:
+    """读取规则版本号，Redis不可用时返回None"""
+    if not cache.redis_client:
+        return None
+    try:
+        version = cache.redis_client.get(RULES_VERSION_KEY)
+        if version is None:
+            # 版本号被清除（如清空缓存）时以当前时间初始化，保证大于之前任何INCR得到的值
+            cache.redis_client.set(RULES_VERSION_KEY, time.time_ns(), nx=True)
+            version = cache.redis_client.get(RULES_VERSION_KEY)
+        return version
+    except Exception as e:
+        logger.error(f"读取告警规则版本失败: {e}")
+        return None
+
+def bump_rules_version() -> Optional[str]:
+    """规则变更后递增版本号，所有worker在下一次评估时重新编译规则"""
+    if not cache.redis_client:
+        return None
+    try:
+        pipeline = cache.redis_client.pipeline()
+        pipeline.set(RULES_VERSION_KEY, time.time_ns(), nx=True)
+        pipeline.incr(RULES_VERSION_KEY)
+        return str(pipeline.execute()[-1])
+    except Exception as e:
+        logger.error(f"更新告警规则版本失败: {e}")
+        return None
+
+def load_rules_from_primary():
+    """从主库读取所有启用的规则（对象脱离会话后只读使用）"""
+    db = SessionLocal()
+    try:
+        return load_active_rules(db)
+    finally:
+        db.close()
+
+class RulePlanCache:
+    """进程内的已编译规则集，按规则版本号失效"""
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.plan: Optional[AlertPlan] = None
+        self.lock = threading.Lock()
+
+    def get_plan(self) -> AlertPlan:
+        """返回当前规则版本的已编译规则集（同步，可能访问Redis和主库，只在后台线程中直接调用）"""
+        now = int(time.time())
+        version = current_rules_version()
+        if version is None:
+            return AlertPlan(load_rules_from_primary(), now)
+
+        with self.lock:
+            if self.version == version and self.plan is not None:
+                if self.plan.is_current(now):
+                    return self.plan
+                # 规则未变化，只是生效时间边界已过
+                self.plan = AlertPlan(self.plan.rules, now)
+                return self.plan
+
+        # 先读版本号再读规则：即使读取期间规则再次变更，缓存的规则也不旧于该版本
+        plan = AlertPlan(load_rules_from_primary(), now)
+        with self.lock:
+            self.version, self.plan = version, plan
+        logger.info(f"告警规则已重新编译，版本 {version}，共 {len(plan.rules)} 条启用的规则")
+        return plan
+
+    async def get_plan_async(self) -> AlertPlan:
+        """在线程池中取得当前规则版本的已编译规则集，供异步路由使用"""
+        return await asyncio.to_thread(self.get_plan)
+
+    def clear(self):
+        """清空进程内缓存"""
+        with self.lock:
+            self.version, self.plan = None, None
+
+# 全局规则集缓存（每个worker进程一个）
+rule_plan_cache = RulePlanCache()
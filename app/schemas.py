@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, model_validator
-from typing import Optional, Literal, List, Dict
+from typing import Optional, Literal, List, Dict, Any, Union
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -155,6 +155,12 @@ class NodeMetricsResponse(NodeMetricsBase):
     class Config:
         from_attributes = True
 
+# 时间序列响应格式：rows为每条记录一个对象，columnar为每个字段一个数组
+ResponseFormat = Literal["rows", "columnar"]
+
+# 列式监控记录：{"ts": [...], "cpu_usr": [...], ...}，各数组按下标对应同一条记录（不含ip）
+NodeMetricsColumns = Dict[str, List[Any]]
+
 class NodeLatestMetrics(BaseModel):
     ip: str
     latest_ts: int
@@ -169,12 +175,74 @@ class ActiveIPsResponse(BaseModel):
     total_count: int
     time_range: dict
 
+class NodeInfo(BaseModel):
+    ip: str
+    first_seen_ts: int
+    last_seen_ts: int
+    sample_count: int
+
+class NodesResponse(BaseModel):
+    nodes: List[NodeInfo]
+    total_count: int
+    time_range: dict
+
 class TimeRangeParams(BaseModel):
     start_time: int = Field(..., description="开始时间戳")
     end_time: int = Field(..., description="结束时间戳")
 
 class IPMetricsRequest(TimeRangeParams):
     ip: str = Field(..., description="IP地址")
+    max_points: Optional[int] = Field(None, ge=2, description="最多返回的数据点数，超过时服务端降采样")
+    bucket_seconds: Optional[int] = Field(None, ge=1, description="降采样时间桶宽度（秒），优先于max_points")
+    downsample_mode: Literal["avg", "min", "max", "last", "lttb"] = Field("avg", description="降采样模式")
+    lttb_field: str = Field("cpu_usage_rate", description="lttb模式下用于保留曲线形状的字段")
+    format: ResponseFormat = Field("rows", description="响应格式：rows（每条记录一个对象）或columnar（每个字段一个数组）")
+
+class IPMetricsBatchQuery(IPMetricsRequest):
+    """批量查询中的单个查询"""
+    id: str = Field(..., description="查询ID，结果按此ID返回")
+    fields: Optional[List[str]] = Field(None, description="返回的字段，默认全部字段（ts始终返回）")
+
+class IPMetricsBatchRequest(BaseModel):
+    """批量IP监控数据查询请求"""
+    queries: List[IPMetricsBatchQuery] = Field(..., min_length=1, max_length=200, description="查询列表")
+
+class IPMetricsBatchResult(BaseModel):
+    """单个查询的结果"""
+    ip: str
+    status: int = Field(..., description="与单个查询接口一致的状态码：200、400、404")
+    detail: Optional[str] = None
+    cached: bool = False
+    data: Union[List[Dict[str, Any]], NodeMetricsColumns] = []
+
+class IPMetricsBatchResponse(BaseModel):
+    """批量IP监控数据查询响应"""
+    results: Dict[str, IPMetricsBatchResult]
+    cache_hits: int
+    query_time: datetime
+
+class IngestSampleError(BaseModel):
+    """写入批次中一条样本的校验错误"""
+    index: int = Field(..., description="样本在批次中的序号（从0开始）")
+    field: str
+    detail: str
+
+class IngestTimings(BaseModel):
+    """写入批次各阶段耗时（毫秒）"""
+    parse_ms: float
+    validate_ms: float
+    write_ms: float
+    total_ms: float
+
+class IngestResponse(BaseModel):
+    """批量写入监控数据响应"""
+    received: int
+    inserted: int
+    rejected: int
+    errors: List[IngestSampleError] = []
+    method: str = Field(..., description="写入方式：copy 或 executemany")
+    timings: IngestTimings
+    samples_per_second: float
 
 # 告警管理相关schemas
 class AlertRuleBase(BaseModel):
@@ -186,6 +254,7 @@ class AlertRuleBase(BaseModel):
     condition_value: float = Field(..., description="阈值")
     time_range_start: Optional[int] = Field(None, description="时间范围开始")
     time_range_end: Optional[int] = Field(None, description="时间范围结束")
+    duration_seconds: int = Field(0, ge=0, description="持续时间（秒），条件连续满足该时长后才告警，0表示立即告警")
     alert_level: Literal["info", "warning", "error", "critical"] = Field("warning", description="告警级别")
     alert_message: Optional[str] = Field(None, description="告警消息模板")
     is_active: bool = Field(True, description="是否激活")
@@ -202,6 +271,7 @@ class AlertRuleUpdate(BaseModel):
     condition_value: Optional[float] = None
     time_range_start: Optional[int] = None
     time_range_end: Optional[int] = None
+    duration_seconds: Optional[int] = Field(None, ge=0)
     alert_level: Optional[Literal["info", "warning", "error", "critical"]] = None
     alert_message: Optional[str] = None
     is_active: Optional[bool] = None
@@ -232,6 +302,58 @@ class AlertsResponse(BaseModel):
     total_count: int
     query_time: datetime
 
+class AlertEventInfo(BaseModel):
+    """告警事件（后台告警评估任务维护）"""
+    id: int
+    ip: str
+    rule_id: int
+    rule_name: str
+    rule_type: str
+    alert_level: str
+    condition_field: str
+    condition_operator: str
+    threshold_value: float
+    current_value: float
+    alert_message: Optional[str] = None
+    status: str  # "firing" 或 "resolved"
+    started_at: int
+    ended_at: Optional[int] = None
+    last_ts: int
+    
+    class Config:
+        from_attributes = True
+
+class AlertHistoryResponse(BaseModel):
+    events: List[AlertEventInfo]
+    total_count: int
+    query_time: datetime
+
+class FiringInterval(BaseModel):
+    """时间段评估得到的告警区间"""
+    ip: str
+    rule_id: int
+    rule_name: str
+    rule_type: str
+    alert_level: str
+    condition_field: str
+    condition_operator: str
+    threshold_value: float
+    duration_seconds: int
+    started_at: int  # 条件开始连续满足的样本时间
+    firing_at: int  # 持续时间达到duration_seconds、开始告警的样本时间
+    ended_at: Optional[int] = None  # 第一条不再满足的样本时间，持续到时间段结束时为NULL
+    last_ts: int  # 最后一条满足条件的样本时间
+    sample_count: int
+    min_value: float
+    max_value: float
+
+class FiringIntervalsResponse(BaseModel):
+    intervals: List[FiringInterval]
+    total_count: int
+    resolution: int  # 0表示按原始样本评估，否则为预聚合桶宽度（秒）
+    sample_count: int
+    query_time: datetime
+
 class AlertQueryParams(BaseModel):
     ips: Optional[List[str]] = Field(None, description="指定IP列表，为空则查询所有IP")
     alert_levels: Optional[List[Literal["info", "warning", "error", "critical"]]] = Field(None, description="告警级别过滤")
@@ -258,6 +380,7 @@ class ScoreQueryParams(BaseModel):
     end_time: int = Field(..., description="结束时间戳")
     ips: Optional[List[str]] = Field(None, description="指定IP列表，为空则查询所有IP")
     include_details: bool = Field(True, description="是否包含详细扣分信息")
+    source: Literal["live", "state"] = Field("live", description="告警来源：live实时计算，state读取后台评估的告警状态")
 
 class ScoreResponse(BaseModel):
     """评分响应"""
@@ -271,12 +394,17 @@ class UsageTimeSeries(BaseModel):
     timestamp: int = Field(..., description="时间戳")
     usage_rate: float = Field(..., description="使用率")
 
+class UsageTimeSeriesColumns(BaseModel):
+    """列式使用率时间序列"""
+    timestamp: List[int] = Field(..., description="时间戳数组")
+    usage_rate: List[float] = Field(..., description="使用率数组")
+
 class UsageTopItem(BaseModel):
     """使用率top项目"""
     ip: str = Field(..., description="IP地址")
     usage_rate: float = Field(..., description="最新使用率")
     latest_timestamp: int = Field(..., description="最新数据时间戳")
-    time_series: List[UsageTimeSeries] = Field(..., description="时间段内的使用率序列")
+    time_series: Union[List[UsageTimeSeries], UsageTimeSeriesColumns] = Field(..., description="时间段内的使用率序列，columnar格式时为数组对象")
 
 class DimensionUsage(BaseModel):
     """维度使用率"""
@@ -290,6 +418,7 @@ class UsageTopRequest(BaseModel):
     end_time: int = Field(..., description="结束时间戳（Unix时间戳）")
     top_count: int = Field(10, description="返回top数量，默认10")
     dimensions: Optional[List[Literal["CPU", "内存", "磁盘", "网络", "Swap"]]] = Field(None, description="指定维度列表，默认全部维度")
+    format: ResponseFormat = Field("rows", description="时间序列格式：rows或columnar")
 
 class UsageTopResponse(BaseModel):
     """使用率top查询响应"""
@@ -0,0 +1,155 @@
+"""
+按时间分段缓存的单IP原始监控序列
+
+原始记录按IP和固定宽度的时间段（SERIES_CACHE_SEGMENT_SECONDS，按UTC纪元对齐）分别缓存，
+任意时间范围的请求由覆盖它的各段拼接而成：
+
+1. 计算请求覆盖的段，一次MGET读取所有段
+2. 只查询缺失的段，同一IP连续缺失的段合并为一个时间范围，相同范围的多个IP合并为一条 ip IN 查询
+3. 缺失的段一次pipeline写回：已结束超过 SERIES_CACHE_SETTLE_SECONDS 的段不再变化，
+   使用较长的TTL；仍在写入的段使用1分钟TTL
+
+缓存键包含已稳定数据版本号：回填已稳定时间段、删除历史分区后版本号递增，旧的段不再命中。
+
+图表平移几分钟时，只有新进入范围的段需要查询数据库。
+"""
+
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.cache import cache, CacheTTL, cache_key
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 已结束并稳定的时间段的数据版本号：写入已稳定时间段的回填数据、删除历史分区时递增
+CLOSED_DATA_VERSION_KEY = cache_key("node_monitor", "closed_data_version")
+
+# loader(db, ips, start_time, end_time) -> {ip: [记录dict, ...]}，时间范围为闭区间，记录可直接序列化为JSON
+SeriesLoader = Callable[[Session, List[str], int, int], Dict[str, list]]
+
+def segment_starts(start_time: int, end_time: int, segment_seconds: int) -> List[int]:
+    """覆盖 [start_time, end_time] 的各段起始时间"""
+    first = start_time // segment_seconds * segment_seconds
+    return list(range(first, end_time + 1, segment_seconds))
+
+def segment_cache_key(ip: str, segment_start: int, segment_seconds: int, data_version: str) -> str:
+    """生成时间段缓存键（data_version为已稳定数据版本号）"""
+    return cache_key("node_monitor", "series", ip, segment_seconds, segment_start, data_version)
+
+def segment_ttl(segment_start: int, segment_seconds: int, now: int) -> int:
+    """已结束并稳定的段使用较长TTL，仍可能写入新数据的段使用短TTL"""
+    if segment_start + segment_seconds + settings.series_cache_settle_seconds <= now:
+        return settings.series_cache_closed_ttl_seconds
+    return CacheTTL.ONE_MINUTE
+
+def current_closed_data_version() -> Optional[str]:
+    """读取已稳定时间段的数据版本号，Redis不可用时返回None"""
+    if not cache.redis_client:
+        return None
+    try:
+        version = cache.redis_client.get(CLOSED_DATA_VERSION_KEY)
+        if version is None:
+            # 版本号被清除时以当前时间初始化，保证大于之前任何INCR得到的值
+            cache.redis_client.set(CLOSED_DATA_VERSION_KEY, time.time_ns(), nx=True)
+            version = cache.redis_client.get(CLOSED_DATA_VERSION_KEY)
+        return version
+    except Exception as e:
+        logger.error(f"读取已稳定数据版本失败: {e}")
+        return None
+
+def bump_closed_data_version() -> Optional[str]:
+    """已稳定时间段的数据发生变化（回填、删除分区）后递增版本号"""
+    if not cache.redis_client:
+        return None
+    try:
+        pipeline = cache.redis_client.pipeline()
+        pipeline.set(CLOSED_DATA_VERSION_KEY, time.time_ns(), nx=True)
+        pipeline.incr(CLOSED_DATA_VERSION_KEY)
+        return str(pipeline.execute()[-1])
+    except Exception as e:
+        logger.error(f"更新已稳定数据版本失败: {e}")
+        return None
+
+def missing_runs(segments: List[int], segment_seconds: int) -> List[Tuple[int, int]]:
+    """把缺失的段合并为连续的时间范围 [start, end)"""
+    runs = []
+    for segment_start in segments:
+        if runs and runs[-1][1] == segment_start:
+            runs[-1] = (runs[-1][0], segment_start + segment_seconds)
+        else:
+            runs.append((segment_start, segment_start + segment_seconds))
+    return runs
+
+def get_series_for_ips(db: Session, ips: List[str], start_time: int, end_time: int,
+                       loader: SeriesLoader) -> Tuple[Dict[str, List[dict]], Dict[str, bool]]:
+    """
+    读取多个IP在 [start_time, end_time] 内的原始记录（已序列化为dict，按ts升序）
+
+    返回 ({ip: records}, {ip: 是否全部由缓存提供})。
+    """
+    segment_seconds = settings.series_cache_segment_seconds
+    segments = segment_starts(start_time, end_time, segment_seconds)
+    keys = [(ip, segment_start) for ip in ips for segment_start in segments]
+
+    # 读取不到数据版本号（Redis不可用）时不读写缓存，避免使用回填或删除分区前的段
+    data_version = current_closed_data_version()
+    if data_version is None:
+        cached_values = [None] * len(keys)
+    else:
+        # 一次往返读取所有段
+        cached_values = cache.get_many([
+            segment_cache_key(ip, segment_start, segment_seconds, data_version) for ip, segment_start in keys
+        ])
+    segment_records = {}
+    missing = {ip: [] for ip in ips}
+    for (ip, segment_start), value in zip(keys, cached_values):
+        if value is None:
+            missing[ip].append(segment_start)
+        else:
+            segment_records[(ip, segment_start)] = value
+    fully_cached = {ip: not ip_segments for ip, ip_segments in missing.items()}
+
+    # 相同缺失范围的IP合并查询
+    run_groups = {}
+    for ip, ip_segments in missing.items():
+        for run in missing_runs(ip_segments, segment_seconds):
+            run_groups.setdefault(run, []).append(ip)
+
+    now = int(time.time())
+    writes = {}
+    for (run_start, run_end), run_ips in run_groups.items():
+        metrics_by_ip = loader(db, run_ips, run_start, run_end - 1)
+        for ip in run_ips:
+            for segment_start in range(run_start, run_end, segment_seconds):
+                segment_records[(ip, segment_start)] = []
+            for record in metrics_by_ip.get(ip, []):
+                segment_start = record["ts"] // segment_seconds * segment_seconds
+                segment_records[(ip, segment_start)].append(record)
+            for segment_start in range(run_start, run_end, segment_seconds):
+                ttl = segment_ttl(segment_start, segment_seconds, now)
+                writes.setdefault(ttl, {})[(ip, segment_start)] = segment_records[(ip, segment_start)]
+
+    # 按TTL分组，每组一次pipeline写回（空段也缓存，避免反复查询没有数据的时间段）
+    if data_version is not None:
+        for ttl, items in writes.items():
+            cache.set_many({
+                segment_cache_key(ip, segment_start, segment_seconds, data_version): records
+                for (ip, segment_start), records in items.items()
+            }, ttl)
+
+    series = {}
+    for ip in ips:
+        series[ip] = [
+            record
+            for segment_start in segments
+            for record in segment_records[(ip, segment_start)]
+            if start_time <= record["ts"] <= end_time
+        ]
+    return series, fully_cached
+
+def get_series(db: Session, ip: str, start_time: int, end_time: int, loader: SeriesLoader) -> List[dict]:
+    """读取单个IP在 [start_time, end_time] 内的原始记录"""
+    series, _ = get_series_for_ips(db, [ip], start_time, end_time, loader)
+    return series[ip]
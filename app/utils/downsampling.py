@@ -0,0 +1,91 @@
+"""
+时间序列降采样工具
+
+用于长时间范围的监控数据查询，在服务端将原始记录压缩到前端可绘制的点数：
+- 分桶聚合（avg/min/max/last）：按固定时间桶聚合，由数据库完成
+- LTTB（Largest-Triangle-Three-Buckets）：保留曲线形状的代表点，返回原始记录
+"""
+
+import math
+from typing import List, Optional, Sequence
+
+# 支持的降采样模式
+DOWNSAMPLE_MODES = ("avg", "min", "max", "last", "lttb")
+
+def resolve_bucket_seconds(start_time: int, end_time: int, max_points: Optional[int] = None,
+                           bucket_seconds: Optional[int] = None) -> Optional[int]:
+    """
+    计算分桶宽度（秒）
+
+    优先使用显式指定的bucket_seconds；否则根据max_points把时间范围均分。
+    两者都未指定时返回None，表示不降采样。
+    """
+    if bucket_seconds:
+        return max(1, int(bucket_seconds))
+    if max_points:
+        span = max(1, end_time - start_time + 1)
+        return max(1, math.ceil(span / max_points))
+    return None
+
+def resolve_point_count(start_time: int, end_time: int, max_points: Optional[int] = None,
+                        bucket_seconds: Optional[int] = None) -> Optional[int]:
+    """计算LTTB模式下的目标点数"""
+    if max_points:
+        return max(2, int(max_points))
+    if bucket_seconds:
+        span = max(1, end_time - start_time + 1)
+        return max(2, math.ceil(span / bucket_seconds))
+    return None
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets降采样，返回保留点的下标
+
+    Args:
+        xs: 横坐标（时间戳），升序
+        ys: 纵坐标（指标值）
+        threshold: 目标点数（>=2时生效，2时只保留首尾两点）
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 2:
+        return list(range(n))
+    if threshold == 2:
+        return [0, n - 1]
+
+    selected = [0]
+    # 去掉首尾两个点后，剩余点平均分到 threshold - 2 个桶中
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # 下一个桶的平均点，作为三角形的第三个顶点
+        next_start = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # 当前桶
+        range_start = int(math.floor(i * every)) + 1
+        range_end = int(math.floor((i + 1) * every)) + 1
+
+        point_ax = xs[a]
+        point_ay = ys[a]
+        max_area = -1.0
+        max_index = range_start
+        for j in range(range_start, range_end):
+            area = abs(
+                (point_ax - avg_x) * (ys[j] - point_ay)
+                - (point_ax - xs[j]) * (avg_y - point_ay)
+            )
+            if area > max_area:
+                max_area = area
+                max_index = j
+
+        selected.append(max_index)
+        a = max_index
+
+    selected.append(n - 1)
+    return selected
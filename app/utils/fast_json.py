@@ -0,0 +1,40 @@
+"""
+快速JSON序列化
+
+大结果集的接口直接用orjson把结果序列化为JSON字节并返回原始Response，
+跳过FastAPI按response_model对每条记录的再次校验和转换（接口仍声明response_model，OpenAPI文档不变）。
+"""
+
+from datetime import datetime
+from typing import Any
+import orjson
+from fastapi.responses import Response
+
+# 与Pydantic JSON模式输出一致：UTC时间以Z结尾，支持numpy数组和非字符串键
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(obj: Any) -> Any:
+    """orjson无法直接序列化的类型：Pydantic模型按JSON模式导出"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """序列化为JSON字节"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+def format_datetime(value: datetime) -> str:
+    """按Pydantic JSON模式的格式输出时间（UTC以Z结尾）"""
+    text = value.isoformat()
+    if text.endswith("+00:00"):
+        text = text[:-6] + "Z"
+    return text
+
+class FastJSONResponse(Response):
+    """使用orjson序列化的JSON响应，content也可以是已经序列化好的JSON字节"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
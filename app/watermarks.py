@@ -0,0 +1,116 @@
+"""
+node_monitor_metrics 增量处理水位
+
+后台任务按自增id增量读取新写入的监控记录，处理完成后把已处理的最大id
+记录到 metrics_watermarks 表中，重启后从水位继续。
+
+并发写入时id的提交顺序可能与分配顺序不同：较小id的事务晚于较大id提交，
+水位若直接推进到读取时的 MAX(id)，晚提交的记录会被永久跳过。因此每批只推进到
+本进程至少 METRICS_WATERMARK_SETTLE_SECONDS 秒前就已观察到的 MAX(id)，
+在此期间提交的写入事务不会被跳过。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+
+# 本进程观察到的 (首次观察时间, MAX(id))，按时间递增，所有后台任务共享
+_max_id_observations = deque()
+_observations_lock = threading.Lock()
+
+def get_watermark(db: Session, name: str) -> Optional[int]:
+    """获取指定任务的水位，从未运行过时返回None"""
+    result = db.execute(
+        text("SELECT last_id FROM metrics_watermarks WHERE name = :name"),
+        {"name": name}
+    )
+    row = result.fetchone()
+    return int(row[0]) if row else None
+
+def set_watermark(db: Session, name: str, last_id: int):
+    """更新指定任务的水位（不提交事务，由调用方与业务写入一起提交）"""
+    db.execute(text("""
+        INSERT INTO metrics_watermarks (name, last_id, updated_at)
+        VALUES (:name, :last_id, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE SET
+            last_id = excluded.last_id,
+            updated_at = excluded.updated_at
+    """), {"name": name, "last_id": last_id})
+
+def advance_watermark(db: Session, name: str, from_id: Optional[int], to_id: int) -> bool:
+    """
+    仅当水位仍为from_id时推进到to_id（from_id为None表示水位尚不存在，不提交事务）
+
+    用于非幂等的增量处理：多个worker同时处理同一批时，只有先推进水位的一个返回True，
+    其余应回滚本批写入。
+    """
+    if from_id is None:
+        result = db.execute(text("""
+            INSERT INTO metrics_watermarks (name, last_id, updated_at)
+            VALUES (:name, :to_id, CURRENT_TIMESTAMP)
+            ON CONFLICT (name) DO NOTHING
+        """), {"name": name, "to_id": to_id})
+    else:
+        result = db.execute(text("""
+            UPDATE metrics_watermarks
+            SET last_id = :to_id, updated_at = CURRENT_TIMESTAMP
+            WHERE name = :name AND last_id = :from_id
+        """), {"name": name, "from_id": from_id, "to_id": to_id})
+    return result.rowcount == 1
+
+def get_max_metrics_id(db: Session) -> int:
+    """获取当前node_monitor_metrics的最大id"""
+    result = db.execute(text("SELECT MAX(id) FROM node_monitor_metrics"))
+    max_id = result.scalar()
+    return int(max_id) if max_id is not None else 0
+
+def settled_max_id(db: Session) -> int:
+    """
+    已稳定的最大id：本进程至少 METRICS_WATERMARK_SETTLE_SECONDS 秒前就已观察到的 MAX(id)
+
+    比它小的id若仍在未提交的事务中，该事务在观察到之后已持续超过settle秒。
+    进程刚启动、还没有足够早的观察时返回0。
+    """
+    max_id = get_max_metrics_id(db)
+    settle_seconds = settings.metrics_watermark_settle_seconds
+    if settle_seconds <= 0:
+        return max_id
+
+    now = time.monotonic()
+    cutoff = now - settle_seconds
+    with _observations_lock:
+        if not _max_id_observations or max_id > _max_id_observations[-1][1]:
+            _max_id_observations.append((now, max_id))
+        # 只保留最新的一个已稳定观察及其之后的观察
+        while len(_max_id_observations) > 1 and _max_id_observations[1][0] <= cutoff:
+            _max_id_observations.popleft()
+        observed_at, observed_max_id = _max_id_observations[0]
+    return observed_max_id if observed_at <= cutoff else 0
+
+def next_id_batch(db: Session, last_id: int, batch_size: int,
+                  settled: bool = True) -> Optional[Tuple[int, int]]:
+    """
+    计算下一批待处理记录的id区间 (last_id, upper_id]
+
+    settled为True时只处理到 settled_max_id，为晚提交的较小id留出时间；
+    没有（已稳定的）新记录时返回None。
+    """
+    upper_bound = settled_max_id(db) if settled else get_max_metrics_id(db)
+    if upper_bound <= last_id:
+        return None
+    result = db.execute(text("""
+        SELECT MAX(id) FROM (
+            SELECT id FROM node_monitor_metrics
+            WHERE id > :last_id AND id <= :upper_bound
+            ORDER BY id
+            LIMIT :batch_size
+        ) batch
+    """), {"last_id": last_id, "upper_bound": upper_bound, "batch_size": batch_size})
+    upper_id = result.scalar()
+    if upper_id is None:
+        return None
+    return last_id, int(upper_id)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+alert_rules 持续时间条件迁移脚本
+
+为已有的 alert_rules 表添加 duration_seconds 列（默认0，即条件满足时立即告警），
+时间段评估按该列判断条件需要连续满足的时长。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, inspect, text
+from app.config import settings
+
+def migrate_duration_column():
+    """添加 duration_seconds 列，已存在时跳过"""
+    try:
+        engine = create_engine(settings.database_url)
+
+        columns = {column["name"] for column in inspect(engine).get_columns("alert_rules")}
+        if "duration_seconds" in columns:
+            print("alert_rules.duration_seconds 列已存在，跳过")
+            return True
+
+        with engine.begin() as connection:
+            connection.execute(text(
+                "ALTER TABLE alert_rules ADD COLUMN duration_seconds INTEGER NOT NULL DEFAULT 0"
+            ))
+            if engine.dialect.name == "postgresql":
+                connection.execute(text(
+                    "ALTER TABLE alert_rules ADD CONSTRAINT chk_duration_seconds CHECK (duration_seconds >= 0)"
+                ))
+
+        print("alert_rules.duration_seconds 列添加成功")
+        return True
+
+    except Exception as e:
+        print(f"alert_rules 持续时间条件迁移失败: {e}")
+        return False
+
+def main():
+    """主函数"""
+    print("开始迁移 alert_rules 持续时间条件...")
+
+    if migrate_duration_column():
+        print("迁移完成！")
+    else:
+        print("迁移失败！")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+node_monitor_metrics 索引迁移脚本
+
+执行 sql/node_monitor_metrics_indexes.sql：添加 (ip, ts DESC) 覆盖索引和 ts/inserted_at 的 BRIN 索引，
+删除冗余的 ip 单列索引。索引使用 CONCURRENTLY 创建，不阻塞监控数据写入。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+
+SQL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql", "node_monitor_metrics_indexes.sql")
+
+def load_statements(path: str) -> list:
+    """读取SQL文件并拆分为单条语句（去掉注释行）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line for line in f if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "".join(lines).split(";") if statement.strip()]
+
+def migrate_indexes():
+    """逐条执行索引迁移语句"""
+    if not settings.database_url.startswith("postgresql"):
+        print("索引迁移仅支持 PostgreSQL，跳过")
+        return True
+
+    try:
+        # CONCURRENTLY 不能在事务块中执行，使用自动提交
+        engine = create_engine(settings.database_url, isolation_level="AUTOCOMMIT")
+
+        with engine.connect() as connection:
+            for statement in load_statements(SQL_FILE):
+                print(f"执行: {statement.splitlines()[0]} ...")
+                connection.execute(text(statement))
+
+        print("node_monitor_metrics 索引迁移成功")
+        return True
+
+    except Exception as e:
+        print(f"node_monitor_metrics 索引迁移失败: {e}")
+        return False
+
+def main():
+    """主函数"""
+    print("开始迁移 node_monitor_metrics 索引...")
+
+    if migrate_indexes():
+        print("迁移完成！")
+    else:
+        print("迁移失败！")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+node_monitor_metrics 分区迁移脚本
+
+把未分区的 node_monitor_metrics 迁移为按 ts 范围分区的表：
+1. 执行 sql/node_monitor_metrics_partitioned.sql，以临时表名 node_monitor_metrics_partitioned 建立分区表
+2. 按现有数据的时间范围创建各分区（并预建未来分区）
+3. 逐个分区复制迁移开始时已存在的记录（不锁原表，写入不受影响）
+4. 在一个事务内锁住原表、补齐复制期间新写入的记录，然后交换表名和索引名
+原表保留为 node_monitor_metrics_legacy，确认无误后可手动删除。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.models import NodeMonitorMetrics
+from app.partitions import PARTITIONED_TABLE, partition_bounds, create_partition, list_partitions, is_partitioned
+
+SQL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql", "node_monitor_metrics_partitioned.sql")
+NEW_TABLE = f"{PARTITIONED_TABLE}_partitioned"
+LEGACY_TABLE = f"{PARTITIONED_TABLE}_legacy"
+COLUMNS = ", ".join(column.name for column in NodeMonitorMetrics.__table__.columns)
+
+def rename_indexes(db, table: str, old_prefix: str, new_prefix: str):
+    """把表上以old_prefix开头的索引重命名为new_prefix开头"""
+    result = db.execute(text("""
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = 'public' AND tablename = :table AND indexname LIKE :pattern
+    """), {"table": table, "pattern": f"{old_prefix}%"})
+    for (index_name,) in result.fetchall():
+        new_name = new_prefix + index_name[len(old_prefix):]
+        db.execute(text(f"ALTER INDEX {index_name} RENAME TO {new_name}"))
+
+def migrate_partitioning():
+    """执行分区迁移"""
+    if not settings.database_url.startswith("postgresql"):
+        print("分区迁移仅支持 PostgreSQL，跳过")
+        return True
+
+    engine = create_engine(settings.database_url)
+    db = sessionmaker(bind=engine)()
+    try:
+        if is_partitioned(db):
+            print(f"{PARTITIONED_TABLE} 已经是分区表，跳过")
+            return True
+
+        # 1. 建立临时分区表
+        with open(SQL_FILE, 'r', encoding='utf-8') as f:
+            db.execute(text(f.read()))
+        db.commit()
+
+        # 2. 创建覆盖现有数据及未来的分区
+        row = db.execute(text(f"SELECT MIN(ts), MAX(ts), MAX(id) FROM {PARTITIONED_TABLE}")).fetchone()
+        min_ts, max_ts, copy_max_id = row
+        now_ts = int(datetime.now(timezone.utc).timestamp())
+        interval = settings.metrics_partition_interval_seconds
+        start, _ = partition_bounds(min_ts if min_ts is not None else now_ts, interval)
+        end = max(max_ts or now_ts, now_ts) + settings.metrics_partition_premake * interval
+        while start <= end:
+            create_partition(db, start, start + interval, parent=NEW_TABLE)
+            start += interval
+        db.commit()
+        print(f"已创建 {len(list_partitions(db, parent=NEW_TABLE))} 个分区")
+
+        # 3. 按分区复制迁移开始时已存在的记录
+        copy_max_id = copy_max_id or 0
+        for name, partition_start, partition_end in list_partitions(db, parent=NEW_TABLE):
+            result = db.execute(text(f"""
+                INSERT INTO {NEW_TABLE} ({COLUMNS})
+                SELECT {COLUMNS} FROM {PARTITIONED_TABLE}
+                WHERE ts >= :start_ts AND ts < :end_ts AND id <= :max_id
+            """), {"start_ts": partition_start, "end_ts": partition_end, "max_id": copy_max_id})
+            db.commit()
+            if result.rowcount:
+                print(f"  {name}: {result.rowcount} 条")
+
+        # 4. 锁住原表，补齐复制期间新写入的记录并交换表名
+        db.execute(text(f"LOCK TABLE {PARTITIONED_TABLE} IN EXCLUSIVE MODE"))
+        result = db.execute(text(f"""
+            INSERT INTO {NEW_TABLE} ({COLUMNS})
+            SELECT {COLUMNS} FROM {PARTITIONED_TABLE} WHERE id > :max_id
+        """), {"max_id": copy_max_id})
+        print(f"补齐复制期间新写入的记录: {result.rowcount} 条")
+
+        db.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} RENAME TO {LEGACY_TABLE}"))
+        rename_indexes(db, LEGACY_TABLE, f"idx_{PARTITIONED_TABLE}_", f"idx_{LEGACY_TABLE}_")
+        db.execute(text(f"ALTER INDEX IF EXISTS {PARTITIONED_TABLE}_pkey RENAME TO {LEGACY_TABLE}_pkey"))
+        db.execute(text(f"ALTER TABLE {NEW_TABLE} RENAME TO {PARTITIONED_TABLE}"))
+        rename_indexes(db, PARTITIONED_TABLE, f"idx_{NEW_TABLE}_", f"idx_{PARTITIONED_TABLE}_")
+        db.execute(text(f"ALTER INDEX IF EXISTS {NEW_TABLE}_pkey RENAME TO {PARTITIONED_TABLE}_pkey"))
+        # 序列归属新表，删除旧表时不会连带删除序列
+        db.execute(text(f"ALTER SEQUENCE {PARTITIONED_TABLE}_id_seq OWNED BY {PARTITIONED_TABLE}.id"))
+        db.commit()
+
+        db.execute(text(f"ANALYZE {PARTITIONED_TABLE}"))
+        db.commit()
+        print(f"{PARTITIONED_TABLE} 分区迁移成功，原表保留为 {LEGACY_TABLE}")
+        return True
+
+    except Exception as e:
+        db.rollback()
+        print(f"{PARTITIONED_TABLE} 分区迁移失败: {e}")
+        return False
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    print(f"开始迁移 {PARTITIONED_TABLE} 为分区表...")
+
+    if migrate_partitioning():
+        print("迁移完成！")
+    else:
+        print("迁移失败！")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+-- 告警事件表：每行是一条规则在一个IP上从触发到恢复的一段持续告警
+-- 由后端的告警评估任务（app/alert_state.py）按 node_monitor_metrics.id 水位增量维护
+CREATE TABLE IF NOT EXISTS alert_events (
+    id BIGSERIAL PRIMARY KEY,
+    ip TEXT NOT NULL,
+    rule_id INTEGER NOT NULL,  -- 触发时的规则id，规则删除后事件保留
+    rule_name VARCHAR(100) NOT NULL,
+    rule_type VARCHAR(20) NOT NULL,
+    alert_level VARCHAR(20) NOT NULL,
+    condition_field VARCHAR(50) NOT NULL,
+    condition_operator VARCHAR(10) NOT NULL,
+    threshold_value FLOAT8 NOT NULL,
+    current_value FLOAT8 NOT NULL,  -- 最近一次评估时的值
+    alert_message TEXT,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('firing', 'resolved')),
+    started_at BIGINT NOT NULL,  -- 第一条命中记录的ts
+    ended_at BIGINT,  -- 第一条不再命中记录的ts，firing时为NULL
+    last_ts BIGINT NOT NULL,  -- 最近一次命中记录的ts
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 当前告警查询，同时保证每个 (ip, rule_id) 只有一条 firing 事件
+CREATE UNIQUE INDEX IF NOT EXISTS uq_alert_events_firing ON alert_events(ip, rule_id) WHERE status = 'firing';
+
+-- 告警历史按时间段查询
+CREATE INDEX IF NOT EXISTS idx_alert_events_started_at ON alert_events(started_at);
+CREATE INDEX IF NOT EXISTS idx_alert_events_ip_started_at ON alert_events(ip, started_at);
@@ -14,6 +14,9 @@ CREATE TABLE IF NOT EXISTS alert_rules (
     time_range_start BIGINT,
     time_range_end BIGINT,
     
+    -- 持续时间条件：条件连续满足该时长（秒）后才告警，0表示立即告警（见 docs/ALERT_RANGE_EVALUATION.md）
+    duration_seconds INTEGER NOT NULL DEFAULT 0 CHECK (duration_seconds >= 0),
+    
     -- 告警级别和消息
     alert_level VARCHAR(20) DEFAULT 'warning' CHECK (alert_level IN ('info', 'warning', 'error', 'critical')),
     alert_message TEXT,
@@ -0,0 +1,43 @@
+-- 节点最新数据快照表：每个IP一行，保存该IP最新的一条监控记录
+-- 由后端的快照刷新任务（app/node_snapshot.py）按 node_monitor_metrics.id 水位增量维护
+CREATE TABLE IF NOT EXISTS node_latest_metrics (
+    ip TEXT PRIMARY KEY,
+    id BIGINT NOT NULL,  -- 来源记录在 node_monitor_metrics 中的id
+    ts BIGINT NOT NULL,
+    cpu_usr FLOAT8,
+    cpu_sys FLOAT8,
+    cpu_iow FLOAT8,
+    mem_total BIGINT,
+    mem_free BIGINT,
+    mem_buff BIGINT,
+    mem_cache BIGINT,
+    swap_total BIGINT,
+    swap_used BIGINT,
+    swap_in BIGINT,
+    swap_out BIGINT,
+    system_in BIGINT,
+    system_cs BIGINT,
+    disk_name TEXT,
+    disk_total BIGINT,
+    disk_used BIGINT,
+    disk_used_percent FLOAT8,
+    disk_iops BIGINT,
+    disk_r BIGINT,
+    disk_w BIGINT,
+    net_rx_kbytes FLOAT8,
+    net_tx_kbytes FLOAT8,
+    net_rx_kbps FLOAT8,
+    net_tx_kbps FLOAT8,
+    version TEXT,
+    inserted_at TIMESTAMPTZ NOT NULL,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_node_latest_metrics_ts ON node_latest_metrics(ts);
+
+-- 增量处理水位表：每个后台任务一行，记录已处理的 node_monitor_metrics 最大id
+CREATE TABLE IF NOT EXISTS metrics_watermarks (
+    name VARCHAR(50) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
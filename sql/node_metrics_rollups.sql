@@ -0,0 +1,40 @@
+-- 监控数据预聚合表：每个IP在 1分钟/5分钟/1小时（resolution=60/300/3600）粒度上的聚合值
+-- 由后端的预聚合任务（app/rollups.py）按 node_monitor_metrics.id 水位增量维护
+-- 每个数值字段保存 _avg/_min/_max/_last 四列，网络速率先把负数视为0再聚合
+CREATE TABLE IF NOT EXISTS node_metrics_rollups (
+    ip TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket_ts BIGINT NOT NULL,  -- 按resolution对齐的桶起始时间
+    sample_count BIGINT NOT NULL,
+    last_ts BIGINT NOT NULL,
+    max_id BIGINT NOT NULL,
+    last_id BIGINT NOT NULL,
+    disk_name TEXT,
+    version TEXT,
+    inserted_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    cpu_usr_avg FLOAT8, cpu_usr_min FLOAT8, cpu_usr_max FLOAT8, cpu_usr_last FLOAT8,
+    cpu_sys_avg FLOAT8, cpu_sys_min FLOAT8, cpu_sys_max FLOAT8, cpu_sys_last FLOAT8,
+    cpu_iow_avg FLOAT8, cpu_iow_min FLOAT8, cpu_iow_max FLOAT8, cpu_iow_last FLOAT8,
+    mem_total_avg FLOAT8, mem_total_min FLOAT8, mem_total_max FLOAT8, mem_total_last FLOAT8,
+    mem_free_avg FLOAT8, mem_free_min FLOAT8, mem_free_max FLOAT8, mem_free_last FLOAT8,
+    mem_buff_avg FLOAT8, mem_buff_min FLOAT8, mem_buff_max FLOAT8, mem_buff_last FLOAT8,
+    mem_cache_avg FLOAT8, mem_cache_min FLOAT8, mem_cache_max FLOAT8, mem_cache_last FLOAT8,
+    swap_total_avg FLOAT8, swap_total_min FLOAT8, swap_total_max FLOAT8, swap_total_last FLOAT8,
+    swap_used_avg FLOAT8, swap_used_min FLOAT8, swap_used_max FLOAT8, swap_used_last FLOAT8,
+    swap_in_avg FLOAT8, swap_in_min FLOAT8, swap_in_max FLOAT8, swap_in_last FLOAT8,
+    swap_out_avg FLOAT8, swap_out_min FLOAT8, swap_out_max FLOAT8, swap_out_last FLOAT8,
+    system_in_avg FLOAT8, system_in_min FLOAT8, system_in_max FLOAT8, system_in_last FLOAT8,
+    system_cs_avg FLOAT8, system_cs_min FLOAT8, system_cs_max FLOAT8, system_cs_last FLOAT8,
+    disk_total_avg FLOAT8, disk_total_min FLOAT8, disk_total_max FLOAT8, disk_total_last FLOAT8,
+    disk_used_avg FLOAT8, disk_used_min FLOAT8, disk_used_max FLOAT8, disk_used_last FLOAT8,
+    disk_used_percent_avg FLOAT8, disk_used_percent_min FLOAT8, disk_used_percent_max FLOAT8, disk_used_percent_last FLOAT8,
+    disk_iops_avg FLOAT8, disk_iops_min FLOAT8, disk_iops_max FLOAT8, disk_iops_last FLOAT8,
+    disk_r_avg FLOAT8, disk_r_min FLOAT8, disk_r_max FLOAT8, disk_r_last FLOAT8,
+    disk_w_avg FLOAT8, disk_w_min FLOAT8, disk_w_max FLOAT8, disk_w_last FLOAT8,
+    net_rx_kbytes_avg FLOAT8, net_rx_kbytes_min FLOAT8, net_rx_kbytes_max FLOAT8, net_rx_kbytes_last FLOAT8,
+    net_tx_kbytes_avg FLOAT8, net_tx_kbytes_min FLOAT8, net_tx_kbytes_max FLOAT8, net_tx_kbytes_last FLOAT8,
+    net_rx_kbps_avg FLOAT8, net_rx_kbps_min FLOAT8, net_rx_kbps_max FLOAT8, net_rx_kbps_last FLOAT8,
+    net_tx_kbps_avg FLOAT8, net_tx_kbps_min FLOAT8, net_tx_kbps_max FLOAT8, net_tx_kbps_last FLOAT8,
+    PRIMARY KEY (ip, resolution, bucket_ts)
+);
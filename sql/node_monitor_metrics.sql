@@ -56,12 +56,19 @@ CREATE TABLE "public"."node_monitor_metrics" (
 -- ----------------------------
 -- Indexes structure for table node_monitor_metrics
 -- ----------------------------
-CREATE INDEX "idx_node_monitor_metrics_ip" ON "public"."node_monitor_metrics" USING btree (
-  "ip" COLLATE "pg_catalog"."default" "pg_catalog"."text_ops" ASC NULLS LAST
-);
+CREATE INDEX "idx_node_monitor_metrics_ip_ts" ON "public"."node_monitor_metrics" USING btree (
+  "ip" COLLATE "pg_catalog"."default" "pg_catalog"."text_ops" ASC NULLS LAST,
+  "ts" "pg_catalog"."int8_ops" DESC NULLS FIRST
+) INCLUDE ("cpu_usr", "cpu_sys", "cpu_iow", "mem_total", "mem_free", "swap_total", "swap_used", "disk_used_percent", "net_rx_kbps", "net_tx_kbps");
 CREATE INDEX "idx_node_monitor_metrics_ts" ON "public"."node_monitor_metrics" USING btree (
   "ts" "pg_catalog"."int8_ops" ASC NULLS LAST
 );
+CREATE INDEX "idx_node_monitor_metrics_ts_brin" ON "public"."node_monitor_metrics" USING brin (
+  "ts"
+);
+CREATE INDEX "idx_node_monitor_metrics_inserted_at_brin" ON "public"."node_monitor_metrics" USING brin (
+  "inserted_at"
+);
 
 -- ----------------------------
 -- Primary Key structure for table node_monitor_metrics
@@ -0,0 +1,21 @@
+-- node_monitor_metrics 索引迁移
+-- 几乎所有查询都是 ip = ? AND ts BETWEEN ? AND ? 或按 ts 范围扫描：
+--   * (ip, ts DESC) 复合索引覆盖单IP时间段查询和"按IP取最新记录"，
+--     INCLUDE 计算衍生指标所需的字段，活跃IP/TOP使用率可以走仅索引扫描
+--   * 表只追加写入，ts/inserted_at 与物理存储顺序高度相关，BRIN 索引体积极小
+--   * 原 ip 单列索引是复合索引的前缀，删除以减少写入开销
+-- CONCURRENTLY 不能在事务中执行，请逐条执行（scripts/migrate_node_monitor_indexes.py 会以自动提交方式执行）
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_node_monitor_metrics_ip_ts
+    ON node_monitor_metrics (ip, ts DESC)
+    INCLUDE (cpu_usr, cpu_sys, cpu_iow, mem_total, mem_free, swap_total, swap_used, disk_used_percent, net_rx_kbps, net_tx_kbps);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_node_monitor_metrics_ts_brin
+    ON node_monitor_metrics USING brin (ts);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_node_monitor_metrics_inserted_at_brin
+    ON node_monitor_metrics USING brin (inserted_at);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_node_monitor_metrics_ip;
+
+ANALYZE node_monitor_metrics;
@@ -0,0 +1,53 @@
+-- node_monitor_metrics 按 ts 声明式范围分区
+-- 由 scripts/migrate_node_monitor_partitioning.py 执行：先以临时表名建立分区表并复制数据，
+-- 最后在一个事务内与原表交换表名。各时间分区（node_monitor_metrics_pYYYYMMDD）由迁移脚本和
+-- 后端的分区维护任务（app/partitions.py）按 METRICS_PARTITION_INTERVAL_SECONDS 创建。
+-- 分区表的主键必须包含分区键，因此主键为 (id, ts)，id 仍使用原表的序列。
+
+CREATE TABLE IF NOT EXISTS node_monitor_metrics_partitioned (
+    id BIGINT NOT NULL DEFAULT nextval('node_monitor_metrics_id_seq'::regclass),
+    ip TEXT NOT NULL,
+    ts BIGINT NOT NULL,
+    cpu_usr FLOAT8,
+    cpu_sys FLOAT8,
+    cpu_iow FLOAT8,
+    mem_total BIGINT,
+    mem_free BIGINT,
+    mem_buff BIGINT,
+    mem_cache BIGINT,
+    swap_total BIGINT,
+    swap_used BIGINT,
+    swap_in BIGINT,
+    swap_out BIGINT,
+    system_in BIGINT,
+    system_cs BIGINT,
+    disk_name TEXT,
+    disk_total BIGINT,
+    disk_used BIGINT,
+    disk_used_percent FLOAT8,
+    disk_iops BIGINT,
+    disk_r BIGINT,
+    disk_w BIGINT,
+    net_rx_kbytes FLOAT8,
+    net_tx_kbytes FLOAT8,
+    net_rx_kbps FLOAT8,
+    net_tx_kbps FLOAT8,
+    version TEXT,
+    inserted_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- 分区父表上的索引会自动在每个分区上创建，单个分区的索引只覆盖一个时间段，更容易常驻内存
+CREATE INDEX IF NOT EXISTS idx_node_monitor_metrics_partitioned_ip_ts
+    ON node_monitor_metrics_partitioned (ip, ts DESC)
+    INCLUDE (cpu_usr, cpu_sys, cpu_iow, mem_total, mem_free, swap_total, swap_used, disk_used_percent, net_rx_kbps, net_tx_kbps);
+
+CREATE INDEX IF NOT EXISTS idx_node_monitor_metrics_partitioned_ts_brin
+    ON node_monitor_metrics_partitioned USING brin (ts);
+
+CREATE INDEX IF NOT EXISTS idx_node_monitor_metrics_partitioned_inserted_at_brin
+    ON node_monitor_metrics_partitioned USING brin (inserted_at);
+
+-- 默认分区：接收时间戳落在已建分区之外的记录（例如节点时钟异常），保证写入不失败
+CREATE TABLE IF NOT EXISTS node_monitor_metrics_default
+    PARTITION OF node_monitor_metrics_partitioned DEFAULT;
@@ -0,0 +1,12 @@
+-- 节点注册表：每个上报过监控数据的IP一行，节点发现和节点清单直接读取该表
+-- 由后端的节点注册任务（app/nodes.py）按 node_monitor_metrics.id 水位增量维护
+CREATE TABLE IF NOT EXISTS nodes (
+    ip TEXT PRIMARY KEY,
+    first_seen_ts BIGINT NOT NULL,  -- 最早一条记录的ts
+    last_seen_ts BIGINT NOT NULL,  -- 最新一条记录的ts
+    sample_count BIGINT NOT NULL DEFAULT 0,  -- 累计记录数（不随历史分区删除而减少）
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 按最近上报时间过滤（时间段内活跃的节点、失联节点）
+CREATE INDEX IF NOT EXISTS idx_nodes_last_seen_ts ON nodes(last_seen_ts);
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试告警规则向量化评估：全体告警与逐IP告警一致，评分与告警一致
+"""
+
+import time
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def alert_key(alert):
+    """告警比较键"""
+    return (alert["ip"], alert["rule_id"], alert["current_value"], alert["timestamp"])
+
+def test_fleet_matches_per_ip():
+    """/alerts 的结果应与逐个请求 /alerts/{ip} 的结果一致"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    params = {"start_time": end_time - 3600, "end_time": end_time}
+    
+    started = time.perf_counter()
+    response = requests.get(f"{BASE_URL}/alert-management/alerts", params=params, headers=headers)
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        print(f"❌ 查询全体告警失败: {response.status_code} {response.text}")
+        return
+    fleet_alerts = response.json()["alerts"]
+    print(f"全体告警 {len(fleet_alerts)} 条，耗时 {elapsed * 1000:.1f}ms")
+    
+    active = requests.get(f"{BASE_URL}/node-monitor/active-ips", params=params, headers=headers).json()
+    ips = [node["ip"] for node in active.get("active_ips", [])]
+    
+    per_ip_alerts = []
+    for ip in ips:
+        response = requests.get(f"{BASE_URL}/alert-management/alerts/{ip}", params=params, headers=headers)
+        if response.status_code == 200:
+            per_ip_alerts.extend(response.json()["alerts"])
+    
+    if sorted(map(alert_key, fleet_alerts)) == sorted(map(alert_key, per_ip_alerts)):
+        print(f"✅ 全体告警与 {len(ips)} 个IP的逐IP告警一致")
+    else:
+        print(f"❌ 全体告警 {len(fleet_alerts)} 条，逐IP告警 {len(per_ip_alerts)} 条，结果不一致")
+
+def test_scores_match_alerts():
+    """评分中各机器的告警数应等于该机器的告警数"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    params = {"start_time": end_time - 3600, "end_time": end_time}
+    
+    alerts = requests.get(f"{BASE_URL}/alert-management/alerts", params=params, headers=headers).json()["alerts"]
+    started = time.perf_counter()
+    response = requests.get(f"{BASE_URL}/scoring/machines", params=params, headers=headers)
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        print(f"❌ 查询评分失败: {response.status_code} {response.text}")
+        return
+    scores = response.json()["scores"]
+    print(f"机器评分 {len(scores)} 台，耗时 {elapsed * 1000:.1f}ms")
+    
+    alert_counts = {}
+    for alert in alerts:
+        alert_counts[alert["ip"]] = alert_counts.get(alert["ip"], 0) + 1
+    
+    mismatched = []
+    for score in scores:
+        # 不属于五个维度的字段不计入评分，因此评分中的告警数不大于告警数
+        scored = sum(dimension["alert_count"] for dimension in score["dimensions"].values())
+        if scored > alert_counts.get(score["ip"], 0):
+            mismatched.append(score["ip"])
+    
+    if mismatched:
+        print(f"❌ 以下机器的评分告警数与告警不一致: {mismatched}")
+    else:
+        print("✅ 评分与告警一致")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试全体告警与逐IP告警一致")
+    print("=" * 50)
+    test_fleet_matches_per_ip()
+    
+    print("\n" + "=" * 50)
+    print("测试评分与告警一致")
+    print("=" * 50)
+    test_scores_match_alerts()
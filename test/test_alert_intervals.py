@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+测试告警规则时间段评估：告警区间和持续时间条件
+"""
+
+import time
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def get_intervals(headers, params):
+    """查询告警区间"""
+    started = time.perf_counter()
+    response = requests.get(f"{BASE_URL}/alert-management/alerts/intervals", params=params, headers=headers)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return response, elapsed_ms
+
+def test_duration_rule():
+    """持续时间条件：同一条件下，duration_seconds越长告警区间越少，且都满足持续时长"""
+    token = get_token()
+    if not token:
+        return
+
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    rule_ids = []
+    try:
+        for duration in (0, 300):
+            rule_data = {
+                "rule_name": f"持续时间测试_{duration}_{end_time}",
+                "rule_type": "global",
+                "condition_field": "cpu_usage_rate",
+                "condition_operator": ">",
+                "condition_value": 5,
+                "duration_seconds": duration,
+                "alert_level": "info",
+                "alert_message": "持续时间测试"
+            }
+            response = requests.post(f"{BASE_URL}/alert-management/rules", json=rule_data, headers=headers)
+            if response.status_code != 200:
+                print(f"❌ 创建规则失败: {response.status_code} {response.text}")
+                return
+            rule_ids.append(response.json()["id"])
+
+        params = {"start_time": end_time - 3600, "end_time": end_time}
+        response, elapsed_ms = get_intervals(headers, params)
+        if response.status_code != 200:
+            print(f"❌ 查询告警区间失败: {response.status_code} {response.text}")
+            return
+        data = response.json()
+        print(f"评估 {data['sample_count']} 条样本，共 {data['total_count']} 个告警区间，耗时 {elapsed_ms:.1f}ms")
+
+        immediate = [item for item in data["intervals"] if item["rule_id"] == rule_ids[0]]
+        sustained = [item for item in data["intervals"] if item["rule_id"] == rule_ids[1]]
+        print(f"duration=0: {len(immediate)} 个区间，duration=300: {len(sustained)} 个区间")
+        print(f"{'✅' if len(sustained) <= len(immediate) else '❌'} 持续时间条件减少告警区间")
+
+        ok = all(item["firing_at"] - item["started_at"] >= 300 for item in sustained)
+        print(f"{'✅' if ok else '❌'} 所有区间的告警时间距开始满足条件不少于300秒")
+    finally:
+        for rule_id in rule_ids:
+            requests.delete(f"{BASE_URL}/alert-management/rules/{rule_id}", headers=headers)
+
+def test_rollup_resolution():
+    """按预聚合桶评估一天的数据"""
+    token = get_token()
+    if not token:
+        return
+
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    for resolution in (0, 300, 3600):
+        params = {"start_time": end_time - 86400, "end_time": end_time, "resolution": resolution}
+        response, elapsed_ms = get_intervals(headers, params)
+        if response.status_code != 200:
+            print(f"❌ resolution={resolution}: {response.status_code} {response.text}")
+            continue
+        data = response.json()
+        print(f"resolution={resolution}（实际 {data['resolution']}）: {data['sample_count']} 条样本，"
+              f"{data['total_count']} 个告警区间，耗时 {elapsed_ms:.1f}ms")
+
+    response, _ = get_intervals(headers, {"start_time": end_time - 3600, "end_time": end_time, "resolution": 7})
+    print(f"{'✅' if response.status_code == 400 else '❌'} 不支持的粒度返回: {response.status_code}")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试持续时间条件")
+    print("=" * 50)
+    test_duration_rule()
+
+    print("\n" + "=" * 50)
+    print("测试按预聚合桶评估")
+    print("=" * 50)
+    test_rollup_resolution()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+告警规则SQL下推一致性测试
+
+直接调用告警引擎（绕过Redis缓存），分别用向量化评估和SQL下推评估全体机器的告警和评分，
+比较两种方式的结果和耗时。需要库中已有监控数据和告警规则。
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.schemas import ScoreQueryParams
+from app.routers.alert_management import AlertRuleEngine
+from app.routers.scoring import AlertScoringEngine
+
+def evaluate(db, start_time, end_time, pushdown):
+    """按指定方式评估告警和评分，返回 (告警列表, 评分列表, 耗时ms)"""
+    settings.alert_sql_pushdown = pushdown
+    started = time.perf_counter()
+    alerts = AlertRuleEngine(db).get_all_alerts_with_time_range(start_time, end_time).alerts
+    scores = AlertScoringEngine(db).get_all_scores(
+        ScoreQueryParams(start_time=start_time, end_time=end_time, include_details=False)
+    ).scores
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return (
+        [alert.model_dump() for alert in alerts],
+        [(score.ip, score.total_score) for score in scores],
+        elapsed_ms
+    )
+
+def test_pushdown_matches_vectorized():
+    """SQL下推与向量化评估结果一致"""
+    db = SessionLocal()
+    original = settings.alert_sql_pushdown
+    try:
+        end_time = int(time.time())
+        for hours in (1, 24):
+            start_time = end_time - hours * 3600
+            live_alerts, live_scores, live_ms = evaluate(db, start_time, end_time, pushdown=False)
+            sql_alerts, sql_scores, sql_ms = evaluate(db, start_time, end_time, pushdown=True)
+
+            print(f"最近{hours}小时: 向量化 {len(live_alerts)} 条告警 {live_ms:.1f}ms，"
+                  f"SQL下推 {len(sql_alerts)} 条告警 {sql_ms:.1f}ms")
+            print(f"{'✅' if live_alerts == sql_alerts else '❌'} 告警一致")
+            print(f"{'✅' if live_scores == sql_scores else '❌'} 评分一致（{len(live_scores)} 台机器）")
+    finally:
+        settings.alert_sql_pushdown = original
+        db.close()
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试告警规则SQL下推")
+    print("=" * 50)
+    test_pushdown_matches_vectorized()
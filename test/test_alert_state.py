@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试后台告警评估：source=state 与实时计算一致，告警历史可查询
+"""
+
+import time
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def alert_keys(response):
+    """告警列表中的 (ip, rule_id)"""
+    return {(alert["ip"], alert["rule_id"]) for alert in response.json()["alerts"]}
+
+def test_state_matches_live():
+    """当前时间段内，读取告警状态与实时计算的告警一致（后台评估滞后一个周期内可能不同）"""
+    token = get_token()
+    if not token:
+        return
+
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    params = {"start_time": end_time - 3600, "end_time": end_time}
+
+    started = time.perf_counter()
+    live = requests.get(f"{BASE_URL}/alert-management/alerts", params=params, headers=headers)
+    live_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    state = requests.get(f"{BASE_URL}/alert-management/alerts", params=dict(params, source="state"), headers=headers)
+    state_ms = (time.perf_counter() - started) * 1000
+
+    if live.status_code != 200 or state.status_code != 200:
+        print(f"❌ 查询失败: live={live.status_code} state={state.status_code}")
+        return
+
+    print(f"live: {live.json()['total_count']} 条告警，耗时 {live_ms:.1f}ms")
+    print(f"state: {state.json()['total_count']} 条告警，耗时 {state_ms:.1f}ms")
+    difference = alert_keys(live) ^ alert_keys(state)
+    print(f"{'✅' if not difference else '⚠️'} 两种来源相差 {len(difference)} 条告警")
+
+    scores = requests.get(f"{BASE_URL}/scoring/machines", params=dict(params, source="state", include_details=False), headers=headers)
+    print(f"{'✅' if scores.status_code == 200 else '❌'} source=state 评分: {scores.status_code}，{scores.json().get('total_count')} 台机器")
+
+    invalid = requests.get(f"{BASE_URL}/alert-management/alerts", params=dict(params, source="cached"), headers=headers)
+    print(f"{'✅' if invalid.status_code == 422 else '❌'} 无效的source返回: {invalid.status_code}")
+
+def test_alert_history():
+    """告警历史：分页和状态过滤"""
+    token = get_token()
+    if not token:
+        return
+
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    params = {"start_time": end_time - 86400, "end_time": end_time, "limit": 5}
+
+    response = requests.get(f"{BASE_URL}/alert-management/alerts/history", params=params, headers=headers)
+    if response.status_code != 200:
+        print(f"❌ 查询告警历史失败: {response.status_code} {response.text}")
+        return
+    data = response.json()
+    print(f"最近24小时共 {data['total_count']} 个告警事件，本页 {len(data['events'])} 个")
+    for event in data["events"]:
+        ended = event["ended_at"] if event["ended_at"] is not None else "-"
+        print(f"  {event['ip']} {event['rule_name']} {event['status']} {event['started_at']} ~ {ended}")
+
+    for status in ("firing", "resolved"):
+        response = requests.get(f"{BASE_URL}/alert-management/alerts/history", params=dict(params, status=status), headers=headers)
+        events = response.json()["events"]
+        ok = all(event["status"] == status for event in events)
+        print(f"{'✅' if ok else '❌'} status={status}: {response.json()['total_count']} 个事件")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试告警状态与实时计算一致")
+    print("=" * 50)
+    test_state_matches_live()
+
+    print("\n" + "=" * 50)
+    print("测试告警历史查询")
+    print("=" * 50)
+    test_alert_history()
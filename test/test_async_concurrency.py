@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+测试异步数据库访问：慢查询执行期间其他请求不被阻塞
+"""
+
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def timed_get(url, headers=None, params=None):
+    """发送GET请求，返回 (状态码, 耗时秒)"""
+    started = time.perf_counter()
+    response = requests.get(url, headers=headers, params=params)
+    return response.status_code, time.perf_counter() - started
+
+def timed_heartbeat():
+    """上报一次心跳，返回 (状态码, 耗时秒)"""
+    heartbeat_data = {
+        "service_name": "async-concurrency-test",
+        "ip_address": "127.0.0.1"
+    }
+    started = time.perf_counter()
+    response = requests.post(f"{BASE_URL}/heartbeat/report", json=heartbeat_data)
+    return response.status_code, time.perf_counter() - started
+
+def test_heartbeat_during_slow_queries():
+    """并发发起多个长时间范围的usage-top查询，同时上报心跳，心跳不应等待慢查询结束"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    params = {
+        "start_time": end_time - 30 * 86400,
+        "end_time": end_time,
+        "top_n": 10,
+    }
+    
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        slow = [
+            executor.submit(timed_get, f"{BASE_URL}/node-monitor/usage-top", headers, dict(params, end_time=end_time - i))
+            for i in range(4)
+        ]
+        time.sleep(0.1)
+        heartbeats = [executor.submit(timed_heartbeat) for _ in range(4)]
+        slow_results = [future.result() for future in slow]
+        heartbeat_results = [future.result() for future in heartbeats]
+    
+    slowest = max(elapsed for _, elapsed in slow_results)
+    print(f"usage-top: {[(status, round(elapsed, 3)) for status, elapsed in slow_results]}")
+    print(f"heartbeat: {[(status, round(elapsed, 3)) for status, elapsed in heartbeat_results]}")
+    
+    if any(status != 200 for status, _ in heartbeat_results):
+        print("❌ 心跳上报失败")
+    elif max(elapsed for _, elapsed in heartbeat_results) < slowest:
+        print("✅ 心跳上报没有等待慢查询结束")
+    else:
+        print("⚠️ 心跳上报耗时不低于慢查询，请检查是否仍有同步查询阻塞事件循环")
+
+def test_concurrent_reads():
+    """并发请求的总耗时应明显小于串行耗时之和"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    params = {"start_time": end_time - 86400, "end_time": end_time}
+    urls = [f"{BASE_URL}/node-monitor/summary", f"{BASE_URL}/node-monitor/active-ips"] * 4
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        results = list(executor.map(lambda url: timed_get(url, headers, params), urls))
+    wall = time.perf_counter() - started
+    total = sum(elapsed for _, elapsed in results)
+    
+    print(f"并发请求 {len(urls)} 个，总耗时 {wall:.3f}s，各请求耗时之和 {total:.3f}s")
+    if any(status != 200 for status, _ in results):
+        print(f"❌ 存在失败的请求: {[status for status, _ in results]}")
+    else:
+        print("✅ 并发请求全部成功")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试慢查询期间的心跳上报")
+    print("=" * 50)
+    test_heartbeat_during_slow_queries()
+    
+    print("\n" + "=" * 50)
+    print("测试并发读取")
+    print("=" * 50)
+    test_concurrent_reads()
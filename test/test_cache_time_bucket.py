@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+测试缓存时间桶对齐
+运行前需要在 .env 中设置 CACHE_TIME_BUCKET_ENABLED=true 并启动Redis
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_time_bucket_hits():
+    """同一时间桶内秒级不同的请求应命中同一份缓存"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    status = requests.get(f"{BASE_URL}/cache-management/status", headers=headers).json()
+    print(f"时间桶配置: {status.get('time_bucket')}")
+    if not status.get("time_bucket", {}).get("enabled"):
+        print("❌ 未开启 CACHE_TIME_BUCKET_ENABLED，跳过测试")
+        return
+    
+    requests.delete(f"{BASE_URL}/cache-management/stats", headers=headers)
+    
+    endpoints = [
+        "/node-monitor/active-ips",
+        "/node-monitor/summary",
+        "/alert-management/alerts",
+        "/scoring/machines",
+    ]
+    now = int(time.time())
+    for endpoint in endpoints:
+        # 模拟多个操作员在同一分钟内以秒级精度请求"最近5分钟"
+        for offset in range(5):
+            params = {"start_time": now - 300 + offset, "end_time": now + offset}
+            response = requests.get(f"{BASE_URL}{endpoint}", params=params, headers=headers)
+            if response.status_code != 200:
+                print(f"❌ {endpoint}: {response.status_code} {response.text}")
+                break
+    
+    status = requests.get(f"{BASE_URL}/cache-management/status", headers=headers).json()
+    for name, stats in status.get("hit_stats", {}).items():
+        print(f"{name}: 命中 {stats['hits']}，未命中 {stats['misses']}，命中率 {stats['hit_rate']:.0%}")
+        if stats["hits"] > 0:
+            print(f"✅ {name} 对齐后命中缓存")
+        else:
+            print(f"❌ {name} 没有命中缓存")
+
+if __name__ == "__main__":
+    print("开始测试缓存时间桶对齐...")
+    test_time_bucket_hits()
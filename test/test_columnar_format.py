@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+测试时间序列接口的列式响应格式
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_ip_metrics_columnar(headers, ip, start_time, end_time):
+    """列式格式与逐条记录格式内容一致"""
+    params = {"start_time": start_time, "end_time": end_time}
+    rows_response = requests.get(f"{BASE_URL}/node-monitor/ip-metrics/{ip}", params=params, headers=headers)
+    columnar_response = requests.get(
+        f"{BASE_URL}/node-monitor/ip-metrics/{ip}",
+        params=dict(params, format="columnar"),
+        headers=headers
+    )
+    if rows_response.status_code != 200 or columnar_response.status_code != 200:
+        print(f"❌ 查询失败: {rows_response.status_code} {columnar_response.status_code}")
+        return
+    
+    rows = rows_response.json()
+    columns = columnar_response.json()
+    print(f"逐条记录: {len(rows_response.content)} 字节, 列式: {len(columnar_response.content)} 字节")
+    
+    mismatched = [
+        field for field, values in columns.items()
+        if values != [row[field] for row in rows]
+    ]
+    if not mismatched and len(columns["ts"]) == len(rows):
+        print(f"✅ ip-metrics 列式数据一致（{len(rows)} 条）")
+    else:
+        print(f"❌ ip-metrics 列式数据不一致: {mismatched}")
+
+def test_usage_top_columnar(headers, start_time, end_time):
+    """usage-top 列式时间序列与逐条格式一致"""
+    body = {"start_time": start_time, "end_time": end_time, "top_count": 5}
+    rows = requests.post(f"{BASE_URL}/node-monitor/usage-top", json=body, headers=headers).json()
+    columns = requests.post(f"{BASE_URL}/node-monitor/usage-top", json=dict(body, format="columnar"), headers=headers).json()
+    
+    for dimension, data in rows.get("dimensions", {}).items():
+        for row_item, column_item in zip(data["top_items"], columns["dimensions"][dimension]["top_items"]):
+            series = column_item["time_series"]
+            if series["timestamp"] != [point["timestamp"] for point in row_item["time_series"]] or \
+               series["usage_rate"] != [point["usage_rate"] for point in row_item["time_series"]]:
+                print(f"❌ {dimension} {row_item['ip']} 列式时间序列不一致")
+                return
+    print("✅ usage-top 列式时间序列一致")
+
+if __name__ == "__main__":
+    print("开始测试列式响应格式...")
+    token = get_token()
+    if token:
+        headers = {"Authorization": f"Bearer {token}"}
+        end_time = int(time.time())
+        start_time = end_time - 3600
+        active = requests.get(
+            f"{BASE_URL}/node-monitor/active-ips",
+            params={"start_time": start_time, "end_time": end_time},
+            headers=headers
+        ).json().get("active_ips", [])
+        if active:
+            test_ip_metrics_columnar(headers, active[0]["ip"], start_time, end_time)
+        test_usage_top_columnar(headers, start_time, end_time)
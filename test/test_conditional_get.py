@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试条件GET（ETag / If-None-Match）
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_not_modified():
+    """第二次带If-None-Match请求应返回304且没有响应体"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    # 已结束的时间段，数据版本固定
+    end_time = int(time.time()) - 3600
+    params = {"start_time": end_time - 3600, "end_time": end_time}
+    
+    for path in ["/node-monitor/active-ips", "/node-monitor/summary", "/alert-management/alerts", "/scoring/machines", "/scoring/summary"]:
+        first = requests.get(f"{BASE_URL}{path}", params=params, headers=headers)
+        etag = first.headers.get("ETag")
+        if first.status_code != 200 or not etag:
+            print(f"❌ {path}: {first.status_code} ETag={etag}")
+            continue
+        
+        started = time.time()
+        second = requests.get(f"{BASE_URL}{path}", params=params, headers=dict(headers, **{"If-None-Match": etag}))
+        elapsed = (time.time() - started) * 1000
+        if second.status_code == 304 and not second.content:
+            print(f"✅ {path}: 304, {elapsed:.0f} ms（首次 {len(first.content)} 字节）")
+        else:
+            print(f"❌ {path}: 期望304，实际 {second.status_code}")
+
+def test_unauthenticated():
+    """未认证的条件请求仍返回401"""
+    params = {"start_time": 0, "end_time": 1}
+    response = requests.get(f"{BASE_URL}/node-monitor/summary", params=params, headers={"If-None-Match": "*"})
+    if response.status_code == 401:
+        print("✅ 未认证请求返回401")
+    else:
+        print(f"❌ 未认证请求返回 {response.status_code}")
+
+if __name__ == "__main__":
+    print("开始测试条件GET...")
+    test_not_modified()
+    test_unauthenticated()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+测试快速JSON序列化路径：响应内容与OpenAPI文档不变，缓存命中前后结果一致
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_openapi_schema():
+    """接口仍在OpenAPI中声明响应模型"""
+    schema = requests.get(f"{BASE_URL}/openapi.json").json()
+    paths = {
+        "/node-monitor/ip-metrics/{ip}": "get",
+        "/node-monitor/usage-top": "post",
+        "/alert-management/alerts": "get",
+        "/scoring/machines": "get",
+    }
+    for path, method in paths.items():
+        response_schema = schema["paths"][path][method]["responses"]["200"]["content"]["application/json"]["schema"]
+        if response_schema:
+            print(f"✅ {path} 响应模型: {str(response_schema)[:80]}")
+        else:
+            print(f"❌ {path} 缺少响应模型")
+
+def test_cached_responses_identical():
+    """缓存未命中和命中时返回相同的JSON"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    start_time = end_time - 3600
+    params = {"start_time": start_time, "end_time": end_time}
+    
+    for path in ["/alert-management/alerts", "/scoring/machines"]:
+        requests.delete(f"{BASE_URL}/cache-management/clear", params={"pattern": "*"}, headers=headers)
+        timings = []
+        bodies = []
+        for _ in range(2):
+            started = time.time()
+            response = requests.get(f"{BASE_URL}{path}", params=params, headers=headers)
+            timings.append((time.time() - started) * 1000)
+            body = response.json()
+            body.pop("query_time", None)
+            bodies.append(body)
+        status = "✅" if bodies[0] == bodies[1] else "❌"
+        print(f"{status} {path}: 未命中 {timings[0]:.0f} ms, 命中 {timings[1]:.0f} ms, "
+              f"Content-Type={response.headers.get('content-type')}")
+
+if __name__ == "__main__":
+    print("开始测试快速JSON序列化...")
+    test_openapi_schema()
+    test_cached_responses_identical()
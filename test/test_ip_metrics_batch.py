@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+测试批量IP监控数据查询接口
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_batch_matches_single_queries():
+    """批量查询结果应与逐个查询一致"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    start_time = end_time - 3600
+    
+    response = requests.get(
+        f"{BASE_URL}/node-monitor/active-ips",
+        params={"start_time": start_time, "end_time": end_time},
+        headers=headers
+    )
+    ips = [item["ip"] for item in response.json().get("active_ips", [])][:10]
+    if not ips:
+        print("❌ 没有找到有数据的IP")
+        return
+    
+    queries = [
+        {"id": f"raw-{ip}", "ip": ip, "start_time": start_time, "end_time": end_time}
+        for ip in ips
+    ]
+    queries.append({"id": "downsampled", "ip": ips[0], "start_time": start_time, "end_time": end_time, "max_points": 60})
+    queries.append({"id": "projected", "ip": ips[0], "start_time": start_time, "end_time": end_time, "fields": ["cpu_usr", "mem_free"]})
+    queries.append({"id": "bad-field", "ip": ips[0], "start_time": start_time, "end_time": end_time, "fields": ["no_such_field"]})
+    
+    started = time.time()
+    response = requests.post(f"{BASE_URL}/node-monitor/ip-metrics/batch", json={"queries": queries}, headers=headers)
+    batch_ms = (time.time() - started) * 1000
+    if response.status_code != 200:
+        print(f"❌ 批量查询失败: {response.status_code} {response.text}")
+        return
+    results = response.json()["results"]
+    print(f"批量查询 {len(queries)} 个: {batch_ms:.0f} ms, 缓存命中 {response.json()['cache_hits']}")
+    
+    started = time.time()
+    for ip in ips:
+        single = requests.get(
+            f"{BASE_URL}/node-monitor/ip-metrics/{ip}",
+            params={"start_time": start_time, "end_time": end_time},
+            headers=headers
+        ).json()
+        if single == results[f"raw-{ip}"]["data"]:
+            print(f"✅ {ip}: {len(single)} 条，与单个查询一致")
+        else:
+            print(f"❌ {ip}: 与单个查询结果不一致")
+    print(f"逐个查询 {len(ips)} 个: {(time.time() - started) * 1000:.0f} ms")
+    
+    projected = results["projected"]["data"]
+    if projected and set(projected[0].keys()) == {"ts", "cpu_usr", "mem_free"}:
+        print("✅ 字段投影正确")
+    else:
+        print(f"❌ 字段投影错误: {projected[:1]}")
+    
+    if results["bad-field"]["status"] == 400:
+        print(f"✅ 非法字段返回400: {results['bad-field']['detail']}")
+    else:
+        print(f"❌ 非法字段未返回400: {results['bad-field']}")
+    
+    print(f"降采样查询返回 {len(results['downsampled']['data'])} 点")
+
+if __name__ == "__main__":
+    print("开始测试批量IP监控数据查询...")
+    test_batch_matches_single_queries()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+测试IP监控数据服务端降采样
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def get_test_ip(headers, start_time, end_time):
+    """获取一个有数据的IP"""
+    response = requests.get(
+        f"{BASE_URL}/node-monitor/active-ips",
+        params={"start_time": start_time, "end_time": end_time},
+        headers=headers
+    )
+    if response.status_code == 200 and response.json()["active_ips"]:
+        return response.json()["active_ips"][0]["ip"]
+    return None
+
+def test_downsampling():
+    """测试各降采样模式"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    # 最近7天
+    end_time = int(time.time())
+    start_time = end_time - 7 * 24 * 3600
+    
+    test_ip = get_test_ip(headers, start_time, end_time)
+    if not test_ip:
+        print("❌ 没有找到有数据的IP")
+        return
+    
+    url = f"{BASE_URL}/node-monitor/ip-metrics/{test_ip}"
+    base_params = {"start_time": start_time, "end_time": end_time}
+    
+    # 原始数据
+    response = requests.get(url, params=base_params, headers=headers)
+    raw_count = len(response.json()) if response.status_code == 200 else 0
+    print(f"原始记录数: {raw_count}, 响应大小: {len(response.content)} 字节")
+    
+    test_cases = [
+        {"name": "max_points=500 平均值", "params": {"max_points": 500}},
+        {"name": "bucket_seconds=3600 最大值", "params": {"bucket_seconds": 3600, "downsample_mode": "max"}},
+        {"name": "max_points=500 最小值", "params": {"max_points": 500, "downsample_mode": "min"}},
+        {"name": "max_points=500 LTTB(CPU使用率)", "params": {"max_points": 500, "downsample_mode": "lttb"}},
+        {"name": "max_points=500 LTTB(网络速率)", "params": {"max_points": 500, "downsample_mode": "lttb", "lttb_field": "network_rate"}},
+    ]
+    
+    for test_case in test_cases:
+        print(f"\n=== {test_case['name']} ===")
+        params = dict(base_params, **test_case["params"])
+        response = requests.get(url, params=params, headers=headers)
+        
+        if response.status_code == 200:
+            data = response.json()
+            print(f"返回点数: {len(data)}, 响应大小: {len(response.content)} 字节")
+            
+            max_points = test_case["params"].get("max_points")
+            if max_points and len(data) > max_points:
+                print(f"❌ 返回点数超过 max_points={max_points}")
+            else:
+                print("✅ 点数符合预期")
+            
+            timestamps = [item["ts"] for item in data]
+            if timestamps == sorted(timestamps):
+                print("✅ 按时间升序排列")
+            else:
+                print("❌ 时间顺序错误")
+            
+            if any(item["net_rx_kbps"] is not None and item["net_rx_kbps"] < 0 for item in data):
+                print("❌ 发现负数网络速率")
+        else:
+            print(f"请求失败: {response.status_code}")
+            print(f"错误信息: {response.text}")
+    
+    # 非法参数
+    print("\n=== 非法降采样参数 ===")
+    response = requests.get(url, params=dict(base_params, max_points=100, downsample_mode="median"), headers=headers)
+    print(f"{'✅' if response.status_code == 400 else '❌'} 非法模式返回 {response.status_code}")
+
+if __name__ == "__main__":
+    print("开始测试IP监控数据降采样...")
+    test_downsampling()
+    print("\n测试完成!")
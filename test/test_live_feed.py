@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+测试节点监控实时推送（SSE）
+"""
+
+import json
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def read_events(response, limit):
+    """读取SSE事件，返回 (事件名, 数据) 列表"""
+    events = []
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            events.append((event, json.loads(line[len("data:"):])))
+        elif line.startswith(":"):
+            events.append(("keepalive", None))
+        if len(events) >= limit:
+            break
+    return events
+
+def test_live_stream():
+    """连接后首先收到latest快照，之后收到新记录或保活注释"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    active = requests.get(f"{BASE_URL}/node-monitor/active-ips", headers=headers).json()
+    ips = [node["ip"] for node in active.get("active_ips", [])][:2]
+    
+    with requests.get(f"{BASE_URL}/node-monitor/live", params={"ips": ips}, headers=headers, stream=True, timeout=60) as response:
+        if response.status_code != 200:
+            print(f"❌ 建立连接失败: {response.status_code} {response.text}")
+            return
+        print(f"Content-Type: {response.headers.get('Content-Type')}")
+        
+        events = read_events(response, 3)
+        if not events or events[0][0] != "latest":
+            print(f"❌ 第一个事件应为latest: {events[:1]}")
+            return
+        snapshot_ips = set(events[0][1])
+        if snapshot_ips - set(ips):
+            print(f"❌ latest包含未订阅的IP: {snapshot_ips - set(ips)}")
+            return
+        print(f"✅ 初始快照包含 {len(snapshot_ips)} 个IP")
+        
+        for event, data in events[1:]:
+            if event == "metrics":
+                outside = {record["ip"] for record in data} - set(ips)
+                print(f"{'❌' if outside else '✅'} metrics事件 {len(data)} 条记录")
+            else:
+                print(f"✅ {event}事件")
+
+def test_unauthenticated():
+    """未认证请求返回401"""
+    response = requests.get(f"{BASE_URL}/node-monitor/live", timeout=10)
+    if response.status_code == 401:
+        print("✅ 未认证请求返回401")
+    else:
+        print(f"❌ 未认证请求返回 {response.status_code}")
+
+if __name__ == "__main__":
+    print("开始测试实时推送...")
+    test_live_stream()
+    test_unauthenticated()
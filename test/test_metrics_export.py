@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试监控数据流式导出接口
+"""
+
+import requests
+import json
+import csv
+import io
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_export():
+    """测试NDJSON和CSV导出"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    start_time = end_time - 24 * 3600
+    
+    response = requests.get(
+        f"{BASE_URL}/node-monitor/active-ips",
+        params={"start_time": start_time, "end_time": end_time},
+        headers=headers
+    )
+    if response.status_code != 200 or not response.json()["active_ips"]:
+        print("❌ 没有找到有数据的IP")
+        return
+    test_ip = response.json()["active_ips"][0]["ip"]
+    
+    url = f"{BASE_URL}/node-monitor/ip-metrics/{test_ip}/export"
+    
+    # NDJSON导出（流式读取）
+    print("\n=== NDJSON导出 ===")
+    params = {"start_time": start_time, "end_time": end_time, "format": "ndjson"}
+    with requests.get(url, params=params, headers=headers, stream=True) as response:
+        print(f"状态码: {response.status_code}, Content-Type: {response.headers.get('content-type')}")
+        count = 0
+        last_ts = None
+        ordered = True
+        for line in response.iter_lines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if last_ts is not None and record["ts"] < last_ts:
+                ordered = False
+            last_ts = record["ts"]
+            count += 1
+        print(f"导出记录数: {count}")
+        print(f"{'✅' if ordered else '❌'} 按时间升序排列")
+    
+    # CSV导出
+    print("\n=== CSV导出 ===")
+    params["format"] = "csv"
+    response = requests.get(url, params=params, headers=headers)
+    print(f"状态码: {response.status_code}, Content-Type: {response.headers.get('content-type')}")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    print(f"导出记录数: {len(rows)}")
+    if rows:
+        print(f"字段: {list(rows[0].keys())}")
+    
+    # 非法格式
+    params["format"] = "xml"
+    response = requests.get(url, params=params, headers=headers)
+    print(f"\n{'✅' if response.status_code == 400 else '❌'} 非法格式返回 {response.status_code}")
+
+if __name__ == "__main__":
+    print("开始测试监控数据导出...")
+    test_export()
+    print("\n测试完成!")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+测试监控数据批量写入接口
+"""
+
+import json
+import random
+import time
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def make_sample(ip: str, ts: int) -> dict:
+    """生成一个模拟样本"""
+    return {
+        "ip": ip, "ts": ts,
+        "cpu_usr": round(random.uniform(0, 60), 2), "cpu_sys": round(random.uniform(0, 20), 2), "cpu_iow": round(random.uniform(0, 5), 2),
+        "mem_total": 16777216, "mem_free": random.randint(0, 16777216), "mem_buff": 102400, "mem_cache": 204800,
+        "swap_total": 2097152, "swap_used": random.randint(0, 2097152),
+        "disk_name": "sda", "disk_used_percent": round(random.uniform(0, 100), 2),
+        "net_rx_kbps": round(random.uniform(0, 1000), 2), "net_tx_kbps": round(random.uniform(0, 1000), 2),
+        "version": "test"
+    }
+
+def test_ingest_ndjson(batch_size: int = 50000):
+    """NDJSON批量写入并输出各阶段耗时"""
+    token = get_token()
+    if not token:
+        return
+    
+    now = int(time.time())
+    samples = [make_sample(f"10.255.{i % 200}.{i % 250}", now - i // 200) for i in range(batch_size)]
+    body = "\n".join(json.dumps(sample) for sample in samples)
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"}
+    
+    started = time.time()
+    response = requests.post(f"{BASE_URL}/node-monitor/ingest", data=body.encode("utf-8"), headers=headers)
+    elapsed = time.time() - started
+    if response.status_code != 200:
+        print(f"❌ 写入失败: {response.status_code} {response.text[:500]}")
+        return
+    
+    result = response.json()
+    print(f"✅ 写入 {result['inserted']}/{result['received']} 个样本（{result['method']}），请求耗时 {elapsed * 1000:.0f} ms")
+    print(f"   各阶段耗时: {result['timings']}")
+    print(f"   服务端吞吐: {result['samples_per_second']:.0f} 样本/秒")
+
+def test_ingest_invalid():
+    """存在无效样本时默认整批拒绝，skip_invalid=true时写入有效样本"""
+    token = get_token()
+    if not token:
+        return
+    
+    now = int(time.time())
+    samples = [make_sample("10.255.0.1", now), {"ip": "", "ts": -1}, {"ip": "10.255.0.2", "ts": now, "mem_total": 1.5}]
+    body = "\n".join(json.dumps(sample) for sample in samples)
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"}
+    
+    response = requests.post(f"{BASE_URL}/node-monitor/ingest", data=body, headers=headers)
+    if response.status_code == 422 and response.json()["detail"]["inserted"] == 0:
+        print(f"✅ 整批拒绝，错误: {response.json()['detail']['errors']}")
+    else:
+        print(f"❌ 期望422，实际 {response.status_code}")
+    
+    response = requests.post(f"{BASE_URL}/node-monitor/ingest", params={"skip_invalid": "true"}, data=body, headers=headers)
+    if response.status_code == 200 and response.json()["inserted"] == 1:
+        print("✅ 跳过无效样本后写入1条")
+    else:
+        print(f"❌ 跳过无效样本失败: {response.status_code} {response.text}")
+
+def test_ingest_msgpack():
+    """msgpack格式写入（需要安装msgpack）"""
+    try:
+        import msgpack
+    except ImportError:
+        print("未安装msgpack，跳过")
+        return
+    token = get_token()
+    if not token:
+        return
+    
+    now = int(time.time())
+    body = msgpack.packb([make_sample("10.255.0.3", now - i) for i in range(1000)])
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/msgpack"}
+    response = requests.post(f"{BASE_URL}/node-monitor/ingest", data=body, headers=headers)
+    if response.status_code == 200:
+        print(f"✅ msgpack写入 {response.json()['inserted']} 条，耗时 {response.json()['timings']}")
+    else:
+        print(f"❌ msgpack写入失败: {response.status_code} {response.text}")
+
+if __name__ == "__main__":
+    print("开始测试监控数据批量写入...")
+    test_ingest_ndjson()
+    test_ingest_invalid()
+    test_ingest_msgpack()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+测试监控数据分区管理
+"""
+
+import sys
+from pathlib import Path
+from datetime import datetime, timezone
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.partitions import partition_bounds, partition_name, is_partitioned, list_partitions, partition_manager
+
+def test_partition_naming():
+    """测试分区范围对齐和命名"""
+    print("\n🔧 测试分区范围和命名...")
+    
+    ts = int(datetime(2025, 1, 1, 13, 30, tzinfo=timezone.utc).timestamp())
+    start, end = partition_bounds(ts, 86400)
+    assert start == int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+    assert end - start == 86400
+    assert partition_name(start, 86400) == "node_monitor_metrics_p20250101"
+    
+    start, _ = partition_bounds(ts, 3600)
+    assert partition_name(start, 3600) == "node_monitor_metrics_p20250101_1300"
+    print("✅ 分区范围和命名正确")
+
+def test_partition_maintenance():
+    """测试分区维护：当前及未来分区都已创建，没有超出保留期的分区"""
+    print("\n🧪 测试分区维护...")
+    
+    db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            print("⏭️  node_monitor_metrics 不是分区表，跳过（先执行 scripts/migrate_node_monitor_partitioning.py）")
+            return
+        
+        partition_manager.maintain_once()
+        partitions = list_partitions(db)
+        print(f"📊 分区数量: {len(partitions)}")
+        for name, start, end in partitions[-5:]:
+            print(f"  - {name}: {start} ~ {end}")
+        
+        now_ts = int(datetime.now(timezone.utc).timestamp())
+        interval = settings.metrics_partition_interval_seconds
+        starts = {start for _, start, _ in partitions}
+        current_start, _ = partition_bounds(now_ts, interval)
+        for offset in range(settings.metrics_partition_premake + 1):
+            assert current_start + offset * interval in starts, f"缺少未来第{offset}个分区"
+        
+        if settings.metrics_retention_days > 0:
+            cutoff = now_ts - settings.metrics_retention_days * 86400
+            assert all(end > cutoff for _, _, end in partitions), "存在超出保留期的分区"
+        
+        print("✅ 分区维护测试成功")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_partition_naming()
+    test_partition_maintenance()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+测试预聚合数据与原始数据分桶结果一致
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_rollup_resolutions():
+    """不同桶宽度下对比预聚合（>=60秒）与原始数据（<60秒）的点数和耗时"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    # 最近30天，起始时间对齐到整点，使预聚合桶与请求的桶边界一致
+    end_time = int(time.time())
+    start_time = (end_time - 30 * 24 * 3600) // 3600 * 3600
+    
+    response = requests.get(
+        f"{BASE_URL}/node-monitor/active-ips",
+        params={"start_time": end_time - 3600, "end_time": end_time},
+        headers=headers
+    )
+    if response.status_code != 200 or not response.json()["active_ips"]:
+        print("❌ 没有找到有数据的IP")
+        return
+    test_ip = response.json()["active_ips"][0]["ip"]
+    url = f"{BASE_URL}/node-monitor/ip-metrics/{test_ip}"
+    
+    for bucket_seconds in [30, 60, 300, 3600, 6 * 3600]:
+        for mode in ["avg", "max", "last"]:
+            params = {
+                "start_time": start_time,
+                "end_time": end_time,
+                "bucket_seconds": bucket_seconds,
+                "downsample_mode": mode
+            }
+            started = time.time()
+            response = requests.get(url, params=params, headers=headers)
+            elapsed = (time.time() - started) * 1000
+            
+            if response.status_code == 200:
+                data = response.json()
+                print(f"✅ bucket_seconds={bucket_seconds} {mode}: {len(data)} 点, {elapsed:.0f} ms")
+                
+                # 每个桶的起始时间应按bucket_seconds递增
+                for prev, curr in zip(data, data[1:]):
+                    if (curr["ts"] - prev["ts"]) % bucket_seconds != 0:
+                        print(f"❌ 桶起始时间不连续: {prev['ts']} -> {curr['ts']}")
+                        break
+            elif response.status_code == 404:
+                print(f"⚠️  bucket_seconds={bucket_seconds} {mode}: 无数据")
+            else:
+                print(f"❌ bucket_seconds={bucket_seconds} {mode}: {response.status_code} {response.text}")
+
+if __name__ == "__main__":
+    print("开始测试监控数据预聚合...")
+    test_rollup_resolutions()
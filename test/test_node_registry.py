@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试节点注册表：节点清单接口与按最近上报时间过滤
+"""
+
+import time
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def get_nodes(headers, params=None):
+    """查询节点清单"""
+    started = time.perf_counter()
+    response = requests.get(f"{BASE_URL}/node-monitor/nodes", params=params, headers=headers)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return response, elapsed_ms
+
+def test_node_inventory():
+    """节点清单：字段完整，按最近上报时间过滤的结果与全部节点一致"""
+    token = get_token()
+    if not token:
+        return
+
+    headers = {"Authorization": f"Bearer {token}"}
+    response, elapsed_ms = get_nodes(headers)
+    if response.status_code != 200:
+        print(f"❌ 查询节点清单失败: {response.status_code} {response.text}")
+        return
+    nodes = response.json()["nodes"]
+    print(f"共 {len(nodes)} 个节点，耗时 {elapsed_ms:.1f}ms")
+    for node in nodes[:5]:
+        print(f"  {node['ip']}: 首次 {node['first_seen_ts']}，最近 {node['last_seen_ts']}，{node['sample_count']} 条记录")
+
+    ok = all(node["first_seen_ts"] <= node["last_seen_ts"] and node["sample_count"] > 0 for node in nodes)
+    print(f"{'✅' if ok else '❌'} 首次上报时间不晚于最近上报时间，记录数为正")
+
+    # 最近10分钟内上报的节点 + 10分钟内没有上报的节点 = 全部节点
+    boundary = int(time.time()) - 600
+    active, _ = get_nodes(headers, {"start_time": boundary})
+    stale, _ = get_nodes(headers, {"end_time": boundary - 1})
+    active_ips = {node["ip"] for node in active.json()["nodes"]}
+    stale_ips = {node["ip"] for node in stale.json()["nodes"]}
+    print(f"最近10分钟上报 {len(active_ips)} 个，未上报 {len(stale_ips)} 个")
+    print(f"{'✅' if active_ips | stale_ips == {node['ip'] for node in nodes} else '❌'} 按最近上报时间过滤的结果覆盖全部节点")
+
+def test_active_ips_match():
+    """最近一小时内上报的节点与活跃IP接口一致"""
+    token = get_token()
+    if not token:
+        return
+
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    params = {"start_time": end_time - 3600, "end_time": end_time}
+    nodes, _ = get_nodes(headers, params)
+    active = requests.get(f"{BASE_URL}/node-monitor/active-ips", params=params, headers=headers)
+    if nodes.status_code != 200 or active.status_code != 200:
+        print(f"❌ 查询失败: {nodes.status_code} {active.status_code}")
+        return
+    node_ips = [node["ip"] for node in nodes.json()["nodes"]]
+    active_ips = [item["ip"] for item in active.json()["active_ips"]]
+    print(f"{'✅' if node_ips == active_ips else '❌'} 节点清单与活跃IP一致（{len(node_ips)} 个，注册表最多滞后一个刷新周期）")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试节点清单")
+    print("=" * 50)
+    test_node_inventory()
+
+    print("\n" + "=" * 50)
+    print("测试与活跃IP接口一致")
+    print("=" * 50)
+    test_active_ips_match()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+node_monitor_metrics 查询计划回归测试
+
+直接调用各路由的查询逻辑（绕过Redis缓存），记录实际发往数据库的 node_monitor_metrics 查询，
+再以 enable_seqscan = off 执行 EXPLAIN (FORMAT JSON)：如果没有可用的索引，规划器仍会选择
+Seq Scan，据此判定查询计划退化。仅支持 PostgreSQL，需要库中已有监控数据。
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import event, text
+from app.database import SessionLocal, AsyncSessionLocal, engine, async_engine
+from app.schemas import AlertQueryParams, ScoreQueryParams, UsageTopRequest
+from app.routers.node_monitor import get_active_ips, get_ip_metrics, get_monitoring_summary, get_usage_top
+from app.routers.alert_management import AlertRuleEngine
+from app.routers.scoring import AlertScoringEngine
+
+MONITORED_TABLE = "node_monitor_metrics"
+
+# 路由使用异步引擎，告警和评分引擎使用同步会话，两个引擎的查询都要记录
+RECORDED_ENGINES = (engine, async_engine.sync_engine)
+
+class QueryRecorder:
+    """记录执行过的 node_monitor_metrics 查询语句、参数及执行所用的引擎"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        normalized = statement.lstrip().upper()
+        if MONITORED_TABLE.upper() in normalized and normalized.startswith(("SELECT", "WITH")):
+            self.queries.append((conn.engine, statement, parameters))
+
+    async def record(self, name, func):
+        """执行func（同步函数或返回协程的函数）并返回期间记录的查询"""
+        self.queries = []
+        for target in RECORDED_ENGINES:
+            event.listen(target, "before_cursor_execute", self)
+        try:
+            result = func()
+            if asyncio.iscoroutine(result):
+                await result
+        finally:
+            for target in RECORDED_ENGINES:
+                event.remove(target, "before_cursor_execute", self)
+        return [(name, bind, statement, parameters) for bind, statement, parameters in self.queries]
+
+def find_seq_scans(plan_node, table=MONITORED_TABLE):
+    """递归查找计划中对监控表（含分区）的顺序扫描"""
+    found = []
+    relation = plan_node.get("Relation Name") or ""
+    if plan_node.get("Node Type") == "Seq Scan" and relation.startswith(table):
+        found.append(relation)
+    for child in plan_node.get("Plans", []):
+        found.extend(find_seq_scans(child, table))
+    return found
+
+async def explain(bind, statement, parameters):
+    """关闭顺序扫描后获取查询计划（在记录该查询的引擎上执行，参数格式与驱动一致）"""
+    if bind is engine:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SET enable_seqscan = off")
+            plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            connection.rollback()
+    else:
+        async with async_engine.connect() as connection:
+            await connection.exec_driver_sql("SET enable_seqscan = off")
+            result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()
+            await connection.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+async def collect_router_queries(db, async_db):
+    """依次执行各路由的查询逻辑并收集SQL（路由使用异步会话，告警和评分引擎使用同步会话）"""
+    row = db.execute(text(f"SELECT ip, ts FROM {MONITORED_TABLE} ORDER BY id DESC LIMIT 1")).fetchone()
+    if not row:
+        return None
+    ip, end_time = row.ip, row.ts
+    start_time = end_time - 3600
+    # 早于最新数据的时间段会绕过最新数据快照，覆盖窗口函数查询
+    past_range = (start_time - 3600, start_time)
+
+    recorder = QueryRecorder()
+    queries = []
+    for range_start, range_end in [(start_time, end_time), past_range]:
+        queries += await recorder.record("active-ips", lambda: get_active_ips.__wrapped__(
+            start_time=range_start, end_time=range_end, db=async_db, current_user=None))
+        queries += await recorder.record("usage-top", lambda: get_usage_top.__wrapped__(
+            request=UsageTopRequest(start_time=range_start, end_time=range_end, top_count=5), db=async_db, current_user=None))
+    queries += await recorder.record("ip-metrics", lambda: get_ip_metrics.__wrapped__(
+        ip=ip, start_time=start_time, end_time=end_time, max_points=None, bucket_seconds=None,
+        downsample_mode="avg", lttb_field="cpu_usage_rate", format="rows", db=async_db, current_user=None))
+    queries += await recorder.record("ip-metrics(bucketed)", lambda: get_ip_metrics.__wrapped__(
+        ip=ip, start_time=start_time, end_time=end_time, max_points=100, bucket_seconds=None,
+        downsample_mode="avg", lttb_field="cpu_usage_rate", format="rows", db=async_db, current_user=None))
+    queries += await recorder.record("summary", lambda: get_monitoring_summary.__wrapped__(
+        start_time=start_time, end_time=end_time, approximate=False, db=async_db, current_user=None))
+
+    alert_engine = AlertRuleEngine(db)
+    queries += await recorder.record("alerts", lambda: alert_engine.get_all_alerts(AlertQueryParams()))
+    queries += await recorder.record("alerts(time-range)", lambda: alert_engine.get_all_alerts_with_time_range(
+        start_time, end_time))
+    queries += await recorder.record("alert-latest(time-range)", lambda: alert_engine.get_latest_metrics_in_time_range(
+        ip, *past_range))
+    queries += await recorder.record("scoring", lambda: AlertScoringEngine(db).get_all_scores(
+        ScoreQueryParams(start_time=start_time, end_time=end_time, include_details=False)))
+    return queries
+
+async def check_query_plans():
+    """收集各路由的查询并逐条检查计划，返回 (检查的查询数, 退化的查询)，没有数据时返回None"""
+    db = SessionLocal()
+    try:
+        async with AsyncSessionLocal() as async_db:
+            queries = await collect_router_queries(db, async_db)
+    finally:
+        db.close()
+
+    if queries is None:
+        return None
+
+    regressions = []
+    checked = set()
+    for name, bind, statement, parameters in queries:
+        if statement in checked:
+            continue
+        checked.add(statement)
+        seq_scans = find_seq_scans(await explain(bind, statement, parameters))
+        status = "❌" if seq_scans else "✅"
+        print(f"{status} {name}: {' '.join(statement.split())[:100]}")
+        if seq_scans:
+            regressions.append((name, statement))
+    return len(checked), regressions
+
+def test_no_seq_scan_on_metrics():
+    """所有路由查询都不应顺序扫描 node_monitor_metrics"""
+    if engine.dialect.name != "postgresql":
+        print("⏭️  查询计划测试仅支持 PostgreSQL，跳过")
+        return
+
+    # 异步会话绑定事件循环，所有路由调用和EXPLAIN在同一个事件循环中执行
+    outcome = asyncio.run(check_query_plans())
+    if outcome is None:
+        print(f"⏭️  {MONITORED_TABLE} 中没有数据，跳过")
+        return
+
+    checked, regressions = outcome
+    print(f"\n共检查 {checked} 条查询，{len(regressions)} 条退化为顺序扫描")
+    assert not regressions, f"以下查询退化为顺序扫描: {[name for name, _ in regressions]}"
+
+if __name__ == "__main__":
+    print("🧪 开始检查 node_monitor_metrics 查询计划...")
+    try:
+        test_no_seq_scan_on_metrics()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("✅ 查询计划检查完成")
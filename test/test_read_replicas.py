@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试只读副本路由：副本状态、只读接口和读己之写请求头
+"""
+
+import time
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_replica_status():
+    """/health 返回各副本的健康状态和复制延迟"""
+    response = requests.get(f"{BASE_URL}/health")
+    if response.status_code != 200:
+        print(f"❌ 健康检查失败: {response.status_code}")
+        return
+    
+    replicas = response.json().get("database_replicas", [])
+    if not replicas:
+        print("⚠️ 未配置只读副本（DATABASE_REPLICA_URLS），只读接口使用主库")
+        return
+    for replica in replicas:
+        mark = "✅" if replica["healthy"] else "❌"
+        print(f"{mark} {replica['name']}: healthy={replica['healthy']}, lag_seconds={replica['lag_seconds']}")
+
+def test_read_endpoints():
+    """只读接口在副本和主库上都应正常返回"""
+    token = get_token()
+    if not token:
+        return
+    
+    end_time = int(time.time())
+    params = {"start_time": end_time - 3600, "end_time": end_time}
+    for read_your_writes in (False, True):
+        headers = {"Authorization": f"Bearer {token}"}
+        if read_your_writes:
+            headers["X-Read-Your-Writes"] = "1"
+        label = "主库（X-Read-Your-Writes）" if read_your_writes else "副本"
+        
+        for path in ("/node-monitor/active-ips", "/node-monitor/summary", "/scoring/machines", "/alert-management/alerts"):
+            response = requests.get(f"{BASE_URL}{path}", params=params, headers=headers)
+            if response.status_code == 200:
+                print(f"✅ [{label}] {path}")
+            else:
+                print(f"❌ [{label}] {path}: {response.status_code} {response.text[:200]}")
+
+def test_rule_write_then_read():
+    """创建规则后，带X-Read-Your-Writes的规则查询应立即读到新规则"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}", "X-Read-Your-Writes": "1"}
+    rule_data = {
+        "rule_name": f"副本测试规则_{int(time.time())}",
+        "rule_type": "global",
+        "condition_field": "cpu_usage_rate",
+        "condition_operator": ">",
+        "condition_value": 99.0,
+        "alert_level": "info",
+        "alert_message": "只读副本测试"
+    }
+    response = requests.post(f"{BASE_URL}/alert-management/rules", json=rule_data, headers=headers)
+    if response.status_code != 200:
+        print(f"❌ 创建规则失败: {response.status_code} {response.text}")
+        return
+    rule_id = response.json()["id"]
+    
+    response = requests.get(f"{BASE_URL}/alert-management/rules/{rule_id}", headers=headers)
+    if response.status_code == 200:
+        print(f"✅ 写入后立即读到规则 {rule_id}")
+    else:
+        print(f"❌ 写入后读取规则失败: {response.status_code}")
+    
+    requests.delete(f"{BASE_URL}/alert-management/rules/{rule_id}", headers=headers)
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试副本状态")
+    print("=" * 50)
+    test_replica_status()
+    
+    print("\n" + "=" * 50)
+    print("测试只读接口")
+    print("=" * 50)
+    test_read_endpoints()
+    
+    print("\n" + "=" * 50)
+    print("测试读己之写")
+    print("=" * 50)
+    test_rule_write_then_read()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+测试告警规则集缓存：规则变更后告警和ETag立即更新
+"""
+
+import time
+import requests
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def count_rule_alerts(headers, params, rule_id):
+    """指定规则产生的告警数"""
+    response = requests.get(f"{BASE_URL}/alert-management/alerts", params=params, headers=headers)
+    return sum(1 for alert in response.json()["alerts"] if alert["rule_id"] == rule_id), response.headers.get("ETag")
+
+def test_rule_changes_take_effect():
+    """创建、停用规则后，告警结果和ETag随规则版本变化"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    # 每次使用不同的时间段，避开接口结果缓存
+    params = {"start_time": end_time - 3600, "end_time": end_time}
+    
+    _, etag_before = count_rule_alerts(headers, params, None)
+    
+    rule_data = {
+        "rule_name": f"规则缓存测试_{end_time}",
+        "rule_type": "global",
+        "condition_field": "cpu_usage_rate",
+        "condition_operator": ">=",
+        "condition_value": 0,
+        "alert_level": "info",
+        "alert_message": "规则缓存测试"
+    }
+    response = requests.post(f"{BASE_URL}/alert-management/rules", json=rule_data, headers=headers)
+    if response.status_code != 200:
+        print(f"❌ 创建规则失败: {response.status_code} {response.text}")
+        return
+    rule_id = response.json()["id"]
+    
+    try:
+        # If-None-Match 使用旧ETag，规则版本变化后应返回200而不是304
+        response = requests.get(
+            f"{BASE_URL}/alert-management/alerts",
+            params=dict(params, end_time=end_time - 1),
+            headers=dict(headers, **{"If-None-Match": etag_before or ""})
+        )
+        print(f"{'✅' if response.status_code == 200 else '❌'} 规则创建后旧ETag失效: {response.status_code}")
+        
+        created_count, _ = count_rule_alerts(headers, dict(params, end_time=end_time - 2), rule_id)
+        print(f"{'✅' if created_count > 0 else '⚠️'} 新规则产生 {created_count} 条告警")
+        
+        requests.put(f"{BASE_URL}/alert-management/rules/{rule_id}", json={"is_active": False}, headers=headers)
+        disabled_count, _ = count_rule_alerts(headers, dict(params, end_time=end_time - 3), rule_id)
+        print(f"{'✅' if disabled_count == 0 else '❌'} 停用后该规则产生 {disabled_count} 条告警")
+    finally:
+        requests.delete(f"{BASE_URL}/alert-management/rules/{rule_id}", headers=headers)
+
+def test_cached_evaluation_latency():
+    """规则集编译后，连续查询的耗时"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    for offset in range(5):
+        params = {"start_time": end_time - 3600, "end_time": end_time - offset}
+        started = time.perf_counter()
+        response = requests.get(f"{BASE_URL}/alert-management/alerts", params=params, headers=headers)
+        print(f"第{offset + 1}次查询: {response.status_code}，耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("测试规则变更立即生效")
+    print("=" * 50)
+    test_rule_changes_take_effect()
+    
+    print("\n" + "=" * 50)
+    print("测试规则集缓存后的查询耗时")
+    print("=" * 50)
+    test_cached_evaluation_latency()
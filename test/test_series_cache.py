@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+测试单IP原始序列分段缓存
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def fetch(headers, ip, start_time, end_time):
+    """查询原始记录，返回 (记录, 耗时毫秒)"""
+    started = time.time()
+    response = requests.get(
+        f"{BASE_URL}/node-monitor/ip-metrics/{ip}",
+        params={"start_time": start_time, "end_time": end_time},
+        headers=headers
+    )
+    elapsed = (time.time() - started) * 1000
+    return (response.json() if response.status_code == 200 else []), elapsed
+
+def test_sliding_window():
+    """平移时间范围时结果应与直接查询一致，且只查询新增的时间段"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    start_time = end_time - 6 * 3600
+    
+    response = requests.get(
+        f"{BASE_URL}/node-monitor/active-ips",
+        params={"start_time": start_time, "end_time": end_time},
+        headers=headers
+    )
+    ips = [item["ip"] for item in response.json().get("active_ips", [])]
+    if not ips:
+        print("❌ 没有找到有数据的IP")
+        return
+    ip = ips[0]
+    
+    requests.delete(f"{BASE_URL}/cache-management/clear", params={"pattern": f"node_monitor:series:{ip}:*"}, headers=headers)
+    
+    first, cold_ms = fetch(headers, ip, start_time, end_time)
+    print(f"冷缓存查询6小时: {len(first)} 条, {cold_ms:.0f} ms")
+    
+    # 向后平移5分钟
+    shifted, warm_ms = fetch(headers, ip, start_time + 300, end_time + 300)
+    print(f"平移5分钟后查询: {len(shifted)} 条, {warm_ms:.0f} ms")
+    
+    overlap = [item for item in first if item["ts"] >= start_time + 300]
+    if shifted[:len(overlap)] == overlap:
+        print("✅ 重叠部分与首次查询一致")
+    else:
+        print("❌ 重叠部分与首次查询不一致")
+    
+    keys = requests.get(
+        f"{BASE_URL}/cache-management/keys",
+        params={"pattern": f"node_monitor:series:{ip}:*"},
+        headers=headers
+    ).json()
+    print(f"已缓存的时间段: {keys.get('total_count')}")
+    for key in keys.get("keys", [])[:10]:
+        print(f"  {key['key']} TTL={key['ttl']}")
+
+if __name__ == "__main__":
+    print("开始测试原始序列分段缓存...")
+    test_sliding_window()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+测试监控汇总的近似统计模式
+"""
+
+import requests
+import time
+
+# 配置
+BASE_URL = "http://localhost:8000"
+USERNAME = "admin"
+PASSWORD = "admin123"
+
+def get_token():
+    """获取认证token"""
+    login_data = {
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    if response.status_code == 200:
+        return response.json()["access_token"]
+    else:
+        print(f"登录失败: {response.text}")
+        return None
+
+def test_summary_modes():
+    """比较精确与近似统计的结果和耗时"""
+    token = get_token()
+    if not token:
+        return
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    end_time = int(time.time())
+    
+    for days in [1, 7, 30]:
+        start_time = end_time - days * 86400
+        results = {}
+        for approximate in [False, True]:
+            requests.delete(f"{BASE_URL}/cache-management/clear", params={"pattern": "node_monitor:summary:*"}, headers=headers)
+            started = time.time()
+            response = requests.get(
+                f"{BASE_URL}/node-monitor/summary",
+                params={"start_time": start_time, "end_time": end_time, "approximate": approximate},
+                headers=headers
+            )
+            elapsed = (time.time() - started) * 1000
+            if response.status_code != 200:
+                print(f"❌ {days}天 approximate={approximate}: {response.status_code} {response.text}")
+                break
+            results[approximate] = response.json()
+            print(f"{days}天 approximate={approximate}: {results[approximate]}, {elapsed:.0f} ms")
+        
+        if len(results) != 2:
+            continue
+        exact, approx = results[False], results[True]
+        if not approx["approximate"]:
+            print("⚠️ 近似模式回退到了精确统计（预聚合未追上或Redis不可用）")
+        if exact["total_records"] == approx["total_records"]:
+            print("✅ 总记录数一致")
+        else:
+            print(f"❌ 总记录数不一致: {exact['total_records']} vs {approx['total_records']}")
+        if exact["active_ip_count"]:
+            error = abs(approx["active_ip_count"] - exact["active_ip_count"]) / exact["active_ip_count"]
+            print(f"{'✅' if error <= 0.03 else '❌'} 活跃IP数误差 {error:.2%}")
+
+if __name__ == "__main__":
+    print("开始测试监控汇总近似统计...")
+    test_summary_modes()